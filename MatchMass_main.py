@@ -8,11 +8,12 @@ Created on Sat Jan 13 15:13:31 2024
 """
 
 import streamlit as st
-from data_functions import add_ions_to_theoretical_table, determine_bar_width, raise_warning_for_masses_within_accuracy
+from data_functions import determine_bar_width, get_expansion_cache
+from matchmass.engine import render_warning_messages, CHROMATOGRAM_KEY_SUFFIX
 import ui_functions as UI_fc
 from about import about_expander_content
 from instructions import instructions_expander_content
-from plots import make_plot1, make_plot2
+from plots import make_plot1, make_plot2, make_plot_chromatograms
 
 # set layout of the page and title
 st.set_page_config(layout="wide", initial_sidebar_state="expanded", page_title="MatchMass")
@@ -36,6 +37,7 @@ col1, col2, col3 = st.columns(3, gap='medium')
 # use streamlit uploader to upload tables of experimental data and table of theoretical values
 with col1:
     experimental_UploadedFile_object = UI_fc.experimental_data_upload_ui()
+    spectrum_mode, ms_level = UI_fc.spectrum_file_options_ui(experimental_UploadedFile_object)
 with col2:
     theoretical_table_UploadedFile_object = UI_fc.theoretical_data_upload_ui()
 with col3:
@@ -46,7 +48,7 @@ with col3:
 theoretical_mass_table_df = UI_fc.provide_empty_or_uploaded_theoretical_table(theoretical_table_UploadedFile_object)
 
 experimental_dfs_additional_info_df, dict_containing_experimental_dfs, dict_experimental_filenames = UI_fc.provide_empty_or_uploaded_experimental_data(
-    experimental_UploadedFile_object)
+    experimental_UploadedFile_object, spectrum_mode, ms_level)
 
 # divide graphically upload part and user-defined settings of mass accuracy and abundance threshold
 st.markdown("***")
@@ -68,8 +70,10 @@ radio_choice = UI_fc.radio_for_user_input_of_accuracy_and_threshold()
 
 # define what to show based on selected option on the radio
 if radio_choice == 'No':
-    accur_setting, thresh_setting = UI_fc.user_input_global_accuracy_and_threshold()
+    tolerance_model, accur_setting, accur_ppm_setting, thresh_setting = UI_fc.user_input_global_accuracy_and_threshold()
+    experimental_dfs_additional_info_df['tolerance_model'] = tolerance_model
     experimental_dfs_additional_info_df['mass_accuracy(Da)'] = accur_setting
+    experimental_dfs_additional_info_df['mass_accuracy(ppm)'] = accur_ppm_setting
     experimental_dfs_additional_info_df['abund_thrs'] = thresh_setting
 
 elif radio_choice == 'Yes':
@@ -99,15 +103,12 @@ ions_to_add_to_theoretical_table_dict = UI_fc.ion_picking_with_checkboxes()
 
 # prepare full table of theoretical masses
 #
-# define experimental error to later generate warning message for overlapping m/z of ions
-max_mass_accur_value = experimental_dfs_additional_info_df['mass_accuracy(Da)'].max()
-
-# run the AddIonsToTheoreticalTable function and obtain table with all theoretical masses of interest
-expanded_theoretical_mass_table_df = add_ions_to_theoretical_table(theoretical_mass_table_df,
-                                                                   ions_to_add_to_theoretical_table_dict)
-# add warning for theoretical masses which are within mass accuracy range
-expanded_theoretical_mass_table_df = raise_warning_for_masses_within_accuracy(expanded_theoretical_mass_table_df,
-                                                                              max_mass_accur_value)
+# add ions to the theoretical table, define experimental error (the largest one in Da, ppm is converted at the largest theoretical m/z)
+# and add warning for theoretical masses which are within mass accuracy range.
+# The table is computed again only if uploaded table, picked ions or the largest mass accuracy changed
+expanded_theoretical_mass_table_df, max_mass_accur_value = get_expansion_cache().expand_with_warnings(theoretical_mass_table_df,
+                                                                                                     ions_to_add_to_theoretical_table_dict,
+                                                                                                     experimental_dfs_additional_info_df)
 
 
 # create first plot for comparing experimental and theoretical data
@@ -126,8 +127,10 @@ df_for_plot1 = dict_containing_experimental_dfs[selectbox1_picked_file_nickname]
 # define experimental error to use as a bar width for theoretical m/z
 width_for_theoretical_mz_bars = determine_bar_width(max_mass_accur_value)
 
-# Create first plot for our data
-make_plot1(df_for_plot1, expanded_theoretical_mass_table_df, width_for_theoretical_mz_bars)
+# Create first plot for our data, narrower m/z range shows more details of large spectra
+plot_rendering_mode = UI_fc.plot_rendering_selectbox()
+mz_range_for_plot1 = UI_fc.mz_range_slider('Range of *m/z* in the plot:', 'mz_range_plot1', df_for_plot1['exp_m/z'])
+make_plot1(df_for_plot1, expanded_theoretical_mass_table_df, width_for_theoretical_mz_bars, mz_range_for_plot1, plot_rendering_mode)
 
 
 # Do the matching!
@@ -160,8 +163,8 @@ if aggregated_matched_files_summary_df.empty:
 else:
     st.write(matching_result_message)
 
-    # make new dictionary to use as a key for the dropdown menu
-    dict_experimental_filenames2 = {str(v) + " : " + str(k): v for k, v in dict_experimental_filenames.items()}
+    # make new dictionary to use as a key for the dropdown menu, files skipped by validation have no matched results
+    dict_experimental_filenames2 = {str(v) + " : " + str(k): v for k, v in dict_experimental_filenames.items() if v in dict_containing_matched_experimental_dfs}
 
     # dropdown menu to pick data for plot
     pick_from_selectbox2 = st.selectbox('Choose an experimental file to plot:',
@@ -172,14 +175,25 @@ else:
     matched_df_for_plot2 = dict_containing_matched_experimental_dfs[selectbox2_picked_file_nickname]
 
     # Create second plot showing which signals found match and which did not
-    make_plot2(not_matched_df_for_plot2, matched_df_for_plot2)
+    mz_range_for_plot2 = UI_fc.mz_range_slider('Range of *m/z* in the plot:', 'mz_range_plot2', not_matched_df_for_plot2['exp_m/z'])
+    make_plot2(not_matched_df_for_plot2, matched_df_for_plot2, mz_range_for_plot2, plot_rendering_mode)
+
+    # LC-MS runs have also chromatograms of matched ions, abundances in their results are integrated over retention time
+    if selectbox2_picked_file_nickname + CHROMATOGRAM_KEY_SUFFIX in dict_containing_matched_experimental_dfs:
+        make_plot_chromatograms(dict_containing_matched_experimental_dfs[selectbox2_picked_file_nickname + CHROMATOGRAM_KEY_SUFFIX],
+                                matched_df_for_plot2,
+                                not_matched_df_for_plot2['retention_time(min)'])
 
     # show the final table
     st.write('##### Final table with aggregated results from all provided experimental files')
-    st.dataframe(aggregated_matched_files_summary_df, use_container_width=True)
+    st.dataframe(render_warning_messages(aggregated_matched_files_summary_df), use_container_width=True)
 
     # show download button
     UI_fc.button_for_results_download(experimental_dfs_additional_info_df,
                                       expanded_theoretical_mass_table_df,
                                       aggregated_matched_files_summary_df,
                                       dict_containing_matched_experimental_dfs)
+
+# show problems found in the data before matching and measured stages of matching if user asked for them (also when the matching failed)
+UI_fc.validation_issues_expander()
+UI_fc.pipeline_profile_expander()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: memory_footprint.py
+Created on 18.10.2026
+
+Note: memory of matched and aggregated tables with compact dtypes (categorical strings, warning codes, int32 ID)
+compared with the same tables converted to plain object columns with full warning messages and float64 ID.
+Run from the repository folder:
+    python benchmarks/memory_footprint.py --files 32 --peaks 200000 --molecules 20000
+"""
+import argparse
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from matchmass import engine
+from parallel_matching import make_synthetic_data
+
+
+def table_memory(df: pd.DataFrame) -> int:
+    """
+    @param df:
+    @return: memory of the table in bytes including memory of Python strings
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def to_plain_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    converts table to the representation without compact dtypes, i.e. object columns with full warning messages and float64 ID
+
+    @param df: table with compact dtypes
+    @return: converted copy of the table
+    """
+    df = engine.render_warning_messages(df)
+    df = df.astype({col: object for col in df.select_dtypes('category').columns})
+    df = df.astype({col: np.float64 for col in df.select_dtypes(['int32', 'float32']).columns})
+    return df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=32)
+    parser.add_argument('--peaks', type=int, default=200000)
+    parser.add_argument('--molecules', type=int, default=20000)
+    args = parser.parse_args()
+
+    theoretical_mass_table_df, experimental_dfs_additional_info_df, dict_containing_experimental_dfs = make_synthetic_data(
+        args.files, args.peaks, args.molecules)
+    # float32 abundances are optional, they are used here to show the whole reduction
+    dict_containing_experimental_dfs = {nick: single_exp_file_df.astype({'Abundance': np.float32})
+                                        for nick, single_exp_file_df in dict_containing_experimental_dfs.items()}
+    expanded_theoretical_mass_table_df = engine.add_ions_to_theoretical_table(
+        theoretical_mass_table_df, engine.ions_selection_from_names(['MplusH', 'MplusNa', 'M2plusH']))
+    # large mass accuracy raises warnings for a substantial part of theoretical table
+    expanded_theoretical_mass_table_df = engine.raise_warning_for_masses_within_accuracy(expanded_theoretical_mass_table_df, 0.05)
+
+    dict_containing_matched_experimental_dfs, aggregated_matched_files_final_form_df = engine.match_and_aggregate(
+        experimental_dfs_additional_info_df, dict_containing_experimental_dfs, expanded_theoretical_mass_table_df)
+    long_aggregated_df = engine.prepare_matched_files_for_aggregating(list(dict_containing_matched_experimental_dfs.values()))
+
+    tables = {'theoretical table': expanded_theoretical_mass_table_df,
+              'matched files (all)': engine.concat_keeping_categories(list(dict_containing_matched_experimental_dfs.values())),
+              'long aggregated table': long_aggregated_df,
+              'aggregated table': aggregated_matched_files_final_form_df}
+    print(f'{args.files} files x {args.peaks} peaks, {len(expanded_theoretical_mass_table_df)} theoretical ions')
+    print(f'{"table":<24}{"rows":>10}{"plain (MB)":>13}{"compact (MB)":>15}{"reduction":>11}')
+    for table_name, df in tables.items():
+        plain_memory, compact_memory = table_memory(to_plain_dtypes(df)), table_memory(df)
+        print(f'{table_name:<24}{len(df):>10}{plain_memory / 1e6:>13.1f}{compact_memory / 1e6:>15.1f}{plain_memory / compact_memory:>10.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: numpress_decoding.py
+Created on 18.10.2026
+
+Note: time of decoding of binary arrays compressed by MS-Numpress (matchmass.spectrum_formats.decode_numpress) compared with
+uncompressed float64 arrays. Integers of linear and pic methods have variable length, so the decoder is per-value: their positions
+are found by a loop in Python with one step per integer (the only part of decoding which is not done by NumPy), the time of the loop is shown separately.
+Run from the repository folder:
+    python benchmarks/numpress_decoding.py --values 1000000
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from matchmass.spectrum_formats import decode_numpress, decode_numpress_integers, unpack_nibbles
+
+
+def encode_numpress_integers(values: np.ndarray) -> bytes:
+    """
+    encodes integers as MS-Numpress half-bytes (see decode_numpress_integers), the first half-byte says how many leading
+    half-bytes are zeros (or ones for negative numbers) and the other half-bytes follow from the lowest one
+
+    @param values: integers within range of int32
+    @return: encoded bytes
+    """
+    values = np.asarray(values, dtype=np.int64).astype(np.uint32)
+    # half-bytes from the highest one
+    high_first = (values[:, np.newaxis] >> (28 - 4 * np.arange(8, dtype=np.uint32))) & 0xf
+    leading_zeros = np.where((high_first == 0).all(axis=1), 8, np.argmax(high_first != 0, axis=1))
+    leading_ones = np.minimum(np.where((high_first == 0xf).all(axis=1), 8, np.argmax(high_first != 0xf, axis=1)), 7)
+    negative = high_first[:, 0] == 0xf
+    n_leading = np.where(negative, leading_ones, leading_zeros)
+    tokens = np.empty((len(values), 9), dtype=np.uint8)
+    tokens[:, 0] = np.where(negative, n_leading + 8, n_leading)
+    tokens[:, 1:] = high_first[:, ::-1]
+    nibbles = tokens[np.arange(9) <= 8 - n_leading[:, np.newaxis]]
+    if len(nibbles) % 2:
+        nibbles = np.append(nibbles, np.uint8(0))
+    return ((nibbles[0::2] << 4) | nibbles[1::2]).astype(np.uint8).tobytes()
+
+
+def encode_numpress_linear(values: np.ndarray, fixed_point: float) -> bytes:
+    """
+    @param values: values to encode (e.g. m/z)
+    @param fixed_point: scaling of values to integers
+    @return: bytes compressed by MS-Numpress linear prediction
+    """
+    integers = np.floor(np.asarray(values) * fixed_point + 0.5).astype(np.int64)
+    residuals = integers[2:] - 2 * integers[1:-1] + integers[:-2]
+    return struct.pack('>d', fixed_point) + integers[:2].astype('<u4').tobytes() + encode_numpress_integers(residuals)
+
+
+def measure(function, repeats: int = 3) -> float:
+    """
+    @param function: function without arguments
+    @return: the shortest time of repeats calls in seconds
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--values', type=int, default=1000000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    mz = np.sort(rng.uniform(100.0, 2000.0, args.values))
+    intensities = rng.lognormal(8.0, 2.0, args.values)
+    slof_fixed_point = 65535 / np.log1p(intensities.max())
+    arrays = {'float64 (uncompressed)': (mz.tobytes(), lambda data: np.frombuffer(data, dtype='<f8')),
+              'linear (m/z)': (encode_numpress_linear(mz, 100000.0), lambda data: decode_numpress(data, 'linear')),
+              'pic (intensities)': (encode_numpress_integers(np.floor(intensities + 0.5)), lambda data: decode_numpress(data, 'pic')),
+              'slof (intensities)': (struct.pack('>d', slof_fixed_point) + np.floor(np.log1p(intensities) * slof_fixed_point + 0.5).astype('<u2').tobytes(),
+                                     lambda data: decode_numpress(data, 'slof'))}
+
+    print(f'{args.values} values')
+    print(f'{"array":<24}{"size (MB)":>10}{"decoding (s)":>14}{"positions loop (s)":>20}')
+    for array_name, (data, decode) in arrays.items():
+        decoding_time = measure(lambda: decode(data))
+        positions_time = ''
+        if array_name.startswith(('linear', 'pic')):
+            integer_data = data[16:] if array_name.startswith('linear') else data
+            # the loop in decode_numpress_integers walks over lengths of integers taken from their first half-bytes
+            nibbles = unpack_nibbles(integer_data)
+            token_lengths = (9 - np.where(nibbles <= 8, nibbles, nibbles - 8)).astype(np.uint8).tobytes()
+
+            def find_positions():
+                is_start = bytearray(len(nibbles))
+                position = 0
+                while position < len(nibbles):
+                    is_start[position] = 1
+                    position += token_lengths[position]
+            positions_time = f'{measure(find_positions):.3f}'
+            assert len(decode_numpress_integers(integer_data)) == args.values - (2 if array_name.startswith('linear') else 0)
+        print(f'{array_name:<24}{len(data) / 1e6:>10.2f}{decoding_time:>14.3f}{positions_time:>20}')
+
+
+if __name__ == '__main__':
+    main()
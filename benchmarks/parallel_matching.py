@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: parallel_matching.py
+Created on 18.10.2026
+
+Note: benchmark of parallel matching of experimental files with 1, 2, 4 and 8 worker processes.
+Run from the repository folder:
+    python benchmarks/parallel_matching.py --files 32 --peaks 200000 --molecules 20000
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from matchmass import engine
+from matchmass.parallel import iter_matched_files, match_and_aggregate_in_parallel
+
+
+def make_synthetic_data(n_files: int, n_peaks: int, n_molecules: int, seed: int = 0) -> tuple:
+    """
+    generates random theoretical table and experimental files, about one tenth of peaks is placed at theoretical m/z
+
+    @param n_files: number of experimental files
+    @param n_peaks: number of peaks in each experimental file
+    @param n_molecules: number of molecules in theoretical table
+    @param seed: seed for random generator
+    @return: tuple (theoretical table, additional info table, dictionary with experimental dataframes)
+    """
+    rng = np.random.default_rng(seed)
+    theoretical_mass_table_df = engine.load_theoretical_table(
+        (np.array(['mol_' + str(i) for i in range(n_molecules)]), rng.uniform(100, 2000, n_molecules)))
+    dict_containing_experimental_dfs = {}
+    for i in range(n_files):
+        mz = rng.uniform(100, 2000, n_peaks)
+        n_hits = n_peaks // 10
+        mz[:n_hits] = rng.choice(theoretical_mass_table_df['theor_m/z'].to_numpy(), n_hits) + rng.normal(0, 0.002, n_hits)
+        dict_containing_experimental_dfs['file' + str(i + 1)] = engine.load_experimental_table((mz, rng.uniform(0, 1e5, n_peaks)))
+    experimental_dfs_additional_info_df = pd.DataFrame()
+    for nick in dict_containing_experimental_dfs:
+        experimental_dfs_additional_info_df = engine.generate_additional_info_table(experimental_dfs_additional_info_df, nick, nick)
+    experimental_dfs_additional_info_df['mass_accuracy(Da)'] = 0.01
+    experimental_dfs_additional_info_df['abund_thrs'] = 0.0
+    return (theoretical_mass_table_df, experimental_dfs_additional_info_df, dict_containing_experimental_dfs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=32)
+    parser.add_argument('--peaks', type=int, default=200000)
+    parser.add_argument('--molecules', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    theoretical_mass_table_df, experimental_dfs_additional_info_df, dict_containing_experimental_dfs = make_synthetic_data(
+        args.files, args.peaks, args.molecules)
+    expanded_theoretical_mass_table_df = engine.add_ions_to_theoretical_table(
+        theoretical_mass_table_df, engine.ions_selection_from_names(['MplusH', 'MplusNa', 'M2plusH']))
+    expanded_theoretical_mass_table_df = engine.raise_warning_for_masses_within_accuracy(expanded_theoretical_mass_table_df, 0.01)
+
+    print(f'{args.files} files x {args.peaks} peaks, {len(expanded_theoretical_mass_table_df)} theoretical ions, {os.cpu_count()} CPUs')
+    # matching of files runs in parallel, aggregation of all results is done once in the main process afterwards
+    tasks = [(dict_containing_experimental_dfs[ind], 0.0, 0.01, ind) for ind in experimental_dfs_additional_info_df.index]
+    print('workers  matching (s)  speedup  total (s)')
+    reference_time = None
+    for n_workers in args.workers:
+        start = time.perf_counter()
+        list(iter_matched_files(tasks, expanded_theoretical_mass_table_df, n_workers))
+        matching_time = time.perf_counter() - start
+        start = time.perf_counter()
+        match_and_aggregate_in_parallel(experimental_dfs_additional_info_df, dict_containing_experimental_dfs,
+                                        expanded_theoretical_mass_table_df, n_workers)
+        total_time = time.perf_counter() - start
+        reference_time = reference_time or matching_time
+        print(f'{n_workers:>7}  {matching_time:>12.2f}  {reference_time / matching_time:>7.2f}  {total_time:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
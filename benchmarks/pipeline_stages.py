@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: pipeline_stages.py
+Created on 18.10.2026
+
+Note: benchmark of every stage of the matching pipeline (reading, adding ions, warnings, matching, aggregation, export)
+on synthetic theoretical libraries and peak lists (see synthetic_data.py). Wall time, number of rows and peak of allocated
+memory of each stage are saved as JSON together with versions of the code and libraries, so results of two versions
+can be compared with --compare. Peak lists larger than --in-memory-limit are written to CSV by chunks and matched
+by chunks (engine.match_experimental_file_in_chunks).
+Run from the repository folder:
+    python benchmarks/pipeline_stages.py --molecules 100 10000 --peaks 1000 1000000 --files 4
+    python benchmarks/pipeline_stages.py --molecules 10000 --peaks 1000000 --compare benchmarks/results/old.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ions_enum
+from matchmass import engine
+from matchmass.file_formats import PYARROW_AVAILABLE
+from matchmass.instrumentation import PipelineProfile
+from matchmass.results_store import LazyMatchedResults, materialize_matched_rows
+from synthetic_data import generate_theoretical_library, generate_peak_list, write_peak_list_csv, write_theoretical_library_csv
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def environment_info() -> dict:
+    """
+    @return: versions of the code, Python and libraries and description of the machine
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()}
+
+
+def run_case(n_molecules: int, n_peaks: int, args: argparse.Namespace, work_dir: str) -> PipelineProfile:
+    """
+    runs the whole pipeline for one size of theoretical library and peak lists and measures each stage
+
+    @param n_molecules: number of molecules in theoretical library
+    @param n_peaks: number of peaks in each experimental file
+    @param args: parsed command-line arguments with other parameters
+    @param work_dir: directory for generated files
+    @return: PipelineProfile with measured stages
+    """
+    profile = PipelineProfile(track_memory=not args.no_memory)
+    theoretical_path = os.path.join(work_dir, 'theoretical.csv')
+    write_theoretical_library_csv(theoretical_path, generate_theoretical_library(n_molecules, args.seed))
+
+    with profile.stage('read_theoretical') as record:
+        theoretical_mass_table_df = engine.load_theoretical_table(theoretical_path)
+        record['rows'] = len(theoretical_mass_table_df.index)
+    with profile.stage('add_ions') as record:
+        expanded_theoretical_mass_table_df = engine.add_ions_to_theoretical_table(theoretical_mass_table_df,
+                                                                                  engine.ions_selection_from_names(args.ions))
+        record['rows'] = len(expanded_theoretical_mass_table_df.index)
+    with profile.stage('warnings') as record:
+        expanded_theoretical_mass_table_df = engine.raise_warning_for_masses_within_accuracy(expanded_theoretical_mass_table_df, args.mass_accuracy)
+        record['rows'] = int((expanded_theoretical_mass_table_df['warning'].cat.codes >= 0).sum())
+    with profile.stage('build_index') as record:
+        theoretical_index = engine.build_theoretical_index(expanded_theoretical_mass_table_df)
+        record['rows'] = len(theoretical_index)
+
+    in_memory = n_peaks <= args.in_memory_limit
+    dict_containing_matched_experimental_dfs = LazyMatchedResults(theoretical_index.table) if in_memory else {}
+    list_of_parts_for_aggregating = []
+    for i in range(1, args.files + 1):
+        nick = 'file' + str(i)
+        experimental_path = os.path.join(work_dir, nick + '.csv')
+        if in_memory:
+            generate_peak_list(expanded_theoretical_mass_table_df, n_peaks, args.match_rate, args.mass_error, args.seed + i).to_csv(
+                experimental_path, index=False)
+            with profile.stage('read_experimental', nick) as record:
+                single_exp_file_df = engine.load_experimental_table(experimental_path)
+                record['rows'] = len(single_exp_file_df.index)
+            with profile.stage('matching', nick) as record:
+                matched_rows = engine.find_matched_rows(single_exp_file_df, theoretical_index, 0.0, args.mass_accuracy, args.matching_mode)
+                record['rows'] = len(matched_rows.exp_rows)
+            with profile.stage('prepare_part', nick) as record:
+                part_for_aggregating = engine.prepare_matched_file_for_aggregating(
+                    materialize_matched_rows(matched_rows, single_exp_file_df, theoretical_index.table, nick))
+                record['rows'] = len(part_for_aggregating.index)
+            dict_containing_matched_experimental_dfs.add(nick, single_exp_file_df, matched_rows, nick)
+        else:
+            write_peak_list_csv(experimental_path, expanded_theoretical_mass_table_df, n_peaks, args.match_rate, args.mass_error,
+                                args.seed + i, args.chunk_size)
+            with profile.stage('read_and_match_in_chunks', nick) as record:
+                compared_data = engine.match_experimental_file_in_chunks(experimental_path, theoretical_index, 0.0, args.mass_accuracy,
+                                                                         nick, args.matching_mode, args.chunk_size)
+                record['rows'] = len(compared_data.index)
+            with profile.stage('prepare_part', nick) as record:
+                part_for_aggregating = engine.prepare_matched_file_for_aggregating(compared_data)
+                record['rows'] = len(part_for_aggregating.index)
+            dict_containing_matched_experimental_dfs[nick] = compared_data
+            os.remove(experimental_path)
+        list_of_parts_for_aggregating.append(part_for_aggregating)
+
+    with profile.stage('combine_parts') as record:
+        aggregated_matched_files_summary_df = engine.combine_parts_for_aggregating(list_of_parts_for_aggregating)
+        record['rows'] = len(aggregated_matched_files_summary_df.index)
+    with profile.stage('mean_and_error') as record:
+        aggregated_matched_files_summary_df = engine.calculate_mean_and_error_for_mass_to_charge_of_ions(aggregated_matched_files_summary_df)
+        record['rows'] = len(aggregated_matched_files_summary_df.index)
+    with profile.stage('pivot') as record:
+        aggregated_matched_files_summary_df = engine.pivot_aggregated_table(aggregated_matched_files_summary_df)
+        record['rows'] = len(aggregated_matched_files_summary_df.index)
+    with profile.stage('sort') as record:
+        aggregated_matched_files_final_form_df = engine.sort_and_rearrange_aggregated_to_final_form(aggregated_matched_files_summary_df)
+        record['rows'] = len(aggregated_matched_files_final_form_df.index)
+
+    experimental_dfs_additional_info_df = pd.DataFrame()
+    for nick in dict_containing_matched_experimental_dfs:
+        experimental_dfs_additional_info_df = engine.generate_additional_info_table(experimental_dfs_additional_info_df, nick, nick)
+    for export_format in args.export:
+        export_path = os.path.join(work_dir, 'results_' + export_format)
+        with profile.stage('export_' + export_format):
+            engine.EXPORT_FORMATS[export_format][0](export_path,
+                                                    experimental_dfs_additional_info_df,
+                                                    expanded_theoretical_mass_table_df,
+                                                    aggregated_matched_files_final_form_df,
+                                                    dict_containing_matched_experimental_dfs)
+        os.remove(export_path)
+    return profile
+
+
+def print_case(case: dict, previous_case: dict = None) -> None:
+    """
+    prints totals of stages of one case, with times of the same case from previous results if they are given
+
+    @param case: results of one case
+    @param previous_case: results of the same case from other run or None
+    @return: None
+    """
+    parameters = case['parameters']
+    print(f"\n{parameters['molecules']} molecules, {parameters['files']} files x {parameters['peaks']} peaks")
+    header = f'{"stage":<26}{"calls":>6}{"rows":>12}{"time (s)":>10}{"peak memory (MB)":>18}'
+    print(header + (f'{"previous (s)":>14}{"ratio":>8}' if previous_case else ''))
+    for stage_name, stage_totals in case['totals'].items():
+        peak_memory = stage_totals['peak_memory_bytes']
+        line = (f"{stage_name:<26}{stage_totals['calls']:>6}{stage_totals['rows'] if stage_totals['rows'] is not None else '':>12}"
+                f"{stage_totals['seconds']:>10.3f}{'' if peak_memory is None else f'{peak_memory / 1e6:.1f}':>18}")
+        if previous_case and stage_name in previous_case['totals']:
+            previous_seconds = previous_case['totals'][stage_name]['seconds']
+            line += f"{previous_seconds:>14.3f}{stage_totals['seconds'] / previous_seconds if previous_seconds else float('nan'):>8.2f}"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--molecules', type=int, nargs='+', default=[1000, 100000],
+                        help='sizes of theoretical libraries (10^2 - 10^6)')
+    parser.add_argument('--peaks', type=int, nargs='+', default=[10000, 1000000],
+                        help='numbers of peaks in each experimental file (10^3 - 10^8)')
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--match-rate', type=float, default=0.1, help='fraction of peaks placed at theoretical m/z')
+    parser.add_argument('--ions', nargs='+', default=['MplusH', 'MplusNa', 'MplusK'], choices=[ion.name for ion in ions_enum.Ion],
+                        metavar='ION', help='ion mix of theoretical table and peak lists')
+    parser.add_argument('--mass-accuracy', type=float, default=0.005, help='mass accuracy (Da) used for matching')
+    parser.add_argument('--mass-error', type=float, default=0.002, help='the largest error of peaks placed at theoretical m/z')
+    parser.add_argument('--matching-mode', choices=engine.MATCHING_MODES, default='nearest')
+    parser.add_argument('--export', nargs='*', default=['parquet' if PYARROW_AVAILABLE else 'csv'], choices=list(engine.EXPORT_FORMATS),
+                        help='formats of export to measure, Excel is limited to 1048576 rows per sheet')
+    parser.add_argument('--in-memory-limit', type=int, default=10000000,
+                        help='larger peak lists are written and matched by chunks')
+    parser.add_argument('--chunk-size', type=int, default=1000000)
+    parser.add_argument('--no-memory', action='store_true', help='do not measure memory (tracemalloc slows down some stages)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='JSON file for results (default: benchmarks/results/pipeline_<time>.json)')
+    parser.add_argument('--compare', default=None, help='JSON file with previous results, times of the same cases are compared')
+    args = parser.parse_args()
+
+    results = {'environment': environment_info(), 'cases': []}
+    previous_cases = {}
+    if args.compare:
+        with open(args.compare) as file:
+            previous_cases = {json.dumps(case['parameters'], sort_keys=True): case for case in json.load(file)['cases']}
+
+    for n_molecules in args.molecules:
+        for n_peaks in args.peaks:
+            with tempfile.TemporaryDirectory() as work_dir:
+                profile = run_case(n_molecules, n_peaks, args, work_dir)
+            parameters = {'molecules': n_molecules, 'peaks': n_peaks, 'files': args.files, 'match_rate': args.match_rate,
+                          'ions': args.ions, 'mass_accuracy': args.mass_accuracy, 'mass_error': args.mass_error,
+                          'matching_mode': args.matching_mode, 'seed': args.seed}
+            case = {'parameters': parameters, **profile.to_dict()}
+            results['cases'].append(case)
+            print_case(case, previous_cases.get(json.dumps(parameters, sort_keys=True)))
+
+    output_path = args.output or os.path.join(RESULTS_DIR, 'pipeline_' + time.strftime('%Y%m%d_%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'\nResults were written to {output_path}')
+
+
+if __name__ == '__main__':
+    main()
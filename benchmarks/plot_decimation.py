@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: plot_decimation.py
+Created on 18.10.2026
+
+Note: size of plot data sent to the browser and time of building the plot (figure and its JSON) with and without
+decimation of spectra (matchmass.decimation), decimated plots are measured with bars and with WebGL lines.
+Time of drawing in the browser grows with the size of the data, WebGL draws the same number of signals much faster than bars.
+Run from the repository folder:
+    python benchmarks/plot_decimation.py --peaks 1000000 --molecules 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from matchmass import engine
+from matchmass.decimation import DEFAULT_NUMBER_OF_BINS
+from plots import figure_plot1, figure_plot2
+from parallel_matching import make_synthetic_data
+
+
+def measure_figure(build_figure) -> tuple:
+    """
+    @param build_figure: function without arguments which builds plotly figure
+    @return: tuple (time of building and serialization to JSON in seconds, size of JSON in bytes, number of plotted points)
+    """
+    start = time.perf_counter()
+    fig = build_figure()
+    payload = fig.to_json()
+    elapsed = time.perf_counter() - start
+    return (elapsed, len(payload), sum(len(trace.x) for trace in fig.data))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peaks', type=int, default=1000000)
+    parser.add_argument('--molecules', type=int, default=20000)
+    args = parser.parse_args()
+
+    theoretical_mass_table_df, experimental_dfs_additional_info_df, dict_containing_experimental_dfs = make_synthetic_data(
+        1, args.peaks, args.molecules)
+    expanded_theoretical_mass_table_df = engine.add_ions_to_theoretical_table(
+        theoretical_mass_table_df, engine.ions_selection_from_names(['MplusH', 'MplusNa', 'M2plusH']))
+    single_exp_file_df = dict_containing_experimental_dfs['file1']
+    compared_data = engine.match_single_experimental_file(single_exp_file_df, expanded_theoretical_mass_table_df, 0.0, 0.01, 'file1')
+
+    # the whole spectrum and a zoom to a 10 m/z wide window
+    cases = {'plot1 full range': lambda number_of_bins, rendering_mode: figure_plot1(single_exp_file_df, expanded_theoretical_mass_table_df, 0.01,
+                                                                                     number_of_bins=number_of_bins, rendering_mode=rendering_mode),
+             'plot2 full range': lambda number_of_bins, rendering_mode: figure_plot2(single_exp_file_df, compared_data,
+                                                                                     number_of_bins=number_of_bins, rendering_mode=rendering_mode),
+             'plot2 m/z 500-510': lambda number_of_bins, rendering_mode: figure_plot2(single_exp_file_df, compared_data, (500.0, 510.0),
+                                                                                      number_of_bins=number_of_bins, rendering_mode=rendering_mode)}
+    print(f'{args.peaks} peaks, {len(expanded_theoretical_mass_table_df)} theoretical ions, {len(compared_data)} matched signals')
+    print(f'{"plot":<20}{"points":>10}{"JSON (MB)":>11}{"time (s)":>10}  {"decimated points":>16}{"JSON (MB)":>11}{"time (s)":>10}'
+          f'  {"WebGL JSON (MB)":>16}{"time (s)":>10}')
+    for case_name, build_figure in cases.items():
+        full_time, full_size, full_points = measure_figure(lambda: build_figure(None, 'bars'))
+        decimated_time, decimated_size, decimated_points = measure_figure(lambda: build_figure(DEFAULT_NUMBER_OF_BINS, 'bars'))
+        webgl_time, webgl_size, _ = measure_figure(lambda: build_figure(DEFAULT_NUMBER_OF_BINS, 'webgl'))
+        print(f'{case_name:<20}{full_points:>10}{full_size / 1e6:>11.2f}{full_time:>10.2f}  '
+              f'{decimated_points:>16}{decimated_size / 1e6:>11.2f}{decimated_time:>10.2f}  {webgl_size / 1e6:>16.2f}{webgl_time:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: synthetic_data.py
+Created on 18.10.2026
+
+Note: generators of synthetic theoretical libraries and experimental peak lists for benchmarks.
+Part of peaks (match rate) is placed at theoretical m/z of picked ions with mass error within the mass accuracy,
+the rest is spread uniformly over the m/z range (some of these peaks can match by chance, as in real data).
+Large peak lists are written to CSV by chunks, so they never have to fit in memory.
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from matchmass import engine
+
+
+def generate_theoretical_library(n_molecules: int, seed: int = 0, mass_range: tuple = (100.0, 2000.0)) -> pd.DataFrame:
+    """
+    @param n_molecules: number of molecules
+    @param seed: seed for random generator
+    @param mass_range: tuple (lowest, highest) monoisotopic mass
+    @return: theoretical table as from engine.load_theoretical_table
+    """
+    rng = np.random.default_rng(seed)
+    names = np.array(['mol_' + str(i) for i in range(n_molecules)])
+    return engine.load_theoretical_table((names, rng.uniform(mass_range[0], mass_range[1], n_molecules)))
+
+
+def generate_peaks(rng: np.random.Generator, theoretical_mz: np.ndarray, n_peaks: int, match_rate: float, mass_error: float) -> tuple:
+    """
+    @param rng: random generator
+    @param theoretical_mz: theoretical m/z of the expanded table (i.e. with picked ions)
+    @param n_peaks: number of peaks
+    @param match_rate: fraction of peaks placed at theoretical m/z
+    @param mass_error: the largest difference of placed peaks from theoretical m/z
+    @return: tuple (m/z, abundance) of peaks in random order
+    """
+    n_placed_peaks = int(round(n_peaks * match_rate))
+    mz = np.empty(n_peaks)
+    mz[:n_placed_peaks] = rng.choice(theoretical_mz, n_placed_peaks) + rng.uniform(-mass_error, mass_error, n_placed_peaks)
+    mz[n_placed_peaks:] = rng.uniform(theoretical_mz.min(), theoretical_mz.max(), n_peaks - n_placed_peaks)
+    abundance = rng.lognormal(8.0, 2.0, n_peaks)
+    order = rng.permutation(n_peaks)
+    return (mz[order], abundance[order])
+
+
+def generate_peak_list(expanded_theoretical_mass_table_df: pd.DataFrame, n_peaks: int, match_rate: float = 0.1,
+                       mass_error: float = 0.002, seed: int = 0) -> pd.DataFrame:
+    """
+    @param expanded_theoretical_mass_table_df: full theoretical table with picked ions (ion mix of the peak list)
+    @param n_peaks: number of peaks
+    @param match_rate: fraction of peaks placed at theoretical m/z
+    @param mass_error: the largest difference of placed peaks from theoretical m/z
+    @param seed: seed for random generator
+    @return: experimental table as from engine.load_experimental_table
+    """
+    rng = np.random.default_rng(seed)
+    theoretical_mz = expanded_theoretical_mass_table_df['theor_m/z'].to_numpy(dtype=np.float64)
+    return engine.load_experimental_table(generate_peaks(rng, theoretical_mz, n_peaks, match_rate, mass_error))
+
+
+def write_peak_list_csv(path: str, expanded_theoretical_mass_table_df: pd.DataFrame, n_peaks: int, match_rate: float = 0.1,
+                        mass_error: float = 0.002, seed: int = 0, chunk_size: int = 1000000) -> None:
+    """
+    writes peak list to CSV file by chunks, each chunk has the same match rate
+
+    @param path: path of CSV file
+    @param expanded_theoretical_mass_table_df: full theoretical table with picked ions
+    @param n_peaks: number of peaks
+    @param match_rate: fraction of peaks placed at theoretical m/z
+    @param mass_error: the largest difference of placed peaks from theoretical m/z
+    @param seed: seed for random generator
+    @param chunk_size: number of peaks generated and written at once
+    @return: None
+    """
+    rng = np.random.default_rng(seed)
+    theoretical_mz = expanded_theoretical_mass_table_df['theor_m/z'].to_numpy(dtype=np.float64)
+    with open(path, 'w', newline='') as file:
+        file.write('m/z,abundance\n')
+        for start in range(0, n_peaks, chunk_size):
+            mz, abundance = generate_peaks(rng, theoretical_mz, min(chunk_size, n_peaks - start), match_rate, mass_error)
+            pd.DataFrame({'m/z': mz, 'abundance': abundance}).to_csv(file, header=False, index=False)
+
+
+def write_theoretical_library_csv(path: str, theoretical_mass_table_df: pd.DataFrame) -> None:
+    """
+    writes theoretical table in the form of user uploads (name and monoisotopic mass)
+
+    @param path: path of CSV file
+    @param theoretical_mass_table_df: table from generate_theoretical_library
+    @return: None
+    """
+    theoretical_mass_table_df[['name', 'theor_m/z']].to_csv(path, header=['name', 'monoisotopic_mass'], index=False)
+
+
+if __name__ == '__main__':
+    pass
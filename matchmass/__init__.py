@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: __init__.py
+Created on 18.10.2026
+
+Note: MatchMass package with the headless matching engine (usable without Streamlit).
+"""
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: __main__.py
+Created on 18.10.2026
+
+Note: allows to run the command-line batch matcher as 'python -m matchmass'
+"""
+import sys
+from matchmass.cli import main
+
+sys.exit(main())
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: chromatograms.py
+Created on 18.10.2026
+
+Note: matching of LC-MS runs scan by scan. Peaks of many scans are concatenated into one batch (position of the scan is kept
+for each peak), the whole batch is matched by one search in the theoretical index and matched peaks are summed for each
+pair of scan and theoretical m/z. These points form extracted-ion chromatograms (EIC) of matched ions, which are integrated
+over retention time (trapezoidal rule, scans without the ion count as zero) into one abundance for each ion.
+Scans are read and matched by batches, so memory is bounded by the batch size and the number of matched points, not by size of the run.
+"""
+import numpy as np
+import pandas as pd
+from matchmass.spectrum_formats import iter_scans
+from matchmass.theoretical_index import TheoreticalIndex
+from matchmass.tolerance import tolerance_window
+
+# number of peaks matched at once (scans are collected until the batch has at least this number of peaks)
+CHROMATOGRAM_BATCH_SIZE = 1000000
+# columns of the long table of scan peaks (see matchmass.spectrum_formats.read_scan_peaks) which describe scans, not peaks
+SCAN_COLUMNS = ['scan', 'retention_time(min)', 'precursor_m/z']
+CHROMATOGRAM_COLUMNS = ['theor_m/z', 'ID', 'name', 'ion', 'charge', 'scan', 'retention_time(min)', 'exp_m/z', 'Abundance', 'warning']
+
+
+def is_scan_peaks_table(df) -> bool:
+    """
+    @param df: experimental table
+    @return: True if the table contains peaks of more scans of one LC-MS run (table from spectrum_formats.read_scan_peaks)
+    """
+    return isinstance(df, pd.DataFrame) and 'scan' in df.columns and 'retention_time(min)' in df.columns
+
+
+def retention_time_weights(retention_times) -> np.ndarray:
+    """
+    weights of scans for integration of chromatograms by trapezoidal rule. Chromatogram with zero abundance in scans without
+    the ion has area sum(abundance * weight), the weight of a scan is half of the time between its previous and next scan.
+    Scans without retention time get zero weight, if no scan has retention time (e.g. MGF without RTINSECONDS) the order of scans is used instead.
+    A single scan has weight 1, so the area is its abundance.
+
+    @param retention_times: retention times of all scans of the run (minutes)
+    @return: array with weight of each scan (minutes)
+    """
+    retention_times = np.asarray(retention_times, dtype=np.float64)
+    has_time = ~np.isnan(retention_times)
+    if not has_time.any():
+        retention_times, has_time = np.arange(len(retention_times), dtype=np.float64), np.ones(len(retention_times), dtype=bool)
+    weights = np.zeros(len(retention_times))
+    if has_time.sum() == 1:
+        weights[has_time] = 1.0
+        return weights
+    timed_positions = np.flatnonzero(has_time)
+    order = timed_positions[np.argsort(retention_times[timed_positions], kind='stable')]
+    sorted_times = retention_times[order]
+    padded_times = np.concatenate([sorted_times[:1], sorted_times, sorted_times[-1:]])
+    weights[order] = (padded_times[2:] - padded_times[:-2]) / 2
+    return weights
+
+
+def sum_points_by_scan_and_ion(scan_positions: np.ndarray, theor_rows: np.ndarray, abundance: np.ndarray, weighted_mz: np.ndarray, n_theor: int) -> tuple:
+    """
+    sums matched peaks of the same scan and theoretical row (more peaks of one scan can match the same ion)
+
+    @param scan_positions: position of the scan of each matched peak
+    @param theor_rows: position of the matched row in the theoretical table
+    @param abundance: abundance of each matched peak
+    @param weighted_mz: m/z multiplied by abundance for each matched peak
+    @param n_theor: number of rows of the theoretical table
+    @return: tuple (scan positions, theoretical rows, summed abundances, summed weighted m/z), one item for each pair of scan and theoretical row
+    """
+    pair_codes, positions = np.unique(scan_positions.astype(np.int64) * n_theor + theor_rows, return_inverse=True)
+    return (pair_codes // n_theor,
+            pair_codes % n_theor,
+            np.bincount(positions, abundance, len(pair_codes)),
+            np.bincount(positions, weighted_mz, len(pair_codes)))
+
+
+def match_peak_batch(mz: np.ndarray, abundance: np.ndarray, scan_positions: np.ndarray, theoretical_index: TheoreticalIndex,
+                     abundance_threshold: float, tolerance_of_mass, matching_mode: str = 'nearest') -> tuple:
+    """
+    matches concatenated peaks of more scans by one search in the theoretical index
+
+    @param mz: m/z of peaks of all scans of the batch
+    @param abundance: abundance of peaks
+    @param scan_positions: position of the scan of each peak within the run
+    @param theoretical_index: TheoreticalIndex built for expanded theoretical table
+    @param abundance_threshold: peaks with lower abundance are not matched
+    @param tolerance_of_mass: MassTolerance or mass accuracy in Da
+    @param matching_mode: 'nearest' matches each peak to the nearest theoretical m/z, 'all' to all theoretical m/z within mass accuracy
+    @return: tuple (scan positions, theoretical rows, summed abundances, summed weighted m/z), see sum_points_by_scan_and_ion
+    """
+    mz = np.asarray(mz, dtype=np.float64)
+    abundance = np.asarray(abundance, dtype=np.float64)
+    kept = np.isfinite(mz) & (abundance >= abundance_threshold)
+    mz, abundance, scan_positions = mz[kept], abundance[kept], np.asarray(scan_positions)[kept]
+    mass_accuracy_window = tolerance_window(tolerance_of_mass, mz)
+    if matching_mode == 'all':
+        peak_positions, theor_rows = theoretical_index.find_all_within(mz, mass_accuracy_window)
+    else:
+        theor_rows = theoretical_index.find_nearest(mz, mass_accuracy_window)
+        peak_positions = np.flatnonzero(theor_rows >= 0)
+        theor_rows = theor_rows[peak_positions]
+    return sum_points_by_scan_and_ion(scan_positions[peak_positions], theor_rows, abundance[peak_positions],
+                                      mz[peak_positions] * abundance[peak_positions], len(theoretical_index))
+
+
+def combine_batches(list_of_batch_points: list[tuple], n_theor: int) -> tuple:
+    """
+    @param list_of_batch_points: results of match_peak_batch for all batches
+    @param n_theor: number of rows of the theoretical table
+    @return: points of the whole run, pairs of scan and theoretical row split between batches are summed
+    """
+    if not list_of_batch_points:
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+    return sum_points_by_scan_and_ion(*(np.concatenate(arrays) for arrays in zip(*list_of_batch_points)), n_theor)
+
+
+def build_scans_table(scan_ids, retention_times) -> pd.DataFrame:
+    """
+    @param scan_ids: IDs of all scans of the run (also of scans without peaks) in order of scans
+    @param retention_times: retention times of the scans (minutes)
+    @return: table with columns 'scan' and 'retention_time(min)', repeated IDs (e.g. of MGF spectra) are told apart by order of the scan
+    """
+    scan_index = pd.Index([str(scan_id) for scan_id in scan_ids])
+    scan_index = scan_index.where(~scan_index.duplicated(), [f'{scan_id} ({i + 1})' for i, scan_id in enumerate(scan_index)])
+    return pd.DataFrame({'scan': scan_index, 'retention_time(min)': np.asarray(retention_times, dtype=np.float64)})
+
+
+def build_chromatogram_table(points: tuple, scans_df: pd.DataFrame, expanded_theoretical_mass_table_df: pd.DataFrame,
+                             orig_datafile_nickname: str) -> pd.DataFrame:
+    """
+    builds long table of extracted-ion chromatograms, one row for each scan in which the ion was matched
+
+    @param points: tuple (scan positions, theoretical rows, summed abundances, summed weighted m/z) from combine_batches
+    @param scans_df: table with columns 'scan' and 'retention_time(min)', one row for each scan of the run
+    @param expanded_theoretical_mass_table_df: theoretical table used for the matching
+    @param orig_datafile_nickname:
+    @return: table with columns CHROMATOGRAM_COLUMNS and 'orig_file', sorted by ID, theor_m/z, ion and retention time
+    """
+    scan_positions, theor_rows, abundance, weighted_mz = points
+    theoretical_part = expanded_theoretical_mass_table_df.iloc[theor_rows]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        exp_mz = np.where(abundance > 0, weighted_mz / abundance, np.nan)
+    chromatogram_df = pd.DataFrame({'theor_m/z': theoretical_part['theor_m/z'].to_numpy(dtype=np.float64),
+                                    'ID': theoretical_part['ID'].to_numpy().astype('int32'),
+                                    'name': theoretical_part['name'].array,
+                                    'ion': theoretical_part['ion'].array,
+                                    'charge': theoretical_part['charge'].array,
+                                    'scan': pd.Categorical.from_codes(scan_positions, dtype=pd.CategoricalDtype(scans_df['scan'].astype(str))),
+                                    'retention_time(min)': scans_df['retention_time(min)'].to_numpy(dtype=np.float64)[scan_positions],
+                                    'exp_m/z': exp_mz,
+                                    'Abundance': abundance,
+                                    'warning': theoretical_part['warning'].array})
+    chromatogram_df = chromatogram_df.sort_values(by=['ID', 'theor_m/z', 'ion', 'retention_time(min)'], kind='stable').reset_index(drop=True)
+    chromatogram_df['orig_file'] = pd.Categorical.from_codes(np.zeros(len(chromatogram_df.index), dtype='int8'), categories=[orig_datafile_nickname])
+    return chromatogram_df
+
+
+def integrate_chromatograms(chromatogram_df: pd.DataFrame, retention_times) -> pd.DataFrame:
+    """
+    integrates extracted-ion chromatograms of all ions at once. Abundance of each ion is the area of its chromatogram
+    (abundance x minutes, see retention_time_weights), m/z is the abundance-weighted mean over scans.
+    Result has the same columns as matched results of a single spectrum (see engine.process_raw_compared_data),
+    so runs can be aggregated together with other experimental files.
+
+    @param chromatogram_df: table from build_chromatogram_table
+    @param retention_times: retention times of all scans of the run in order of categories of column 'scan'
+    @return: table with one row for each matched ion with columns 'theor_m/z', 'exp_m/z', 'ID', 'name', 'ion', 'charge', 'Abundance', 'warning',
+        'apex_retention_time(min)', 'apex_abundance', 'scans' (number of scans with the ion) and 'orig_file'
+    """
+    scan_weights = retention_time_weights(retention_times)
+    abundance = chromatogram_df['Abundance'].to_numpy(dtype=np.float64)
+    # rows of one ion are next to each other (sorted by ID, theor_m/z and ion), a new group starts where any of them changes
+    ion_codes = pd.factorize(chromatogram_df['ion'])[0]
+    ids = chromatogram_df['ID'].to_numpy()
+    theor_mz = chromatogram_df['theor_m/z'].to_numpy()
+    is_first_point = np.r_[True, (ids[1:] != ids[:-1]) | (theor_mz[1:] != theor_mz[:-1]) | (ion_codes[1:] != ion_codes[:-1])] if len(ids) else np.empty(0, dtype=bool)
+    group_codes = np.cumsum(is_first_point) - 1
+    n_groups = int(is_first_point.sum())
+
+    areas = np.bincount(group_codes, abundance * scan_weights[chromatogram_df['scan'].cat.codes.to_numpy()], n_groups)
+    abundance_sums = np.bincount(group_codes, abundance, n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        exp_mz = np.bincount(group_codes, np.nan_to_num(chromatogram_df['exp_m/z'].to_numpy(dtype=np.float64)) * abundance, n_groups) / abundance_sums
+    # apex is the point with the highest abundance within each group (the first one in case of ties)
+    apex_order = np.lexsort((-abundance, group_codes))
+    apex_points = apex_order[np.r_[True, group_codes[apex_order][1:] != group_codes[apex_order][:-1]]] if len(apex_order) else apex_order
+
+    first_points_df = chromatogram_df.loc[is_first_point]
+    integrated_df = pd.DataFrame({'theor_m/z': first_points_df['theor_m/z'].to_numpy(),
+                                  'exp_m/z': exp_mz,
+                                  'ID': first_points_df['ID'].to_numpy(),
+                                  'name': first_points_df['name'].array,
+                                  'ion': first_points_df['ion'].array,
+                                  'charge': first_points_df['charge'].array,
+                                  'Abundance': areas,
+                                  'warning': first_points_df['warning'].array,
+                                  'apex_retention_time(min)': chromatogram_df['retention_time(min)'].to_numpy()[apex_points],
+                                  'apex_abundance': abundance[apex_points],
+                                  'scans': np.bincount(group_codes, minlength=n_groups).astype('int32'),
+                                  'orig_file': first_points_df['orig_file'].array})
+    return integrated_df
+
+
+def match_chromatograms(batches, scans_df_builder, theoretical_index, abundance_threshold: float, tolerance_of_mass,
+                        orig_datafile_nickname: str, matching_mode: str = 'nearest') -> tuple:
+    """
+    matches all batches of one run, then builds and integrates chromatograms
+
+    @param batches: iterable of tuples (m/z, abundance, scan positions)
+    @param scans_df_builder: function without arguments returning table of scans (columns 'scan', 'retention_time(min)'), called after all batches were matched
+    @param theoretical_index: TheoreticalIndex built for expanded theoretical table (or the table itself)
+    @param abundance_threshold: peaks with lower abundance are not matched
+    @param tolerance_of_mass: MassTolerance or mass accuracy in Da
+    @param orig_datafile_nickname:
+    @param matching_mode: 'nearest' or 'all', see match_peak_batch
+    @return: tuple (integrated matched results, table of chromatograms), see integrate_chromatograms and build_chromatogram_table
+    """
+    if not isinstance(theoretical_index, TheoreticalIndex):
+        theoretical_index = TheoreticalIndex(theoretical_index)
+    list_of_batch_points = [match_peak_batch(mz, abundance, scan_positions, theoretical_index, abundance_threshold, tolerance_of_mass, matching_mode)
+                            for mz, abundance, scan_positions in batches]
+    scans_df = scans_df_builder()
+    chromatogram_df = build_chromatogram_table(combine_batches(list_of_batch_points, len(theoretical_index)),
+                                               scans_df, theoretical_index.table, orig_datafile_nickname)
+    return (integrate_chromatograms(chromatogram_df, scans_df['retention_time(min)']), chromatogram_df)
+
+
+def batch_of_scans(numbered_scans: list[tuple]) -> tuple:
+    """
+    @param numbered_scans: list of tuples (position of the scan within the run, spectrum_formats.Scan)
+    @return: tuple (m/z, abundance, scan positions) with concatenated peaks of the scans
+    """
+    return (np.concatenate([scan.mz for _, scan in numbered_scans]),
+            np.concatenate([scan.intensity for _, scan in numbered_scans]),
+            np.repeat([position for position, _ in numbered_scans], [len(scan.mz) for _, scan in numbered_scans]))
+
+
+def match_lcms_run(source, theoretical_index, abundance_threshold: float, tolerance_of_mass, orig_datafile_nickname: str,
+                   matching_mode: str = 'nearest', ms_level: int = 1, batch_size: int = CHROMATOGRAM_BATCH_SIZE) -> tuple:
+    """
+    streams scans of a spectrum file and matches them by batches of batch_size peaks, only scan IDs and retention times
+    and matched points are kept for the whole run
+
+    @param source: path or file-like object with mzML, mzXML or MGF file
+    @param theoretical_index: TheoreticalIndex built for expanded theoretical table (or the table itself)
+    @param abundance_threshold: peaks with lower abundance are not matched
+    @param tolerance_of_mass: MassTolerance or mass accuracy in Da
+    @param orig_datafile_nickname:
+    @param matching_mode: 'nearest' or 'all', see match_peak_batch
+    @param ms_level: MS level of matched scans
+    @param batch_size: number of peaks matched at once
+    @return: tuple (integrated matched results, table of chromatograms)
+    """
+    scan_ids, retention_times = [], []
+
+    def iter_batches():
+        buffered_scans, n_buffered_peaks = [], 0
+        for scan in iter_scans(source, ms_level):
+            buffered_scans.append((len(scan_ids), scan))
+            scan_ids.append(scan.scan_id)
+            retention_times.append(scan.retention_time)
+            n_buffered_peaks += len(scan.mz)
+            if n_buffered_peaks >= batch_size:
+                yield batch_of_scans(buffered_scans)
+                buffered_scans, n_buffered_peaks = [], 0
+        if buffered_scans:
+            yield batch_of_scans(buffered_scans)
+
+    return match_chromatograms(iter_batches(), lambda: build_scans_table(scan_ids, retention_times), theoretical_index, abundance_threshold, tolerance_of_mass,
+                               orig_datafile_nickname, matching_mode)
+
+
+def match_scan_peaks_table(scan_peaks_df: pd.DataFrame, theoretical_index, abundance_threshold: float, tolerance_of_mass,
+                           orig_datafile_nickname: str, matching_mode: str = 'nearest', batch_size: int = CHROMATOGRAM_BATCH_SIZE) -> tuple:
+    """
+    matches LC-MS run which is already loaded as a long table of scan peaks (e.g. uploaded file in the app).
+    The table is already concatenated with scan codes, it is matched by slices of batch_size rows to bound temporary memory.
+    Retention times of all scans (also of scans without peaks, which have one empty row) are taken from the table,
+    so the result is the same as from match_lcms_run of the original file.
+    Unlike match_lcms_run (used by the CLI), the whole run is in memory, the app needs the table also for plots of scan peaks.
+
+    @param scan_peaks_df: table from spectrum_formats.read_scan_peaks
+    @param theoretical_index: TheoreticalIndex built for expanded theoretical table (or the table itself)
+    @param abundance_threshold: peaks with lower abundance are not matched
+    @param tolerance_of_mass: MassTolerance or mass accuracy in Da
+    @param orig_datafile_nickname:
+    @param matching_mode: 'nearest' or 'all', see match_peak_batch
+    @param batch_size: number of peaks matched at once
+    @return: tuple (integrated matched results, table of chromatograms)
+    """
+    scan_codes = scan_peaks_df['scan'].cat.codes.to_numpy()
+    mz = scan_peaks_df['exp_m/z'].to_numpy()
+    abundance = scan_peaks_df['Abundance'].to_numpy()
+    batches = ((mz[start:start + batch_size], abundance[start:start + batch_size], scan_codes[start:start + batch_size])
+               for start in range(0, len(scan_codes), batch_size))
+
+    def scans_table() -> pd.DataFrame:
+        # retention time of each scan from its first row, scans which are not in the table at all have no retention time
+        first_rows = pd.Series(np.arange(len(scan_codes))).groupby(scan_codes).first()
+        retention_times = np.full(len(scan_peaks_df['scan'].cat.categories), np.nan)
+        retention_times[first_rows.index.to_numpy()] = scan_peaks_df['retention_time(min)'].to_numpy(dtype=np.float64)[first_rows.to_numpy()]
+        return build_scans_table(scan_peaks_df['scan'].cat.categories, retention_times)
+
+    return match_chromatograms(batches, scans_table, theoretical_index, abundance_threshold, tolerance_of_mass,
+                               orig_datafile_nickname, matching_mode)
+
+
+if __name__ == '__main__':
+    pass
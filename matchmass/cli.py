@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: cli.py
+Created on 18.10.2026
+
+Note: command-line batch matcher. Runs the same pipeline as the app for whole directories (or globs) of experimental files.
+Experimental files are read and matched one at a time, only matched rows are kept in memory for the final aggregation.
+
+Example:
+    python -m matchmass files/simulated_theor.xlsx data/ --ions Mplus MplusH MplusNa --mass-accuracy 0.01 -o results/
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+import ions_enum
+from matchmass import engine
+from matchmass.tolerance import mass_tolerance_from_settings
+from matchmass.parallel import iter_matched_files
+from matchmass.file_formats import PYARROW_AVAILABLE
+from matchmass.spectrum_formats import SPECTRUM_FILE_EXTENSIONS
+from matchmass.chromatograms import match_lcms_run
+from matchmass.instrumentation import PipelineProfile, measure_stage
+
+EXPERIMENTAL_FILE_EXTENSIONS = ('.csv', '.xlsx', '.xls') + SPECTRUM_FILE_EXTENSIONS
+
+
+def collect_experimental_paths(inputs: list[str]) -> list[str]:
+    """
+    collects paths of experimental files from directories, glob patterns or paths of single files
+
+    @param inputs: list of directories, glob patterns or file paths
+    @return: sorted list of unique paths of experimental files, order of inputs is kept
+    """
+    collected_paths = []
+    for user_input in inputs:
+        if os.path.isdir(user_input):
+            paths = [os.path.join(user_input, name) for name in os.listdir(user_input)]
+        else:
+            paths = glob.glob(user_input)
+        paths = sorted(path for path in paths
+                       if os.path.isfile(path) and path.lower().endswith(EXPERIMENTAL_FILE_EXTENSIONS))
+        collected_paths.extend(path for path in paths if path not in collected_paths)
+    return collected_paths
+
+
+def read_per_file_settings(settings_path: str) -> pd.DataFrame:
+    """
+    reads table with per-file mass accuracy and abundance threshold.
+    Table has to contain columns 'orig_name', 'mass_accuracy(Da)' and 'abund_thrs' (the same as overview table in results),
+    optional columns 'tolerance_model', 'mass_accuracy(ppm)' and 'calibration_curve' select other model of mass accuracy
+
+    @param settings_path: path to CSV or Excel file with settings
+    @return: dataframe with settings indexed by original file name
+    """
+    settings_df = engine.read_excel_or_csv(settings_path)
+    missing_columns = {'orig_name', 'mass_accuracy(Da)', 'abund_thrs'} - set(settings_df.columns)
+    if missing_columns:
+        raise ValueError(f"Settings file is missing columns: {', '.join(sorted(missing_columns))}")
+    return settings_df.set_index('orig_name')
+
+
+def write_table(df: pd.DataFrame, output_dir: str, table_name: str, table_format: str) -> None:
+    """
+    writes one table with results, warning codes are written as full messages
+
+    @param df:
+    @param output_dir: directory for results
+    @param table_name: name of the file without extension
+    @param table_format: 'csv' or 'parquet'
+    @return: None
+    """
+    path = os.path.join(output_dir, table_name + '.' + table_format)
+    if table_format == 'parquet':
+        engine.render_warning_messages(df).to_parquet(path, index=False)
+    else:
+        engine.render_warning_messages(df).to_csv(path, index=False)
+
+
+def get_settings_for_file(orig_name: str, settings_df: pd.DataFrame, args: argparse.Namespace) -> tuple:
+    """
+    provides mass accuracy and abundance threshold for one file, per-file settings take precedence over global values
+
+    @param orig_name: file name of experimental file
+    @param settings_df: per-file settings or None
+    @param args: parsed command-line arguments with global values
+    @return: tuple (MassTolerance, abundance threshold)
+    """
+    if settings_df is not None and orig_name in settings_df.index:
+        file_settings = settings_df.loc[orig_name]
+        tolerance_of_mass = mass_tolerance_from_settings(file_settings.get('tolerance_model', 'Da'),
+                                                         file_settings['mass_accuracy(Da)'],
+                                                         file_settings.get('mass_accuracy(ppm)', np.nan),
+                                                         file_settings.get('calibration_curve', ''))
+        abundance_threshold = file_settings['abund_thrs']
+    elif args.calibration is not None:
+        tolerance_of_mass = mass_tolerance_from_settings('calibration', np.nan, np.nan, args.calibration)
+        abundance_threshold = args.abundance_threshold
+    elif args.ppm is not None:
+        tolerance_of_mass = mass_tolerance_from_settings('ppm', np.nan, args.ppm)
+        abundance_threshold = args.abundance_threshold
+    else:
+        tolerance_of_mass = mass_tolerance_from_settings('Da', np.nan if args.mass_accuracy is None else args.mass_accuracy)
+        abundance_threshold = args.abundance_threshold
+    if tolerance_of_mass.model != 'calibration' and pd.isna(tolerance_of_mass.value):
+        raise ValueError(f"Mass accuracy is not defined for file '{orig_name}'. Use --mass-accuracy, --ppm, --calibration or --settings.")
+    return (tolerance_of_mass, float(abundance_threshold))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    defines command-line arguments
+
+    @return: argument parser
+    """
+    parser = argparse.ArgumentParser(prog='matchmass',
+                                     description='Match experimental MS data with theoretical m/z values of chosen ions.')
+    parser.add_argument('theoretical', help='CSV or Excel file with names of molecules and their monoisotopic masses (or m/z)')
+    parser.add_argument('experimental', nargs='+',
+                        help='directories, glob patterns or paths of CSV/Excel files with experimental m/z and abundance '
+                             'or of mzML/mzXML/MGF spectrum files (their MS1 scans are summed, see --lcms)')
+    parser.add_argument('--ions', nargs='+', required=True, choices=[ion.name for ion in ions_enum.Ion], metavar='ION',
+                        help='names of ions to add to theoretical table: ' + ', '.join(ion.name for ion in ions_enum.Ion))
+    tolerance_group = parser.add_mutually_exclusive_group()
+    tolerance_group.add_argument('--mass-accuracy', type=float, default=None,
+                                 help='mass accuracy (Da) used for all files without per-file settings')
+    tolerance_group.add_argument('--ppm', type=float, default=None,
+                                 help='mass accuracy (ppm of m/z) used for all files without per-file settings')
+    tolerance_group.add_argument('--calibration', default=None,
+                                 help="mass accuracy (Da) interpolated from calibration curve, e.g. '100:0.002,1000:0.01'")
+    parser.add_argument('--abundance-threshold', type=float, default=0.0,
+                        help='abundance threshold used for all files without per-file settings (default: 0)')
+    parser.add_argument('--settings', default=None,
+                        help="CSV or Excel file with per-file columns 'orig_name', 'mass_accuracy(Da)' and 'abund_thrs'")
+    parser.add_argument('-o', '--output-dir', default='matchmass_results',
+                        help='directory for results (default: matchmass_results)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='number of processes for matching files in parallel, 0 means number of CPUs (default: 1)')
+    parser.add_argument('--all-candidates', action='store_true',
+                        help='keep every theoretical m/z within mass accuracy (ranked by mass error), not only the nearest one')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='read CSV files by parts of this number of rows, so very large peak lists do not have to fit in memory')
+    parser.add_argument('--float32-abundance', action='store_true',
+                        help='keep abundances as 32-bit floats to save memory with many large files')
+    parser.add_argument('--lcms', action='store_true',
+                        help='match every MS1 scan of spectrum files and integrate abundances of ions over retention time, '
+                             'extracted-ion chromatograms are written as <file>_eic tables. Scans are streamed, so the run does not have to fit in memory')
+    parser.add_argument('--table-format', choices=['csv', 'parquet'], default='csv',
+                        help='format of files with results, parquet needs pyarrow (default: csv)')
+    parser.add_argument('--excel', action='store_true',
+                        help='write also Excel file with all results in the same form as download from the app')
+    parser.add_argument('--profile', default=None, metavar='JSON',
+                        help='write time, number of rows and peak memory of each stage (and file) to this JSON file. '
+                             'With more workers, matching of a file is measured as waiting for its result')
+    return parser
+
+
+def main(argv: list[str] = None) -> int:
+    """
+    runs the batch matching
+
+    @param argv: command-line arguments, sys.argv is used if None
+    @return: exit code
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.workers < 0:
+        parser.error('number of workers cannot be negative')
+    if args.chunk_size is not None and args.chunk_size < 1:
+        parser.error('chunk size has to be a positive number')
+    if args.table_format == 'parquet' and not PYARROW_AVAILABLE:
+        parser.error('parquet format needs pyarrow, install it or use csv format')
+    args.workers = args.workers or None
+
+    experimental_paths = collect_experimental_paths(args.experimental)
+    if not experimental_paths:
+        parser.error('no experimental files were found')
+    try:
+        settings_df = read_per_file_settings(args.settings) if args.settings else None
+        settings_of_files = [get_settings_for_file(os.path.basename(path), settings_df, args) for path in experimental_paths]
+    except ValueError as error:
+        parser.error(str(error))
+
+    profile = PipelineProfile() if args.profile else None
+
+    # prepare full table of theoretical masses, the largest mass accuracy is needed for warnings
+    with measure_stage(profile, 'read_theoretical') as record:
+        theoretical_mass_table_df = engine.load_theoretical_table(args.theoretical)
+        record['rows'] = len(theoretical_mass_table_df.index)
+    with measure_stage(profile, 'add_ions') as record:
+        expanded_theoretical_mass_table_df = engine.add_ions_to_theoretical_table(theoretical_mass_table_df,
+                                                                                  engine.ions_selection_from_names(args.ions))
+        record['rows'] = len(expanded_theoretical_mass_table_df.index)
+    max_theoretical_mz = expanded_theoretical_mass_table_df['theor_m/z'].max()
+    max_mass_accur_value = max(tolerance_of_mass.largest_window(max_theoretical_mz) for tolerance_of_mass, _ in settings_of_files)
+    with measure_stage(profile, 'warnings') as record:
+        expanded_theoretical_mass_table_df = engine.raise_warning_for_masses_within_accuracy(expanded_theoretical_mass_table_df,
+                                                                                             max_mass_accur_value)
+        record['rows'] = len(expanded_theoretical_mass_table_df.index)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    experimental_dfs_additional_info_df = pd.DataFrame()
+    dict_containing_matched_experimental_dfs = {}
+    dict_containing_chromatograms = {}
+
+    nicknames = ['file' + str(i) for i in range(1, len(experimental_paths) + 1)]
+    for path, nick in zip(experimental_paths, nicknames):
+        experimental_dfs_additional_info_df = engine.generate_additional_info_table(experimental_dfs_additional_info_df,
+                                                                                   os.path.basename(path), nick)
+
+    # files are read by the process which matches them, experimental data are dropped as soon as the file is matched
+    # LC-MS runs are streamed scan by scan in this process, the other files are matched by workers meanwhile
+    is_lcms_run = [args.lcms and path.lower().endswith(SPECTRUM_FILE_EXTENSIONS) for path in experimental_paths]
+    tasks = [(path, abundance_threshold, tolerance_of_mass, nick)
+             for path, (tolerance_of_mass, abundance_threshold), nick, lcms_run in zip(experimental_paths, settings_of_files, nicknames, is_lcms_run)
+             if not lcms_run]
+    matched_files = iter_matched_files(tasks, expanded_theoretical_mass_table_df, args.workers,
+                                       'all' if args.all_candidates else 'nearest',
+                                       'float32' if args.float32_abundance else None,
+                                       args.chunk_size)
+    theoretical_index = engine.build_theoretical_index(expanded_theoretical_mass_table_df) if any(is_lcms_run) else None
+    for path, nick, (tolerance_of_mass, abundance_threshold), lcms_run in zip(experimental_paths, nicknames, settings_of_files, is_lcms_run):
+        with measure_stage(profile, 'read_and_match', nick) as record:
+            if lcms_run:
+                compared_data, chromatogram_df = match_lcms_run(path, theoretical_index, abundance_threshold, tolerance_of_mass, nick,
+                                                                'all' if args.all_candidates else 'nearest')
+            else:
+                try:
+                    compared_data = next(matched_files)
+                except ValueError as error:
+                    parser.exit(1, f'{parser.prog}: error: {error}\n')
+            record['rows'] = len(compared_data.index)
+        if lcms_run:
+            with measure_stage(profile, 'write_tables', nick) as record:
+                write_table(chromatogram_df, args.output_dir, nick + engine.CHROMATOGRAM_KEY_SUFFIX, args.table_format)
+                record['rows'] = len(chromatogram_df.index)
+            dict_containing_chromatograms[nick + engine.CHROMATOGRAM_KEY_SUFFIX] = chromatogram_df
+        with measure_stage(profile, 'write_tables', nick) as record:
+            write_table(compared_data, args.output_dir, nick + '_matched', args.table_format)
+            record['rows'] = len(compared_data.index)
+        dict_containing_matched_experimental_dfs[nick] = compared_data
+        if lcms_run:
+            print(f'{nick}: {path} -> {len(compared_data)} matched ions in {len(chromatogram_df)} points of chromatograms')
+        else:
+            print(f'{nick}: {path} -> {len(compared_data)} matched signals')
+
+    # settings are filled after all rows were added because new row resets columns with settings
+    tolerances_of_files = [tolerance_of_mass for tolerance_of_mass, _ in settings_of_files]
+    experimental_dfs_additional_info_df['mass_accuracy(Da)'] = [tolerance.value if tolerance.model == 'Da' else np.nan for tolerance in tolerances_of_files]
+    experimental_dfs_additional_info_df['abund_thrs'] = [abundance_threshold for _, abundance_threshold in settings_of_files]
+    experimental_dfs_additional_info_df['tolerance_model'] = [tolerance.model for tolerance in tolerances_of_files]
+    experimental_dfs_additional_info_df['mass_accuracy(ppm)'] = [tolerance.value if tolerance.model == 'ppm' else np.nan for tolerance in tolerances_of_files]
+    experimental_dfs_additional_info_df['calibration_curve'] = [', '.join(f'{mz}:{accuracy}' for mz, accuracy in tolerance.calibration_curve)
+                                                                for tolerance in tolerances_of_files]
+    aggregated_matched_files_summary_df = engine.aggregate_matched_files(list(dict_containing_matched_experimental_dfs.values()), profile)
+
+    with measure_stage(profile, 'write_tables') as record:
+        write_table(experimental_dfs_additional_info_df, args.output_dir, 'overview', args.table_format)
+        write_table(expanded_theoretical_mass_table_df, args.output_dir, 'theoretical_table', args.table_format)
+        write_table(aggregated_matched_files_summary_df, args.output_dir, 'aggregated_results', args.table_format)
+        record['rows'] = len(aggregated_matched_files_summary_df.index)
+    if args.excel:
+        with measure_stage(profile, 'export_excel') as record:
+            engine.write_results_to_excel(os.path.join(args.output_dir, 'results_matched.xlsx'),
+                                          experimental_dfs_additional_info_df,
+                                          expanded_theoretical_mass_table_df,
+                                          aggregated_matched_files_summary_df,
+                                          {**dict_containing_matched_experimental_dfs, **dict_containing_chromatograms})
+            record['rows'] = len(aggregated_matched_files_summary_df.index)
+    print(f'Results were written to {args.output_dir}')
+    if profile is not None:
+        with open(args.profile, 'w') as file:
+            json.dump(profile.to_dict(), file, indent=2)
+        print(f'Profile of stages was written to {args.profile}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: decimation.py
+Created on 18.10.2026
+
+Note: decimation of spectra before plotting. Shown m/z range is divided into bins of about one pixel
+and only the most abundant peak of each bin is kept, so the plot looks the same, but the browser gets
+at most a few thousands of points instead of millions. Kept points are real peaks, their m/z and abundance are not changed.
+When a narrower m/z range is picked, the bins are narrower too, so details appear on zooming.
+"""
+import numpy as np
+import pandas as pd
+
+# about the number of horizontal pixels of a wide plot
+DEFAULT_NUMBER_OF_BINS = 4000
+
+
+def decimate_peaks(mz, abundance=None, number_of_bins: int = DEFAULT_NUMBER_OF_BINS, mz_range: tuple = None) -> np.ndarray:
+    """
+    finds positions of the most abundant peak in each m/z bin
+
+    @param mz: array of m/z values
+    @param abundance: array of abundances, None keeps the first peak of each bin (e.g. for theoretical m/z)
+    @param number_of_bins: number of bins within the m/z range, it is also the largest number of kept peaks. None keeps all peaks in the range
+    @param mz_range: tuple (lowest m/z, highest m/z) of the shown range, None means the whole range of values
+    @return: sorted positions of kept peaks
+    """
+    mz = np.asarray(mz, dtype=np.float64)
+    in_range = np.isfinite(mz)
+    if mz_range is not None:
+        in_range &= (mz >= mz_range[0]) & (mz <= mz_range[1])
+    positions = np.flatnonzero(in_range)
+    if number_of_bins is None or len(positions) <= number_of_bins:
+        return positions
+
+    mz = mz[positions]
+    lowest_mz, highest_mz = (mz.min(), mz.max()) if mz_range is None else mz_range
+    bin_width = (highest_mz - lowest_mz) / number_of_bins or 1.0
+    bins = np.minimum(((mz - lowest_mz) / bin_width).astype(np.int64), number_of_bins - 1)
+
+    # candidates are peaks with the largest abundance of their bin, the first candidate of each bin is kept
+    candidates = np.arange(len(positions))
+    if abundance is not None:
+        abundance = np.nan_to_num(np.asarray(abundance, dtype=np.float64)[positions], nan=-np.inf)
+        largest_abundance_in_bin = np.full(number_of_bins, -np.inf)
+        np.maximum.at(largest_abundance_in_bin, bins, abundance)
+        candidates = np.flatnonzero(abundance == largest_abundance_in_bin[bins])
+    _, first_candidate_in_bin = np.unique(bins[candidates], return_index=True)
+    return np.sort(positions[candidates[first_candidate_in_bin]])
+
+
+def decimate_spectrum(df: pd.DataFrame, mz_column: str, abundance_column: str = None,
+                      number_of_bins: int = DEFAULT_NUMBER_OF_BINS, mz_range: tuple = None) -> pd.DataFrame:
+    """
+    keeps only the most abundant peak of each m/z bin, see decimate_peaks
+
+    @param df: table with peaks
+    @param mz_column: name of column with m/z values
+    @param abundance_column: name of column with abundances, None keeps the first row of each bin
+    @param number_of_bins:
+    @param mz_range:
+    @return: rows of the table with kept peaks
+    """
+    abundance = None if abundance_column is None else df[abundance_column].to_numpy()
+    return df.iloc[decimate_peaks(df[mz_column].to_numpy(), abundance, number_of_bins, mz_range)]
+
+
+if __name__ == '__main__':
+    pass
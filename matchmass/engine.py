@@ -0,0 +1,1197 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: engine.py
+Created on 18.10.2026
+
+Note: headless matching engine. Definitions for functions which load, expand, match, aggregate and export the data.
+Only pandas and NumPy are used here, so the engine can be imported without Streamlit (e.g. in batch jobs).
+"""
+import os
+import tempfile
+import zipfile
+import pandas as pd
+import numpy as np
+from io import BytesIO, TextIOWrapper
+import ions_enum
+from matchmass.file_formats import sniff_table_format, read_csv_table, PYARROW_AVAILABLE
+from matchmass.spectrum_formats import is_spectrum_source, read_summed_spectrum, read_scan_peaks, split_scan_peaks
+from matchmass.chromatograms import is_scan_peaks_table, match_scan_peaks_table
+from matchmass.theoretical_index import TheoreticalIndex
+from matchmass.results_store import MatchedRows, LazyMatchedResults, materialize_matched_rows
+from matchmass.tolerance import mass_tolerance_from_settings, tolerance_window
+from matchmass.instrumentation import measure_stage
+from matchmass.validation import validate_matching_inputs, files_without_errors, describe_errors
+
+# 'nearest' matches only the closest theoretical m/z to each experimental signal, 'all' keeps every candidate within mass accuracy
+MATCHING_MODES = ('nearest', 'all')
+# spectrum files (mzML, mzXML, MGF) are used as one summed spectrum, each scan is used as a separate experimental file
+# or the file is matched as LC-MS run (every scan is matched and abundances of ions are integrated over retention time, see matchmass.chromatograms)
+SPECTRUM_MODES = ('sum', 'scans', 'chromatogram')
+# suffix of keys of tables with extracted-ion chromatograms in matched results of LC-MS runs
+CHROMATOGRAM_KEY_SUFFIX = '_eic'
+# columns describing candidates in 'all' matching mode
+CANDIDATE_RANKING_COLUMNS = ['mass_error(Da)', 'mass_error(ppm)', 'candidate_rank']
+# warnings are kept as short codes in categorical column 'warning', messages replace them only when tables are shown or exported
+WARNING_MESSAGES = {
+    'close_mz': 'Possibility of wrong matching! Difference from previous or following theor_m/z in full theoretical table is lower than the largest mass accuracy value set by user',
+    'ions_sum': 'this line contains sum of abundances within particular file and molecule ID'
+}
+
+
+def read_excel_or_csv(file_path_or_buffer, float64_columns: tuple = ()) -> pd.DataFrame:
+    """
+    reads CSV or Excel file to a dataframe, format is recognised from the content of the file (see matchmass.file_formats)
+
+    @param file_path_or_buffer: path to a file or file-like object (e.g. a Streamlit UploadedFile object)
+    @param float64_columns: positions of columns which are read as float64 from CSV files
+    @return: pd.DataFrame
+    """
+    if sniff_table_format(file_path_or_buffer) == 'excel':
+        df_from_uploaded_file = pd.read_excel(file_path_or_buffer)
+    else:
+        df_from_uploaded_file = read_csv_table(file_path_or_buffer, float64_columns)
+    return df_from_uploaded_file
+
+
+def read_table_from_source(source, float64_columns: tuple = ()) -> pd.DataFrame:
+    """
+    reads table from any supported source to a dataframe.
+    Supported sources are path to CSV or Excel file, file-like object, DataFrame,
+    2D array with columns in the same order as in the files or tuple/list of 1D arrays (one per column)
+
+    @param source: path, file-like object, pd.DataFrame, 2D np.ndarray or tuple of 1D arrays
+    @param float64_columns: positions of columns which are read as float64 from CSV files
+    @return: pd.DataFrame
+    """
+    if isinstance(source, pd.DataFrame):
+        df_from_source = source.copy()
+    elif isinstance(source, np.ndarray):
+        df_from_source = pd.DataFrame(source)
+    elif isinstance(source, (tuple, list)):
+        df_from_source = pd.DataFrame(dict(enumerate(source)))
+    else:
+        df_from_source = read_excel_or_csv(source, float64_columns)
+    return df_from_source
+
+
+def get_source_name(source, default_name: str) -> str:
+    """
+    provides name of the source of data, i.e. file name for paths and file-like objects
+
+    @param source: path, file-like object or in-memory data
+    @param default_name: name used for sources without any name (arrays, dataframes)
+    @return: name of the source
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(source)
+    return os.path.basename(str(getattr(source, 'name', default_name)))
+
+
+def rename_original_columns(df: pd.DataFrame, new_column_names: list[str]) -> pd.DataFrame:
+    """
+    takes DataFrame and renames its columns to desired names
+
+    @param df:
+    @param new_column_names: list of new column names
+    @return: original dataframe with renamed columns
+    """
+    columns_dict = dict(zip(list(df.columns), new_column_names))
+    df = df.rename(columns=columns_dict)
+    return df
+
+
+def additional_columns_to_theoretical_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    function will add necessary columns to df with theoretical monoisotopic masses.
+    1. For each row (should correspond to unique mass and molecule) is added ID number
+    2. Name of ions is set to Orig_M indicating it is original mass provided by user.
+    3. Columns for charge and warning are added
+    4. columns are rearranged to desired order
+    Repeated strings (name, ion, warning) are stored as categorical columns and ID as int32 to keep all derived tables small.
+
+    @param df: theoretical values dataframe containing 2 original renamed columns
+    @return: theoretical values dataframe extended with new columns ('ID','ion','charge','warning')
+        and rearranged to desired order ('name','ID','ion','charge','theor_m/z','warning')
+    """
+    df['ID'] = np.arange(1, len(df.index) + 1, dtype='int32')   # ID numbers starts with 1
+    df['ion'] = pd.Categorical(['orig_M'] * len(df.index))
+    cols_list_reindex = ['name', 'ID', 'ion', 'charge', 'theor_m/z', 'warning']
+    df = df.reindex(columns=cols_list_reindex)
+    df['name'] = df['name'].astype('category')
+    df['warning'] = pd.Categorical.from_codes(np.full(len(df.index), -1), categories=list(WARNING_MESSAGES))
+    return df
+
+
+def generate_additional_info_table(df: pd.DataFrame, orig_name: str, nick: str) -> pd.DataFrame:
+    """
+    add new row and values to the df which holds additional information about experimental files
+
+    @param df: df_experimental_dfs_additional_info
+    @param orig_name: original name of one of the experimental files
+    @param nick: nickname of the file for further processing
+    @return: df_experimental_dfs_additional_info extended by one new row
+    """
+    df.loc[len(df.index), 'nickname'] = nick
+    df.set_index('nickname', drop=False, inplace=True)
+    df.loc[nick, 'orig_name'] = orig_name
+    # Add columns for mass accuracy and abundance threshold to the df with additional information.
+    # Columns has to be added before allowing user to input the values.
+    df['mass_accuracy(Da)'] = np.nan
+    df['abund_thrs'] = np.nan
+    # model of mass accuracy ('Da', 'ppm' or 'calibration') and its parameters, see matchmass.tolerance
+    df['tolerance_model'] = 'Da'
+    df['mass_accuracy(ppm)'] = np.nan
+    df['calibration_curve'] = ''
+    return df
+
+
+def add_scans_to_additional_info_table(df: pd.DataFrame, orig_names: list, nicks: list, retention_times: list, precursor_mzs: list) -> pd.DataFrame:
+    """
+    add rows for all scans of one spectrum file at once (adding thousands of scans row by row is slow),
+    the rows have the same columns as from generate_additional_info_table and also retention time and precursor m/z of scans
+
+    @param df: df_experimental_dfs_additional_info
+    @param orig_names: names of scans (name of spectrum file and scan ID)
+    @param nicks: nicknames of scans for further processing
+    @param retention_times: retention times of scans in minutes
+    @param precursor_mzs: precursor m/z of scans (NaN for MS1 scans)
+    @return: df_experimental_dfs_additional_info extended by rows of scans
+    """
+    scans_df = pd.DataFrame({'nickname': nicks, 'orig_name': orig_names, 'mass_accuracy(Da)': np.nan, 'abund_thrs': np.nan,
+                             'tolerance_model': 'Da', 'mass_accuracy(ppm)': np.nan, 'calibration_curve': '',
+                             'retention_time(min)': retention_times, 'precursor_m/z': precursor_mzs},
+                            index=pd.Index(nicks, name='nickname'))
+    if df.empty:
+        return scans_df
+    return pd.concat([df, scans_df])
+
+
+def load_theoretical_table(source) -> pd.DataFrame:
+    """
+    Reads table with theoretical values and ads columns with ion name and molecule ID etc.
+
+    @param source: path, file-like object, DataFrame or arrays with names of molecules and their monoisotopic masses
+    @return: dataframe with table of theoretical monoisotopic masses, molecule names and newly generated ID numbers for each molecule
+    """
+    theoretical_mass_table_df = read_table_from_source(source, float64_columns=(1,))
+
+    theoretical_mass_table_df = rename_original_columns(theoretical_mass_table_df, ['name', 'theor_m/z'])
+
+    theoretical_mass_table_df = additional_columns_to_theoretical_table(theoretical_mass_table_df)
+
+    return theoretical_mass_table_df
+
+
+def load_experimental_table(source, abundance_dtype: str = None, ms_level: int = 1) -> pd.DataFrame:
+    """
+    Reads one table with experimental results and renames columns to correct names.
+    Scans of spectrum files (mzML, mzXML, MGF) are summed into one spectrum (see matchmass.spectrum_formats.sum_scans).
+
+    @param source: path, file-like object, DataFrame or arrays with experimental m/z values and abundances
+    @param abundance_dtype: dtype for column 'Abundance', e.g. 'float32' to halve its memory, None keeps dtype as read
+        (m/z values are always kept as they are, precision of float32 is not sufficient for them)
+    @param ms_level: MS level of summed scans of spectrum files
+    @return: dataframe with columns 'exp_m/z' and 'Abundance', columns with text cells are kept as text for validation
+    """
+    if is_spectrum_source(source):
+        single_exp_file_df = read_summed_spectrum(source, ms_level)
+    else:
+        single_exp_file_df = read_table_from_source(source, float64_columns=(0, 1))
+    single_exp_file_df = rename_original_columns(single_exp_file_df, ['exp_m/z', 'Abundance'])
+    if abundance_dtype is not None and pd.api.types.is_numeric_dtype(single_exp_file_df['Abundance']):
+        single_exp_file_df['Abundance'] = single_exp_file_df['Abundance'].astype(abundance_dtype)
+    return single_exp_file_df
+
+
+def read_experimental_table_in_chunks(source, chunk_size: int, abundance_dtype: str = None):
+    """
+    Reads table with experimental results by parts of chunk_size rows and renames columns to correct names.
+    Only CSV files are read by parts, Excel files, spectrum files (summed) and in-memory data are provided as a single chunk.
+
+    @param source: path or file-like object with CSV file, or any other source accepted by load_experimental_table
+    @param chunk_size: number of rows in one chunk
+    @param abundance_dtype: dtype for column 'Abundance', see load_experimental_table
+    @return: generator of dataframes with columns 'exp_m/z' and 'Abundance'
+    @raise ValueError: if a chunk contains cells which are not numbers, see check_numeric_experimental_columns
+    """
+    if isinstance(source, (pd.DataFrame, np.ndarray, tuple, list)) or is_spectrum_source(source) or sniff_table_format(source) == 'excel':
+        yield load_experimental_table(source, abundance_dtype)
+        return
+    for chunk_df in read_csv_table(source, float64_columns=(0, 1), chunk_size=chunk_size):
+        yield check_numeric_experimental_columns(load_experimental_table(chunk_df, abundance_dtype), source)
+
+
+def check_numeric_experimental_columns(single_exp_file_df: pd.DataFrame, source) -> pd.DataFrame:
+    """
+    Experimental tables with text cells are kept as text by load_experimental_table, so the app can report them by validation
+    (see matchmass.validation). Files matched without validation (CLI) are stopped here with a clear message instead.
+
+    @param single_exp_file_df: dataframe from load_experimental_table
+    @param source: source of the table, used in the message
+    @return: the same dataframe
+    @raise ValueError: if column 'exp_m/z' or 'Abundance' contains values which are not numbers
+    """
+    for column_name in ('exp_m/z', 'Abundance'):
+        if not pd.api.types.is_numeric_dtype(single_exp_file_df[column_name]):
+            raise ValueError(f"Column '{column_name}' of file '{getattr(source, 'name', source)}' contains values which are not numbers.")
+    return single_exp_file_df
+
+
+def load_scan_peaks_table(source, abundance_dtype: str = None, table_cache=None, ms_level: int = 1) -> pd.DataFrame:
+    """
+    Reads peaks of all scans of spectrum file (mzML, mzXML, MGF) as one long table, see matchmass.spectrum_formats.read_scan_peaks
+
+    @param source: path or file-like object with spectrum file
+    @param abundance_dtype: dtype for column 'Abundance', see load_experimental_table
+    @param table_cache: matchmass.table_cache.ParquetTableCache with already parsed files, None reads the file again
+    @param ms_level: MS level of read scans
+    @return: table with columns 'scan', 'retention_time(min)', 'precursor_m/z', 'exp_m/z' and 'Abundance'
+    """
+    if table_cache is None:
+        scan_peaks_df = read_scan_peaks(source, ms_level)
+    else:
+        # tables cached before scans without peaks were kept (kind 'scan_peaks_ms') are not used
+        scan_peaks_df = table_cache.load(source, 'all_scan_peaks_ms' + str(ms_level), lambda buffer: read_scan_peaks(buffer, ms_level))
+    if abundance_dtype is not None:
+        scan_peaks_df['Abundance'] = scan_peaks_df['Abundance'].astype(abundance_dtype)
+    return scan_peaks_df
+
+
+def load_scans_of_spectrum_file(source, abundance_dtype: str = None, table_cache=None, ms_level: int = 1):
+    """
+    Reads scans of spectrum file (mzML, mzXML, MGF) as separate experimental tables.
+    All peaks are read (or cached) as one long table and each scan is its slice, see load_scan_peaks_table
+
+    @param source: path or file-like object with spectrum file
+    @param abundance_dtype: dtype for column 'Abundance', see load_experimental_table
+    @param table_cache: matchmass.table_cache.ParquetTableCache with already parsed files, None reads the file again
+    @param ms_level: MS level of read scans
+    @return: generator of tuples (scan ID, retention time in minutes, precursor m/z, dataframe with columns 'exp_m/z' and 'Abundance')
+    """
+    yield from split_scan_peaks(load_scan_peaks_table(source, abundance_dtype, table_cache, ms_level))
+
+
+def load_experimental_files(experimental_sources, abundance_dtype: str = None, table_cache=None, spectrum_mode: str = 'sum', ms_level: int = 1) -> tuple:
+    """
+    Reads all experimental results, then renames columns to correct names.
+    For each experimental file is given nickname to avoid problems with multiple files having the same name.
+    dataframes containing experimental files are collected in a dictionary
+    Additionally, a dictionary with original names is generated for future use in dropdown menu
+    Finally, a dataframe keeping process information for all experimental files is generated
+
+    @param experimental_sources: iterable of paths, file-like objects (e.g. UploadedFile objects), DataFrames or arrays
+    @param abundance_dtype: dtype for column 'Abundance', see load_experimental_table
+    @param table_cache: matchmass.table_cache.ParquetTableCache with already parsed files, None reads all files again
+    @param spectrum_mode: one of SPECTRUM_MODES, 'sum' sums scans of each spectrum file, 'scans' uses each scan as a separate experimental file
+        (named by the file and scan ID, its retention time and precursor m/z are added to the table with additional information),
+        'chromatogram' keeps peaks of all scans of the file in one long table (see load_scan_peaks_table) which is matched as LC-MS run
+    @param ms_level: MS level of scans used from spectrum files (mzML, mzXML), MGF spectra are always used
+    @return: tuple (pd.DataFrame, dict[file_nickname]=pd.DataFrame, dict[orig_filename]= file_nickname )
+    """
+    if spectrum_mode not in SPECTRUM_MODES:
+        raise ValueError(f"Unknown spectrum mode '{spectrum_mode}', use one of: {', '.join(SPECTRUM_MODES)}")
+    # initiate variables (dataframe and dictionaries)
+    experimental_dfs_additional_info_df = pd.DataFrame()               # for storing additional data about dataframes (mass_accuracy, abund_thrs,...)
+    dict_containing_experimental_dfs = {}                              # dictionary for storing imported dataframes
+    dict_experimental_filenames = {}                                   # only needed for dropdown menu
+    i = 0                                                              # to produce consecutive numbering for files
+
+    for source in experimental_sources:
+        is_spectrum_file = is_spectrum_source(source)
+
+        # each scan of a spectrum file is added as a separate experimental file
+        if is_spectrum_file and spectrum_mode == 'scans':
+            source_name = get_source_name(source, 'file' + str(i + 1))
+            scan_names, scan_nicks, retention_times, precursor_mzs = [], [], [], []
+            for scan_id, retention_time, precursor_mz, single_exp_file_df in load_scans_of_spectrum_file(source, abundance_dtype, table_cache, ms_level):
+                i += 1
+                nick = 'file' + str(i)
+                orig_name = source_name + ' ' + str(scan_id)
+                dict_containing_experimental_dfs[nick] = single_exp_file_df
+                dict_experimental_filenames[orig_name] = nick
+                scan_names.append(orig_name)
+                scan_nicks.append(nick)
+                retention_times.append(retention_time)
+                precursor_mzs.append(precursor_mz)
+            experimental_dfs_additional_info_df = add_scans_to_additional_info_table(experimental_dfs_additional_info_df, scan_names, scan_nicks,
+                                                                                     retention_times, precursor_mzs)
+            continue
+
+        # add count and generate new nickname for a file
+        i += 1
+        nick = 'file'+str(i)
+        orig_name = get_source_name(source, nick)
+
+        # read experimental data and rename columns
+        if is_spectrum_file and spectrum_mode == 'chromatogram':
+            dict_containing_experimental_dfs[nick] = load_scan_peaks_table(source, abundance_dtype, table_cache, ms_level)
+        elif table_cache is None or isinstance(source, (pd.DataFrame, np.ndarray, tuple, list)):
+            dict_containing_experimental_dfs[nick] = load_experimental_table(source, abundance_dtype, ms_level)
+        else:
+            table_kind = 'experimental' if abundance_dtype is None else 'experimental_' + abundance_dtype
+            if is_spectrum_file:
+                table_kind += '_ms' + str(ms_level)
+            dict_containing_experimental_dfs[nick] = table_cache.load(source,
+                                                                      table_kind,
+                                                                      lambda buffer: load_experimental_table(buffer, abundance_dtype, ms_level))
+
+        # save original file name with new nick to a dictionary for dropdown menu
+        dict_experimental_filenames[orig_name] = nick
+
+        # fill the table containing additional information
+        experimental_dfs_additional_info_df = generate_additional_info_table(experimental_dfs_additional_info_df, orig_name, nick)
+
+    return (experimental_dfs_additional_info_df, dict_containing_experimental_dfs, dict_experimental_filenames)
+
+
+def ions_selection_from_names(ion_names) -> dict:
+    """
+    Builds dictionary of picked ions in the same form as it is provided by checkboxes in the app
+
+    @param ion_names: names of ions from ions_enum.Ion which should be added to the theoretical table
+    @return: dictionary where keys are names of ions from ions_enum.Ion and values are booleans
+    """
+    ion_names = set(ion_names)
+    unknown_ion_names = ion_names - set(ion.name for ion in ions_enum.Ion)
+    if unknown_ion_names:
+        raise ValueError(f"Unknown ion names: {', '.join(sorted(unknown_ion_names))}")
+    return {ion.name: ion.name in ion_names for ion in ions_enum.Ion}
+
+
+def add_ions_to_theoretical_table(theoretical_mass_table_df: pd.DataFrame, ions_to_add_to_theoretical_table_dict: dict) -> pd.DataFrame:
+    """
+    Prepares full table of theoretical masses by adding chosen ions to the table of theoretical m/z values.
+    m/z values of all ions and molecules are calculated at once as (ions x molecules) array, rows are in the order of ions from ions_enum.Ion
+    before sorting by theor_m/z. Columns 'ion' and 'charge' are categorical.
+
+    @param theoretical_mass_table_df: table containing only original masses as provided by user
+    @param ions_to_add_to_theoretical_table_dict: dictionary where keys are names of ions from ions_enum.Ion and values are booleans
+    @return: expanded_theoretical_mass_table_df which contains only theor_m/z values for ions of interest which will be matched with experimental data in further steps
+    """
+    # add ions which are set by user as True (tick in a checkbox)
+    picked_ions = [ion.value for ion in ions_enum.Ion if ions_to_add_to_theoretical_table_dict.get(ion.name, False)]
+
+    # empty table with expected columns is provided until a table is uploaded and an ion is picked
+    if not picked_ions or theoretical_mass_table_df.empty:
+        return pd.DataFrame(columns=['name', 'ID', 'ion', 'charge', 'theor_m/z', 'warning'])
+
+    # masses which are not numbers become NaN, such rows are reported by validation and never matched
+    theoretical_masses = pd.to_numeric(theoretical_mass_table_df['theor_m/z'], errors='coerce').to_numpy(dtype=np.float64)
+    n_ions, n_molecules = len(picked_ions), len(theoretical_masses)
+
+    # m/z for all ions (rows) and molecules (columns) by broadcasting
+    multiply_by = np.array([ion_info.multiply_by for ion_info in picked_ions])
+    add_mass = np.array([ion_info.add_mass for ion_info in picked_ions])
+    ions_mz = theoretical_masses[np.newaxis, :] * multiply_by[:, np.newaxis] + add_mass[:, np.newaxis]
+
+    # position of molecule in original table and position of ion in picked_ions for each row of expanded table
+    molecule_positions = np.tile(np.arange(n_molecules), n_ions)
+    ion_positions = np.repeat(np.arange(n_ions), n_molecules)
+    charge_categories = list(dict.fromkeys(ion_info.charge for ion_info in picked_ions if isinstance(ion_info.charge, str)))
+    charge_codes = np.array([charge_categories.index(ion_info.charge) if isinstance(ion_info.charge, str) else -1 for ion_info in picked_ions])
+
+    expanded_theoretical_mass_table_df = pd.DataFrame({
+        'name': theoretical_mass_table_df['name'].array.take(molecule_positions),
+        'ID': theoretical_mass_table_df['ID'].to_numpy()[molecule_positions],
+        'ion': pd.Categorical.from_codes(ion_positions, categories=[ion_info.ion_formula for ion_info in picked_ions]),
+        'charge': pd.Categorical.from_codes(charge_codes[ion_positions], categories=charge_categories),
+        'theor_m/z': ions_mz.ravel(),
+        'warning': theoretical_mass_table_df['warning'].array.take(molecule_positions)
+    })
+    # sort the full theoretical mass table by theor_m/z
+    expanded_theoretical_mass_table_df.sort_values(by='theor_m/z', inplace=True, ignore_index=True, kind='stable')
+    return expanded_theoretical_mass_table_df
+
+
+def raise_warning_for_masses_within_accuracy(expanded_theoretical_mass_table_df: pd.DataFrame, max_mass_accur_value: float) -> pd.DataFrame:
+    """
+    adds warning to lines of theoretical masses which are within mass accuracy range; therefore, can be wrongly matched
+
+    @param expanded_theoretical_mass_table_df:
+    @param max_mass_accur_value:
+    @return: dataframe with filled warning at rows where is risk of wrong matching due to theor_m/z being within mass accuracy range
+    """
+    # calculate differences between lines and give warning where the difference is smaller
+    # than the double of the defined mass accuracy(mass_accur_value)
+    exp_err = 2 * max_mass_accur_value
+    diff_to_previous = expanded_theoretical_mass_table_df['theor_m/z'].diff()
+    diff_to_following = -expanded_theoretical_mass_table_df['theor_m/z'].diff(periods=-1)
+    close_to_neighbour = ((diff_to_previous < exp_err) | (diff_to_following < exp_err)).to_numpy()
+    # keep only necessary columns, warning is saved as a code (see WARNING_MESSAGES)
+    expanded_theoretical_mass_table_df = expanded_theoretical_mass_table_df[
+        ['name', 'ID', 'ion', 'charge', 'theor_m/z', 'warning']].copy()
+    warning = expanded_theoretical_mass_table_df['warning'].astype('category')
+    if 'close_mz' not in warning.cat.categories:
+        warning = warning.cat.add_categories('close_mz')
+    warning[close_to_neighbour] = 'close_mz'
+    expanded_theoretical_mass_table_df['warning'] = warning
+    return expanded_theoretical_mass_table_df
+
+
+def render_warning_messages(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    replaces warning codes by full messages from WARNING_MESSAGES before the table is shown or exported.
+    Only categories are renamed, so the column stays as small as before.
+
+    @param df: table with column 'warning' containing codes
+    @return: shallow copy of the table with messages in column 'warning', the table itself if it has no such column
+    """
+    if 'warning' not in df.columns:
+        return df
+    df = df.copy(deep=False)
+    warning = df['warning'].astype('category')
+    df['warning'] = warning.cat.rename_categories([WARNING_MESSAGES.get(code, code) for code in warning.cat.categories])
+    return df
+
+
+def get_values_from_additional_info_df(experimental_dfs_additional_info_df: pd.DataFrame, ind: str) -> tuple:
+    """
+
+    @param experimental_dfs_additional_info_df:
+    @param ind: index which corresponds to nickname of file containing experimental results
+    @return: tuple of values, mass accuracy is returned as MassTolerance
+    """
+    file_info = experimental_dfs_additional_info_df.loc[ind]
+    abundance_threshold = experimental_dfs_additional_info_df.loc[ind, 'abund_thrs']
+    # columns with tolerance model are optional, mass accuracy in Da is used without them
+    tolerance_of_mass = mass_tolerance_from_settings(file_info.get('tolerance_model', 'Da'),
+                                                     file_info['mass_accuracy(Da)'],
+                                                     file_info.get('mass_accuracy(ppm)', np.nan),
+                                                     file_info.get('calibration_curve', ''))
+    orig_datafile_nickname = experimental_dfs_additional_info_df.loc[ind, 'nickname']
+    return (abundance_threshold, tolerance_of_mass, orig_datafile_nickname)
+
+
+def largest_mass_accuracy(experimental_dfs_additional_info_df: pd.DataFrame, max_mz: float) -> float:
+    """
+    Provides the largest mass accuracy in Da of all experimental files, mass accuracy in ppm is converted at max_mz
+
+    @param experimental_dfs_additional_info_df: table with additional information about experimental files and settings for matching
+    @param max_mz: the largest m/z of interest (e.g. the largest theoretical m/z)
+    @return: the largest mass accuracy in Da, NaN if it is not defined for any file
+    """
+    largest_accuracies = []
+    for ind in experimental_dfs_additional_info_df.index:
+        try:
+            largest_accuracies.append(get_values_from_additional_info_df(experimental_dfs_additional_info_df, ind)[1].largest_window(max_mz))
+        except (ValueError, KeyError):
+            # settings of the file are not complete yet
+            pass
+    return pd.Series(largest_accuracies, dtype='float64').max()
+
+
+def prepare_experimental_for_matching(single_exp_file_df: pd.DataFrame, abundance_threshold: float) -> pd.DataFrame:
+    """
+    Prepares data before matching by sorting them and by removing signals of low abundance
+
+    @param single_exp_file_df:
+    @param abundance_threshold:
+    @return: alternated version of dataframe
+    """
+    # sort data by m/z
+    single_exp_file_df = single_exp_file_df.sort_values(by=['exp_m/z']).reset_index(drop=True)
+
+    # keep only rows with abundance over the set value for variable abundance_threshold
+    single_exp_file_df = single_exp_file_df[single_exp_file_df['Abundance'] >= abundance_threshold]
+    return single_exp_file_df
+
+
+def build_theoretical_index(expanded_theoretical_mass_table_df) -> TheoreticalIndex:
+    """
+    builds sorted index of theoretical m/z values which is reused for matching of all experimental files
+
+    @param expanded_theoretical_mass_table_df: full table of theoretical m/z values, already built TheoreticalIndex is returned as it is
+    @return: TheoreticalIndex
+    """
+    if isinstance(expanded_theoretical_mass_table_df, TheoreticalIndex):
+        return expanded_theoretical_mass_table_df
+    return TheoreticalIndex(expanded_theoretical_mass_table_df)
+
+
+def match_experimental_with_theoretical(single_exp_file_df: pd.DataFrame,
+                                        theoretical_index,
+                                        tolerance_of_mass,
+                                        matching_mode: str = 'nearest'
+                                        ) -> pd.DataFrame:
+    """
+    Matches rows with theoretical and experimental m/z values within defined mass accuracy.
+    In 'nearest' mode, the nearest theoretical m/z is matched to each experimental value (the same result as pd.merge_asof with direction='nearest').
+    In 'all' mode, every theoretical m/z within mass accuracy is returned together with mass errors and rank of the candidate.
+
+    @param single_exp_file_df:
+    @param theoretical_index: TheoreticalIndex or expanded theoretical table (index is built for it on the fly)
+    @param tolerance_of_mass: MassTolerance or mass accuracy in Da
+    @param matching_mode: one of MATCHING_MODES
+    @return: dataframe with matched rows
+    """
+    if matching_mode not in MATCHING_MODES:
+        raise ValueError(f"Unknown matching mode '{matching_mode}', use one of: {', '.join(MATCHING_MODES)}")
+    theoretical_index = build_theoretical_index(theoretical_index)
+    # mass accuracy can differ for each experimental signal (e.g. for ppm), it is calculated for all signals at once
+    mass_accuracy_window = tolerance_window(tolerance_of_mass, single_exp_file_df['exp_m/z'].to_numpy())
+    if matching_mode == 'all':
+        compared_data_raw = theoretical_index.match_all(single_exp_file_df, mass_accuracy_window)
+    else:
+        compared_data_raw = theoretical_index.match(single_exp_file_df, mass_accuracy_window)
+    return compared_data_raw
+
+
+def find_matched_rows(single_exp_file_df: pd.DataFrame,
+                      theoretical_index,
+                      abundance_threshold: float,
+                      tolerance_of_mass,
+                      matching_mode: str = 'nearest'
+                      ) -> MatchedRows:
+    """
+    Matches experimental data with theoretical m/z values as match_single_experimental_file, but provides only positions of matched rows.
+    Rows are in the same order as in processed matched results (by ID and theor_m/z).
+
+    @param single_exp_file_df: experimental data with columns 'exp_m/z' and 'Abundance'
+    @param theoretical_index: TheoreticalIndex built for expanded theoretical table (or the table itself)
+    @param abundance_threshold:
+    @param tolerance_of_mass: MassTolerance or mass accuracy in Da
+    @param matching_mode: one of MATCHING_MODES
+    @return: MatchedRows with positions of rows in experimental table and in theoretical table of the index
+    """
+    if matching_mode not in MATCHING_MODES:
+        raise ValueError(f"Unknown matching mode '{matching_mode}', use one of: {', '.join(MATCHING_MODES)}")
+    theoretical_index = build_theoretical_index(theoretical_index)
+
+    # positions of experimental rows are carried through sorting and filtering
+    single_exp_file_df = prepare_experimental_for_matching(single_exp_file_df.assign(exp_row=np.arange(len(single_exp_file_df.index), dtype='int32')),
+                                                           abundance_threshold)
+    exp_mz = single_exp_file_df['exp_m/z'].to_numpy(dtype=np.float64)
+    exp_rows = single_exp_file_df['exp_row'].to_numpy()
+    mass_accuracy_window = tolerance_window(tolerance_of_mass, exp_mz)
+
+    candidate_rank = None
+    if matching_mode == 'all':
+        exp_positions, theor_rows, _, candidate_rank = theoretical_index.find_all_ranked(exp_mz, mass_accuracy_window)
+        exp_rows = exp_rows[exp_positions]
+    else:
+        theor_rows = theoretical_index.find_nearest(exp_mz, mass_accuracy_window)
+        exp_rows, theor_rows = exp_rows[theor_rows >= 0], theor_rows[theor_rows >= 0]
+
+    # the same stable order as sorting of matched results by ID and theor_m/z
+    order = np.lexsort((theoretical_index.table['theor_m/z'].to_numpy()[theor_rows], theoretical_index.table['ID'].to_numpy()[theor_rows]))
+    return MatchedRows(exp_rows[order].astype('int32'),
+                       theor_rows[order].astype('int32'),
+                       None if candidate_rank is None else candidate_rank[order].astype('int32'))
+
+
+def process_raw_compared_data(compared_data_raw: pd.DataFrame, orig_datafile_nickname: str) -> pd.DataFrame:
+    """
+    Performs simple transformations to rearrange dataframe to final shape.
+    Transformations are following:
+    1. rearrange and keep only columns of interest (columns for ranking of candidates are kept if present)
+    2. drop experimental values without matching theoretical m/z
+    3. sorts rows by ID and theoretical m/z
+    4. adds information about file of data origin
+
+    @param compared_data_raw: unprocessed dataframe with matched results
+    @param orig_datafile_nickname:
+    @return: processed df with matched results
+    """
+    # rearrange columns to final order and drop columns which are not of interest
+    compared_data = compared_data_raw[['theor_m/z', 'exp_m/z', 'ID', 'name', 'ion', 'charge', 'Abundance', 'warning']
+                                      + [col for col in CANDIDATE_RANKING_COLUMNS if col in compared_data_raw.columns]]
+
+    # drop all experimental data which did not have a paired theoretical oligomer or macrocycle
+    compared_data = compared_data.dropna(subset=['theor_m/z'])
+
+    # sort table which contains only paired values according to the ID and m/z
+    compared_data = compared_data.sort_values(by=['ID', 'theor_m/z']).reset_index(drop=True)
+    # ID is float after matching because of missing matches, only matched rows are left now
+    compared_data['ID'] = compared_data['ID'].astype('int32')
+
+    # add column with original datafile name at each row (categorical, so the name is not repeated in memory)
+    compared_data['orig_file'] = pd.Categorical.from_codes(np.zeros(len(compared_data.index), dtype='int8'), categories=[orig_datafile_nickname])
+
+    return compared_data
+
+
+def concat_keeping_categories(list_of_dfs: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    concatenates dataframes as pd.concat, but columns which are categorical in any of the dataframes stay categorical
+    (pd.concat would convert them to object when categories differ). Categories are united in order of their first appearance.
+
+    @param list_of_dfs: dataframes to concatenate
+    @return: concatenated dataframe with new index
+    """
+    categorical_columns = list(dict.fromkeys(col for df in list_of_dfs for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)))
+    united_dtypes = {}
+    for col in categorical_columns:
+        categories = []
+        for df in list_of_dfs:
+            if col not in df.columns:
+                continue
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                categories.extend(df[col].cat.categories)
+            else:
+                categories.extend(df[col].dropna().unique())
+        united_dtypes[col] = pd.CategoricalDtype(list(dict.fromkeys(categories)))
+    return pd.concat([df.astype({col: dtype for col, dtype in united_dtypes.items() if col in df.columns}) for df in list_of_dfs],
+                     ignore_index=True)
+
+
+def add_total_abundance_rows(compared_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds a row with total abundance of all ions for each molecule ID within each file of data origin.
+    All rows are computed at once by grouping on file and ID, rows are appended in order of the first appearance of the group.
+
+    @param compared_data: matched results from one or more experimental files
+    @return: dataframe compared data with added lines containing sums of abundances
+    """
+    # first row of each group provides name of the molecule and file of data origin
+    first_rows_of_groups = compared_data.drop_duplicates(subset=['orig_file', 'ID'], keep='first')
+    abundance_sums = compared_data.groupby(['orig_file', 'ID'], sort=False, dropna=False, observed=True)['Abundance'].sum()
+
+    total_abundance_rows_df = pd.DataFrame({
+        'theor_m/z': np.nan,
+        'exp_m/z': np.nan,
+        'ID': first_rows_of_groups['ID'].to_numpy(),
+        'name': first_rows_of_groups['name'].array,
+        'ion': 'ions sum',
+        'charge': np.nan,
+        'Abundance': abundance_sums.to_numpy(),
+        'warning': 'ions_sum',
+        'orig_file': first_rows_of_groups['orig_file'].array
+    })
+    compared_data = concat_keeping_categories([compared_data, total_abundance_rows_df])
+    return compared_data
+
+
+def prepare_matched_file_for_aggregating(compared_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepares matched results of one experimental file as a part of the long table for aggregation.
+    Parts of all files are joined by combine_parts_for_aggregating, so a part can be kept and reused while the file is not matched again.
+
+    @param compared_data: processed dataframe with matched results of one experimental file
+    @return: matched results with file name marked as abundance and with rows with sum of abundances for each molecule
+    """
+    compared_data = compared_data.copy(deep=False)
+
+    # categories of file names follow the order in which files were provided, sorting by the column keeps this order
+    orig_file = compared_data['orig_file']
+    if not isinstance(orig_file.dtype, pd.CategoricalDtype):
+        orig_file = orig_file.astype(pd.CategoricalDtype(orig_file.drop_duplicates()))
+    # edit column with orginal datafile name, so it would be clear that it contains abundance after the pivoting of table
+    compared_data['orig_file'] = orig_file.cat.remove_unused_categories().cat.rename_categories(lambda orig_file_name: str(orig_file_name) + '_abund')
+
+    # make new rows with value of abundance sum for all found ions of each molecule in the file
+    compared_data = add_total_abundance_rows(compared_data)
+    return compared_data
+
+
+def combine_parts_for_aggregating(list_of_parts_for_aggregating: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Joins parts prepared by prepare_matched_file_for_aggregating into one long table.
+
+    @param list_of_parts_for_aggregating: one part for each experimental file, in order of the files
+    @return: long table with matched results from all files, sorted by file, ID and theor_m/z
+    """
+    compared_data = concat_keeping_categories(list_of_parts_for_aggregating)
+
+    # cast ID as integer and sort the dataframe again
+    compared_data['ID'] = compared_data['ID'].astype('int32')
+    compared_data = compared_data.sort_values(by=['orig_file', 'ID', 'theor_m/z']).reset_index(drop=True)
+    return compared_data
+
+
+def prepare_matched_files_for_aggregating(list_of_compared_data_dfs: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Collects matched results from all experimental files into one long table and adds rows with sum of abundances
+    for each molecule within each file.
+
+    @param list_of_compared_data_dfs: processed dataframes with matched results, one for each experimental file
+    @return: long table with matched results from all files, sorted by file, ID and theor_m/z
+    """
+    return combine_parts_for_aggregating([prepare_matched_file_for_aggregating(compared_data) for compared_data in list_of_compared_data_dfs])
+
+
+def calculate_mean_and_error_for_mass_to_charge_of_ions(aggregated_matched_files_summary_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds columns with calculated mean value and standard error within each ion of a molecule throughout all matched experimental data.
+    Numeric columns 'mean_m/z' and 'std_err_m/z' are kept next to the formatted string, so they do not have to be parsed back.
+
+    @param aggregated_matched_files_summary_df: dataframe containing all matched experimental data (from one or more files)
+    @return: provided dataframe with additional columns for mean, standard error and their combination as a string.
+    """
+    # calculate mean and standard error of experimental m/z values within group defined by molecule ID and ion.
+    exp_mz_grouped_by_ion = aggregated_matched_files_summary_df.groupby(['ID', 'ion'], observed=True)["exp_m/z"]
+    mean_mz = exp_mz_grouped_by_ion.transform('mean').round(4)
+    # Fill Nan with zeroes (group with a single value), rows without experimental m/z (sums of abundances) are left empty
+    std_err_mz = exp_mz_grouped_by_ion.transform('std').round(4)
+    std_err_mz = std_err_mz.where(mean_mz.isna(), std_err_mz.fillna(value=0.0000))
+    aggregated_matched_files_summary_df['mean_m/z'] = mean_mz
+    aggregated_matched_files_summary_df['std_err_m/z'] = std_err_mz
+    # connect mean values with standard error into one string for all rows at once
+    exp_mean_mz = mean_mz.astype(str) + " ± " + std_err_mz.astype(str)
+    aggregated_matched_files_summary_df['exp_mean_m/z'] = exp_mean_mz.where(mean_mz.notna())
+
+    return aggregated_matched_files_summary_df
+
+
+def pivot_aggregated_table(aggregated_matched_files_summary_with_mean_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    pivot the results from long format to wide format for easier comparison between multiple experiments in the final aggregated table.
+    Each pair of molecule ID and ion gives one row, abundances are summed to a matrix addressed by integer codes of rows and files
+    and descriptive columns are taken from the first row of each pair afterwards (all rows of the pair share them).
+
+    @param aggregated_matched_files_summary_with_mean_df:
+    @return: provided dataframe transformed from long format to wide format
+    """
+    long_df = aggregated_matched_files_summary_with_mean_df
+    # integer code of (ID, ion) pair for each row, codes are given in order of the first appearance
+    ion_codes = long_df['ion'].cat.codes.to_numpy() if isinstance(long_df['ion'].dtype, pd.CategoricalDtype) else pd.factorize(long_df['ion'])[0]
+    row_codes, _ = pd.factorize(long_df['ID'].to_numpy(dtype=np.int64) * (ion_codes.max(initial=0) + 2) + ion_codes)
+    # integer code of file for each row, files are kept in the order of the first appearance
+    file_codes, file_names = pd.factorize(long_df['orig_file'])
+    n_rows, n_files = row_codes.max(initial=-1) + 1, len(file_names)
+
+    # sum abundances for each row and file, combinations without any matched signal stay empty
+    flat_codes = row_codes * n_files + file_codes
+    abundance_sums = np.bincount(flat_codes, weights=np.nan_to_num(long_df['Abundance'].to_numpy(dtype=np.float64)), minlength=n_rows * n_files)
+    has_abundance = np.bincount(flat_codes, minlength=n_rows * n_files) > 0
+    abundance_matrix = np.where(has_abundance, abundance_sums, np.nan).reshape(n_rows, n_files)
+    abundance_dtype = long_df['Abundance'].dtype if long_df['Abundance'].dtype.kind == 'f' else np.float64
+    abundance_wide_df = pd.DataFrame(abundance_matrix.astype(abundance_dtype), columns=[str(file_name) for file_name in file_names])
+
+    # descriptive columns from the first row of each (ID, ion) pair
+    first_rows_of_pairs = ~pd.Series(row_codes).duplicated().to_numpy()
+    descriptive_columns_df = long_df.loc[first_rows_of_pairs, ['theor_m/z', 'ID', 'name', 'ion', 'charge', 'warning',
+                                                              'exp_mean_m/z', 'mean_m/z', 'std_err_m/z']].reset_index(drop=True)
+
+    aggregated_matched_files_summary_wide_df = pd.concat([descriptive_columns_df, abundance_wide_df], axis=1)
+    return aggregated_matched_files_summary_wide_df
+
+
+def sort_and_rearrange_aggregated_to_final_form(aggregated_matched_files_summary_wide_df: pd.DataFrame) -> pd.DataFrame:
+    """
+
+    @param aggregated_matched_files_summary_wide_df:
+    @return: provided dataframe sorted by molecule ID and theor_m/z. Columns rearranged to have warning as a last column
+    """
+    # sort the values
+    aggregated_matched_files_summary_wide_df = aggregated_matched_files_summary_wide_df.sort_values(
+        by=['ID', 'theor_m/z']).reset_index(drop=True)
+    # rearrange columns in aggregated table (move warning to last column)
+    aggregated_matched_files_summary_wide_df = aggregated_matched_files_summary_wide_df[
+        [col for col in aggregated_matched_files_summary_wide_df.columns if col != 'warning'] + ['warning']]
+    return aggregated_matched_files_summary_wide_df
+
+
+def match_single_experimental_file(single_exp_file_df: pd.DataFrame,
+                                   theoretical_index,
+                                   abundance_threshold: float,
+                                   tolerance_of_mass,
+                                   orig_datafile_nickname: str,
+                                   matching_mode: str = 'nearest'
+                                   ) -> pd.DataFrame:
+    """
+    Runs the whole matching chain for one experimental file (preparation, matching and processing of matched rows)
+
+    @param single_exp_file_df: experimental data with columns 'exp_m/z' and 'Abundance'
+    @param theoretical_index: TheoreticalIndex built for expanded theoretical table (or the table itself)
+    @param abundance_threshold:
+    @param tolerance_of_mass: MassTolerance or mass accuracy in Da
+    @param orig_datafile_nickname:
+    @param matching_mode: one of MATCHING_MODES
+    @return: processed df with matched results
+    """
+    theoretical_index = build_theoretical_index(theoretical_index)
+
+    # find best fits for experimental values from table of theoretical values, only positions of matched rows are found
+    matched_rows = find_matched_rows(single_exp_file_df, theoretical_index, abundance_threshold, tolerance_of_mass, matching_mode)
+
+    # build dataframe with matched rows sorted by ID and theor_m/z, add information about file of data origin
+    compared_data = materialize_matched_rows(matched_rows, single_exp_file_df, theoretical_index.table, orig_datafile_nickname)
+    return compared_data
+
+
+def match_experimental_file_in_chunks(source,
+                                     theoretical_index,
+                                     abundance_threshold: float,
+                                     tolerance_of_mass,
+                                     orig_datafile_nickname: str,
+                                     matching_mode: str = 'nearest',
+                                     chunk_size: int = 1000000,
+                                     abundance_dtype: str = None
+                                     ) -> pd.DataFrame:
+    """
+    Streaming variant of match_single_experimental_file for peak lists which are too large to be loaded at once.
+    Each chunk is filtered by abundance threshold and matched on its own (match of a signal does not depend on other signals)
+    and only its matched rows are kept, so memory is bounded by chunk size and number of matches instead of size of the file.
+
+    @param source: path or file-like object with CSV file, see read_experimental_table_in_chunks
+    @param theoretical_index: TheoreticalIndex built for expanded theoretical table (or the table itself)
+    @param abundance_threshold:
+    @param tolerance_of_mass: MassTolerance or mass accuracy in Da
+    @param orig_datafile_nickname:
+    @param matching_mode: one of MATCHING_MODES
+    @param chunk_size: number of rows read at once
+    @param abundance_dtype: dtype for column 'Abundance', see load_experimental_table
+    @return: processed df with matched results, the same as from match_single_experimental_file
+    """
+    theoretical_index = build_theoretical_index(theoretical_index)
+    list_of_matched_chunks = [match_single_experimental_file(chunk_df,
+                                                             theoretical_index,
+                                                             abundance_threshold,
+                                                             tolerance_of_mass,
+                                                             orig_datafile_nickname,
+                                                             matching_mode)
+                              for chunk_df in read_experimental_table_in_chunks(source, chunk_size, abundance_dtype)]
+    if len(list_of_matched_chunks) == 1:
+        return list_of_matched_chunks[0]
+    compared_data = concat_keeping_categories(list_of_matched_chunks)
+    # rows from all chunks are sorted together, signals matched to the same theoretical m/z are in order of experimental m/z
+    compared_data = compared_data.sort_values(by=['ID', 'theor_m/z', 'exp_m/z']).reset_index(drop=True)
+    return compared_data
+
+
+def aggregate_matched_files(list_of_compared_data_dfs: list[pd.DataFrame], profile=None) -> pd.DataFrame:
+    """
+    Aggregates matched results from all experimental files into the final table in wide format
+
+    @param list_of_compared_data_dfs: processed dataframes with matched results, one for each experimental file
+    @param profile: matchmass.instrumentation.PipelineProfile measuring the stages, None means no measurement
+    @return: dataframe with aggregated results from all matched files
+    """
+    list_of_parts_for_aggregating = []
+    for compared_data in list_of_compared_data_dfs:
+        with measure_stage(profile, 'prepare_part', compared_data['orig_file'].iat[0] if len(compared_data.index) else None) as record:
+            list_of_parts_for_aggregating.append(prepare_matched_file_for_aggregating(compared_data))
+            record['rows'] = len(list_of_parts_for_aggregating[-1].index)
+    return aggregate_parts_for_aggregating(list_of_parts_for_aggregating, profile)
+
+
+def aggregate_parts_for_aggregating(list_of_parts_for_aggregating: list[pd.DataFrame], profile=None) -> pd.DataFrame:
+    """
+    Aggregates already prepared parts of the long table (see prepare_matched_file_for_aggregating) into the final table in wide format
+
+    @param list_of_parts_for_aggregating: one part for each experimental file, in order of the files
+    @param profile: matchmass.instrumentation.PipelineProfile measuring the stages, None means no measurement
+    @return: dataframe with aggregated results from all matched files
+    """
+    # collect the data from all files to one dataframe with full results
+    with measure_stage(profile, 'combine_parts') as record:
+        aggregated_matched_files_summary_df = combine_parts_for_aggregating(list_of_parts_for_aggregating)
+        record['rows'] = len(aggregated_matched_files_summary_df.index)
+
+    # add column with calculated average m/z and its standard deviation for each molecule-ion pair throughout all files
+    with measure_stage(profile, 'mean_and_error') as record:
+        aggregated_matched_files_summary_with_mean_df = calculate_mean_and_error_for_mass_to_charge_of_ions(aggregated_matched_files_summary_df)
+        record['rows'] = len(aggregated_matched_files_summary_with_mean_df.index)
+
+    # pivot the results from long format to wide format for easier comparison between experiments in the final aggregated table
+    with measure_stage(profile, 'pivot') as record:
+        aggregated_matched_files_summary_wide_df = pivot_aggregated_table(aggregated_matched_files_summary_with_mean_df)
+        record['rows'] = len(aggregated_matched_files_summary_wide_df.index)
+
+    # sort and rearrange into final form for showing and exporting the aggregated results
+    with measure_stage(profile, 'sort') as record:
+        aggregated_matched_files_final_form_df = sort_and_rearrange_aggregated_to_final_form(aggregated_matched_files_summary_wide_df)
+        record['rows'] = len(aggregated_matched_files_final_form_df.index)
+    return aggregated_matched_files_final_form_df
+
+
+def match_and_aggregate(experimental_dfs_additional_info_df: pd.DataFrame, dict_containing_experimental_dfs: dict, expanded_theoretical_mass_table_df: pd.DataFrame,
+                        matching_mode: str = 'nearest', match_cache=None, profile=None) -> tuple:
+    """
+    Will match experimental data with theoretical m/z values and return new matched dataframes and one dataframe with overall results.
+    Files with peaks of more scans (LC-MS runs, see load_experimental_files) are matched scan by scan, their matched results
+    contain integrated abundances of ions and the table of extracted-ion chromatograms is added under key nickname + CHROMATOGRAM_KEY_SUFFIX.
+    Errors are not caught here, so the headless use of the engine can see what went wrong.
+
+    @param experimental_dfs_additional_info_df: table with additional information about experimental files and settings for matching
+    @param dict_containing_experimental_dfs: dictionary containing all experimental files as dataframes, keys are nicknames of files
+    @param expanded_theoretical_mass_table_df: dataframe containing theoretical values of m/z for matching with experimental data
+    @param matching_mode: one of MATCHING_MODES, in 'all' mode abundance of a signal is counted for each of its candidates
+    @param match_cache: matchmass.match_cache.MatchResultCache, only files with changed data or settings are matched again, None matches all files
+    @param profile: matchmass.instrumentation.PipelineProfile measuring time, rows and memory of each stage and file, None means no measurement
+    @return: tuple containing LazyMatchedResults (dictionary-like, matched dataframes are built on access) and dataframe with aggregated results from all matched files
+    """
+    # sorted theoretical m/z values are prepared only once for all files
+    with measure_stage(profile, 'build_index') as record:
+        theoretical_index = build_theoretical_index(expanded_theoretical_mass_table_df)
+        record['rows'] = len(theoretical_index)
+
+    # initiate new store which will hold positions of matched rows of each file and list of parts of files for aggregation
+    dict_containing_matched_experimental_dfs = LazyMatchedResults(theoretical_index.table)
+    list_of_parts_for_aggregating = []
+
+    # loop through the files and do the matching
+    for ind in experimental_dfs_additional_info_df.index:
+        # define variables
+        abundance_threshold, tolerance_of_mass, orig_datafile_nickname = get_values_from_additional_info_df(experimental_dfs_additional_info_df, ind)
+
+        # LC-MS runs are matched by batches of scans, matched results of the run are integrated chromatograms (not cached)
+        if is_scan_peaks_table(dict_containing_experimental_dfs[ind]):
+            with measure_stage(profile, 'matching', orig_datafile_nickname) as record:
+                compared_data, chromatogram_df = match_scan_peaks_table(dict_containing_experimental_dfs[ind],
+                                                                        theoretical_index,
+                                                                        abundance_threshold,
+                                                                        tolerance_of_mass,
+                                                                        orig_datafile_nickname,
+                                                                        matching_mode)
+                record['rows'] = len(chromatogram_df.index)
+            with measure_stage(profile, 'prepare_part', orig_datafile_nickname) as record:
+                list_of_parts_for_aggregating.append(prepare_matched_file_for_aggregating(compared_data))
+                record['rows'] = len(list_of_parts_for_aggregating[-1].index)
+            dict_containing_matched_experimental_dfs.add_table(ind, compared_data)
+            dict_containing_matched_experimental_dfs.add_table(ind + CHROMATOGRAM_KEY_SUFFIX, chromatogram_df)
+            continue
+
+        # match one of experimental data dataframes and save compared data for the file to the exp_dfs_matched
+        if match_cache is None:
+            with measure_stage(profile, 'matching', orig_datafile_nickname) as record:
+                matched_rows = find_matched_rows(dict_containing_experimental_dfs[ind],
+                                                 theoretical_index,
+                                                 abundance_threshold,
+                                                 tolerance_of_mass,
+                                                 matching_mode)
+                record['rows'] = len(matched_rows.exp_rows)
+            # matched dataframe is needed only for building of the part for aggregation
+            with measure_stage(profile, 'prepare_part', orig_datafile_nickname) as record:
+                part_for_aggregating = prepare_matched_file_for_aggregating(materialize_matched_rows(matched_rows,
+                                                                                                     dict_containing_experimental_dfs[ind],
+                                                                                                     theoretical_index.table,
+                                                                                                     orig_datafile_nickname))
+                record['rows'] = len(part_for_aggregating.index)
+        else:
+            matched_rows, part_for_aggregating = match_cache.match_file(dict_containing_experimental_dfs[ind],
+                                                                        theoretical_index,
+                                                                        abundance_threshold,
+                                                                        tolerance_of_mass,
+                                                                        orig_datafile_nickname,
+                                                                        matching_mode,
+                                                                        profile)
+        dict_containing_matched_experimental_dfs.add(ind, dict_containing_experimental_dfs[ind], matched_rows, orig_datafile_nickname)
+        list_of_parts_for_aggregating.append(part_for_aggregating)
+
+    aggregated_matched_files_final_form_df = aggregate_parts_for_aggregating(list_of_parts_for_aggregating, profile)
+
+    return (dict_containing_matched_experimental_dfs, aggregated_matched_files_final_form_df)
+
+
+def data_matching_sequence(experimental_dfs_additional_info_df: pd.DataFrame, dict_containing_experimental_dfs: dict, expanded_theoretical_mass_table_df: pd.DataFrame,
+                           matching_mode: str = 'nearest', match_cache=None, profile=None, validation_issues_df: pd.DataFrame = None) -> tuple:
+    """
+    Will match experimental data with theoretical m/z values and return new matched dataframes and one dataframe with overall results.
+    Inputs are validated first (see matchmass.validation), files with errors are skipped and the other files are matched.
+
+    @param experimental_dfs_additional_info_df:
+    @param dict_containing_experimental_dfs:
+    @param expanded_theoretical_mass_table_df:
+    @param matching_mode: one of MATCHING_MODES
+    @param match_cache: cache of matched results of single files, see match_and_aggregate
+    @param profile: PipelineProfile measuring the stages, see match_and_aggregate. Stages measured before an error are kept in it
+    @param validation_issues_df: table of issues from matchmass.validation.validate_matching_inputs, None validates the inputs here
+    @return: tuple containing dictionary with matched results (skipped files are not included), dataframe with aggregated results from all matched files
+        and message about success of matching
+    """
+    if validation_issues_df is None:
+        with measure_stage(profile, 'validation') as record:
+            validation_issues_df = validate_matching_inputs(experimental_dfs_additional_info_df, dict_containing_experimental_dfs, expanded_theoretical_mass_table_df)
+            record['rows'] = len(validation_issues_df.index)
+    nicknames_to_match = files_without_errors(validation_issues_df, experimental_dfs_additional_info_df.index)
+    if not nicknames_to_match:
+        return (pd.DataFrame(), pd.DataFrame(), 'No file can be matched! ' + describe_errors(validation_issues_df))
+
+    try:
+        dict_containing_matched_experimental_dfs, aggregated_matched_files_final_form_df = match_and_aggregate(experimental_dfs_additional_info_df.loc[nicknames_to_match],
+                                                                                                                dict_containing_experimental_dfs,
+                                                                                                                expanded_theoretical_mass_table_df,
+                                                                                                                matching_mode,
+                                                                                                                match_cache,
+                                                                                                                profile)
+    except (ValueError, KeyError, TypeError, MemoryError) as error:
+        return (pd.DataFrame(), pd.DataFrame(), f'Matching failed ({type(error).__name__}: {error}). Please check your data and settings.')
+
+    if aggregated_matched_files_final_form_df.empty:
+        matching_result_message = 'No matches were found! You can try to set larger mass accuracy value or add ions.'
+    else:
+        matching_result_message = 'Matches were found!'
+    if len(nicknames_to_match) < len(experimental_dfs_additional_info_df.index):
+        matching_result_message += ' Some files were skipped. ' + describe_errors(validation_issues_df)
+    return (dict_containing_matched_experimental_dfs, aggregated_matched_files_final_form_df, matching_result_message)
+
+
+def iter_result_tables(experimental_dfs_additional_info_df: pd.DataFrame,
+                       expanded_theoretical_mass_table_df: pd.DataFrame,
+                       aggregated_matched_files_summary_df: pd.DataFrame,
+                       dict_containing_matched_experimental_dfs: dict):
+    """
+    provides tables with results one by one in order of sheets of exported file, warning codes are replaced by full messages.
+    Matched results of files are taken from the dictionary only when they are written, so with LazyMatchedResults only one is built at a time.
+
+    @param experimental_dfs_additional_info_df:
+    @param expanded_theoretical_mass_table_df:
+    @param aggregated_matched_files_summary_df:
+    @param dict_containing_matched_experimental_dfs:
+    @return: iterator of tuples (name of table, dataframe)
+    """
+    yield ('overview', experimental_dfs_additional_info_df)
+    yield ('theoretical_table', render_warning_messages(expanded_theoretical_mass_table_df))
+    yield ('aggregated_results', render_warning_messages(aggregated_matched_files_summary_df))
+    # one table for each matched experimental file
+    for key in dict_containing_matched_experimental_dfs:
+        yield (key, render_warning_messages(dict_containing_matched_experimental_dfs[key]))
+
+
+def column_values_for_excel(column: pd.Series) -> list:
+    """
+    @param column:
+    @return: values of the column as Python objects, missing values are None (written as empty cells)
+    """
+    values = column.to_numpy(dtype=object)
+    values[pd.isna(values)] = None
+    return values.tolist()
+
+
+def write_results_to_excel(output,
+                           experimental_dfs_additional_info_df: pd.DataFrame,
+                           expanded_theoretical_mass_table_df: pd.DataFrame,
+                           aggregated_matched_files_summary_df: pd.DataFrame,
+                           dict_containing_matched_experimental_dfs: dict,
+                           chunk_size: int = 10000
+                           ) -> None:
+    """
+    writes Excel file with results to a path or buffer.
+    Layout of sheets is the same as from DataFrame.to_excel (index in the first column), but rows are written in order
+    in constant_memory mode of XlsxWriter, so each finished row is flushed to a temporary file instead of being kept in memory.
+
+    @param output: path of the Excel file or writable binary buffer
+    @param experimental_dfs_additional_info_df:
+    @param expanded_theoretical_mass_table_df:
+    @param aggregated_matched_files_summary_df:
+    @param dict_containing_matched_experimental_dfs:
+    @param chunk_size: number of rows converted to Python objects at once
+    @return: None
+    """
+    import xlsxwriter
+
+    with xlsxwriter.Workbook(output, {'constant_memory': True}) as workbook:
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        # Write each dataframe to a different worksheet
+        for sheet_name, df in iter_result_tables(experimental_dfs_additional_info_df,
+                                                 expanded_theoretical_mass_table_df,
+                                                 aggregated_matched_files_summary_df,
+                                                 dict_containing_matched_experimental_dfs):
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, [df.index.name] + [str(col) for col in df.columns], header_format)
+            for start in range(0, len(df.index), chunk_size):
+                df_chunk = df.iloc[start:start + chunk_size]
+                columns = [column_values_for_excel(df_chunk.index.to_series())] + [column_values_for_excel(df_chunk[col]) for col in df_chunk.columns]
+                for row_number, row in enumerate(zip(*columns), start=start + 1):
+                    worksheet.write_row(row_number, 0, row)
+
+
+def write_results_to_zipped_tables(output,
+                                   experimental_dfs_additional_info_df: pd.DataFrame,
+                                   expanded_theoretical_mass_table_df: pd.DataFrame,
+                                   aggregated_matched_files_summary_df: pd.DataFrame,
+                                   dict_containing_matched_experimental_dfs: dict,
+                                   table_format: str = 'csv'
+                                   ) -> None:
+    """
+    writes zip archive with one CSV or Parquet file for each table (the same tables as sheets of Excel file).
+    Tables are written directly into the archive one by one.
+
+    @param output: path of the zip file or writable binary buffer
+    @param experimental_dfs_additional_info_df:
+    @param expanded_theoretical_mass_table_df:
+    @param aggregated_matched_files_summary_df:
+    @param dict_containing_matched_experimental_dfs:
+    @param table_format: 'csv' or 'parquet' (needs pyarrow)
+    @return: None
+    """
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for table_name, df in iter_result_tables(experimental_dfs_additional_info_df,
+                                                 expanded_theoretical_mass_table_df,
+                                                 aggregated_matched_files_summary_df,
+                                                 dict_containing_matched_experimental_dfs):
+            with archive.open(table_name + '.' + table_format, 'w', force_zip64=True) as table_file:
+                if table_format == 'parquet':
+                    df.to_parquet(table_file, index=False)
+                else:
+                    with TextIOWrapper(table_file, encoding='utf-8', newline='') as text_file:
+                        df.to_csv(text_file, index=False, chunksize=100000)
+
+
+# formats of exported results: function writing the results, file name and MIME type
+EXPORT_FORMATS = {
+    'excel': (write_results_to_excel, 'results_matched.xlsx', 'application/vnd.ms-excel'),
+    'csv': (lambda output, *tables: write_results_to_zipped_tables(output, *tables, table_format='csv'), 'results_matched_csv.zip', 'application/zip'),
+}
+if PYARROW_AVAILABLE:
+    EXPORT_FORMATS['parquet'] = (lambda output, *tables: write_results_to_zipped_tables(output, *tables, table_format='parquet'),
+                                 'results_matched_parquet.zip', 'application/zip')
+
+
+def export_results(export_format: str,
+                   experimental_dfs_additional_info_df: pd.DataFrame,
+                   expanded_theoretical_mass_table_df: pd.DataFrame,
+                   aggregated_matched_files_summary_df: pd.DataFrame,
+                   dict_containing_matched_experimental_dfs: dict,
+                   max_size_in_memory: int = 64 * 1024 ** 2,
+                   profile=None):
+    """
+    writes results in one of EXPORT_FORMATS to a temporary file, small files stay in memory, large ones are moved to disk
+
+    @param export_format: key of EXPORT_FORMATS
+    @param experimental_dfs_additional_info_df:
+    @param expanded_theoretical_mass_table_df:
+    @param aggregated_matched_files_summary_df:
+    @param dict_containing_matched_experimental_dfs:
+    @param max_size_in_memory: files larger than this number of bytes are kept on disk
+    @param profile: matchmass.instrumentation.PipelineProfile measuring the export as stage 'export_<format>', None means no measurement
+    @return: temporary file with results, positioned at the start
+    """
+    write_results = EXPORT_FORMATS[export_format][0]
+    output = tempfile.SpooledTemporaryFile(max_size=max_size_in_memory)
+    with measure_stage(profile, 'export_' + export_format) as record:
+        write_results(output,
+                      experimental_dfs_additional_info_df,
+                      expanded_theoretical_mass_table_df,
+                      aggregated_matched_files_summary_df,
+                      dict_containing_matched_experimental_dfs)
+        record['rows'] = len(aggregated_matched_files_summary_df.index)
+    output.seek(0)
+    return output
+
+
+def download_excel_with_results(experimental_dfs_additional_info_df: pd.DataFrame,
+                                expanded_theoretical_mass_table_df: pd.DataFrame,
+                                aggregated_matched_files_summary_df: pd.DataFrame,
+                                dict_containing_matched_experimental_dfs: dict,
+                                profile=None
+                                ) -> BytesIO:
+    """
+    constructs Excel file with results for the download
+
+    @param experimental_dfs_additional_info_df:
+    @param expanded_theoretical_mass_table_df:
+    @param aggregated_matched_files_summary_df:
+    @param dict_containing_matched_experimental_dfs:
+    @param profile: matchmass.instrumentation.PipelineProfile measuring the export as stage 'export_excel', None means no measurement
+    @return: BytesIO object, in this case containing Excel file with results
+    """
+    # buffer to use for Excel writer
+    buffer = BytesIO()
+    with measure_stage(profile, 'export_excel') as record:
+        write_results_to_excel(buffer,
+                               experimental_dfs_additional_info_df,
+                               expanded_theoretical_mass_table_df,
+                               aggregated_matched_files_summary_df,
+                               dict_containing_matched_experimental_dfs)
+        record['rows'] = len(aggregated_matched_files_summary_df.index)
+    return buffer
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: expansion_cache.py
+Created on 18.10.2026
+
+Note: memoization of the full theoretical table. Adding ions (engine.add_ions_to_theoretical_table) and warnings
+(engine.raise_warning_for_masses_within_accuracy) is repeated only if the theoretical table, picked ions or the largest
+mass accuracy changed, e.g. not when the app reruns because another file was picked for plotting.
+Expanded table is cached by (hash of theoretical table, picked ions), table with warnings also by the largest mass accuracy,
+because the largest mass accuracy in ppm can be converted to Da only with the expanded table.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from matchmass import engine
+from matchmass.table_cache import hash_table
+
+
+class ExpansionCache:
+    """
+    Bounded cache of expanded theoretical tables, the least recently used table is removed when the cache is full.
+    Numbers of hits and misses are counted for each step separately. The cache can be shared by threads (sessions of the app).
+    """
+
+    def __init__(self, max_entries: int = 32):
+        """
+        @param max_entries: the largest number of cached tables (expanded tables and tables with warnings together)
+        """
+        self.max_entries = max_entries
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {'expansion': 0, 'warnings': 0}
+        self.misses = {'expansion': 0, 'warnings': 0}
+
+    def _get_or_compute(self, step: str, key: tuple, compute) -> pd.DataFrame:
+        """
+        @param step: 'expansion' or 'warnings', used for counting of hits and misses
+        @param key:
+        @param compute: function without arguments which computes the table
+        @return: shallow copy of the cached table, so columns can be added or replaced without changing the cache
+        """
+        with self._lock:
+            if key in self._tables:
+                self._tables.move_to_end(key)
+                self.hits[step] += 1
+                return self._tables[key].copy(deep=False)
+            self.misses[step] += 1
+        df = compute()
+        with self._lock:
+            self._tables[key] = df
+            self._tables.move_to_end(key)
+            while len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+        return df.copy(deep=False)
+
+    def expand(self, theoretical_mass_table_df: pd.DataFrame, ions_to_add_to_theoretical_table_dict: dict,
+               theoretical_table_hash: str = None) -> pd.DataFrame:
+        """
+        cached engine.add_ions_to_theoretical_table
+
+        @param theoretical_mass_table_df: table containing only original masses as provided by user
+        @param ions_to_add_to_theoretical_table_dict: dictionary where keys are names of ions from ions_enum.Ion and values are booleans
+        @param theoretical_table_hash: hash_table of theoretical table if it is already known
+        @return: expanded theoretical table without warnings
+        """
+        theoretical_table_hash = theoretical_table_hash or hash_table(theoretical_mass_table_df)
+        picked_ion_names = frozenset(name for name, picked in ions_to_add_to_theoretical_table_dict.items() if picked)
+        return self._get_or_compute('expansion',
+                                    ('expansion', theoretical_table_hash, picked_ion_names),
+                                    lambda: engine.add_ions_to_theoretical_table(theoretical_mass_table_df,
+                                                                                 ions_to_add_to_theoretical_table_dict))
+
+    def expand_with_warnings(self, theoretical_mass_table_df: pd.DataFrame, ions_to_add_to_theoretical_table_dict: dict,
+                             experimental_dfs_additional_info_df: pd.DataFrame) -> tuple:
+        """
+        cached sequence of engine.add_ions_to_theoretical_table, engine.largest_mass_accuracy and engine.raise_warning_for_masses_within_accuracy
+
+        @param theoretical_mass_table_df: table containing only original masses as provided by user
+        @param ions_to_add_to_theoretical_table_dict: dictionary where keys are names of ions from ions_enum.Ion and values are booleans
+        @param experimental_dfs_additional_info_df: table with settings of experimental files, the largest mass accuracy is taken from it
+        @return: tuple (full theoretical table with warnings, the largest mass accuracy in Da)
+        """
+        theoretical_table_hash = hash_table(theoretical_mass_table_df)
+        expanded_theoretical_mass_table_df = self.expand(theoretical_mass_table_df, ions_to_add_to_theoretical_table_dict, theoretical_table_hash)
+        max_mass_accur_value = engine.largest_mass_accuracy(experimental_dfs_additional_info_df,
+                                                            expanded_theoretical_mass_table_df['theor_m/z'].max())
+        picked_ion_names = frozenset(name for name, picked in ions_to_add_to_theoretical_table_dict.items() if picked)
+        # NaN is not equal to itself, so it cannot be a part of the key
+        accuracy_key = None if pd.isna(max_mass_accur_value) else float(np.round(max_mass_accur_value, 12))
+        expanded_theoretical_mass_table_df = self._get_or_compute(
+            'warnings',
+            ('warnings', theoretical_table_hash, picked_ion_names, accuracy_key),
+            lambda: engine.raise_warning_for_masses_within_accuracy(expanded_theoretical_mass_table_df, max_mass_accur_value))
+        return (expanded_theoretical_mass_table_df, max_mass_accur_value)
+
+    def stats(self) -> dict:
+        """
+        @return: numbers of hits and misses for each step and number of cached tables
+        """
+        with self._lock:
+            return {'hits': dict(self.hits), 'misses': dict(self.misses), 'entries': len(self._tables)}
+
+
+if __name__ == '__main__':
+    pass
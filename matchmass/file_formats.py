@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: file_formats.py
+Created on 18.10.2026
+
+Note: recognition of uploaded tables by their content. Format (Excel or CSV) is recognised from the first bytes of the file,
+delimiter and decimal separator of CSV files are recognised from the first lines, so exports of instruments
+with e.g. semicolons and decimal commas are read without any settings. CSV files are read by pyarrow when it is installed.
+"""
+import importlib.util
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# the first bytes of xlsx (zip archive) and xls (OLE2 compound document) files
+EXCEL_SIGNATURES = (b'PK\x03\x04', b'\xd0\xcf\x11\xe0')
+EXCEL_FILE_EXTENSIONS = ('.xlsx', '.xls')
+# delimiters in order of preference, comma is the last of the common ones because it can be also a decimal separator
+CSV_DELIMITERS = ('\t', ';', ',', '|')
+SAMPLE_SIZE = 65536
+# whole field which is a number with decimal comma (e.g. '1,5' or '-0,25e3'), names like '1,2-propanediol' do not match
+DECIMAL_COMMA_NUMBER = re.compile(r'\s*[+-]?\d*,\d+(?:[eE][+-]?\d+)?\s*')
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+
+def read_sample(file_path_or_buffer, sample_size: int = SAMPLE_SIZE) -> bytes:
+    """
+    reads the beginning of a file, position of file-like object is not changed
+
+    @param file_path_or_buffer: path to a file or file-like object opened in binary mode
+    @param sample_size: number of bytes to read
+    @return: the first bytes of the file, empty if they cannot be read
+    """
+    if isinstance(file_path_or_buffer, (str, os.PathLike)):
+        with open(file_path_or_buffer, 'rb') as file:
+            return file.read(sample_size)
+    if not hasattr(file_path_or_buffer, 'seek'):
+        return b''
+    position = file_path_or_buffer.tell()
+    sample = file_path_or_buffer.read(sample_size)
+    file_path_or_buffer.seek(position)
+    return sample.encode() if isinstance(sample, str) else sample
+
+
+def sniff_table_format(file_path_or_buffer) -> str:
+    """
+    recognises format of the table by the first bytes of the file, extension is used only if the content cannot be read
+
+    @param file_path_or_buffer: path to a file or file-like object
+    @return: 'excel' or 'csv'
+    """
+    sample = read_sample(file_path_or_buffer, 8)
+    if sample:
+        return 'excel' if sample.startswith(EXCEL_SIGNATURES) else 'csv'
+    name = str(getattr(file_path_or_buffer, 'name', file_path_or_buffer))
+    return 'excel' if name.lower().endswith(EXCEL_FILE_EXTENSIONS) else 'csv'
+
+
+def sniff_csv_dialect(sample: bytes) -> tuple:
+    """
+    recognises delimiter and decimal separator from the first lines of CSV file.
+    Delimiter is the first of CSV_DELIMITERS which occurs the same number of times on each line,
+    decimal comma is recognised only with other delimiter than comma and only in fields which are whole numbers (see DECIMAL_COMMA_NUMBER).
+
+    @param sample: the first bytes of the file
+    @return: tuple (delimiter, decimal separator)
+    """
+    text = sample.decode('utf-8', errors='replace').lstrip('\ufeff')
+    lines = [line for line in text.splitlines() if line.strip()]
+    # the last line of a sample may be cut in the middle
+    if len(sample) >= SAMPLE_SIZE and len(lines) > 1:
+        lines = lines[:-1]
+    lines = lines[:50]
+
+    delimiter = ','
+    for candidate_delimiter in CSV_DELIMITERS:
+        counts = {line.count(candidate_delimiter) for line in lines}
+        if len(counts) == 1 and counts.pop() > 0:
+            delimiter = candidate_delimiter
+            break
+
+    decimal = '.'
+    if delimiter != ',' and any(DECIMAL_COMMA_NUMBER.fullmatch(field.strip('"')) for line in lines[1:] for field in line.split(delimiter)):
+        decimal = ','
+    return (delimiter, decimal)
+
+
+def convert_float64_columns(df: pd.DataFrame, float64_columns: tuple, decimal: str = '.') -> pd.DataFrame:
+    """
+    converts columns which should contain numbers to float64. Column with a cell which is not a number (e.g. text or repeated header)
+    is kept as text (with decimal point), so the file reaches validation (see matchmass.validation) which reports such cells.
+
+    @param df: table read from CSV file
+    @param float64_columns: positions of columns which should contain numbers, positions beyond the last column are ignored
+    @param decimal: decimal separator of the file
+    @return: the same table with converted columns
+    """
+    for position in float64_columns:
+        if position >= len(df.columns):
+            continue
+        column_name = df.columns[position]
+        column = df[column_name]
+        if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            df[column_name] = column.astype(np.float64)
+            continue
+        text = column.map(str, na_action='ignore')
+        if decimal != '.':
+            text = text.str.replace(decimal, '.', regex=False)
+        numbers = pd.to_numeric(text, errors='coerce')
+        df[column_name] = text if (numbers.isna() & column.notna()).any() else numbers.astype(np.float64)
+    return df
+
+
+def read_csv_table(file_path_or_buffer, float64_columns: tuple = (), chunk_size: int = None):
+    """
+    reads CSV file with recognised delimiter and decimal separator.
+    Whole files are read by pyarrow if it is available (C engine is used if pyarrow cannot parse the file), chunks by C engine.
+    C engine uses round-trip conversion of floats, so both engines give exactly the same values.
+    Columns are read without forced dtype and converted to float64 after reading (see convert_float64_columns),
+    so a text cell in the data does not stop the reading.
+
+    @param file_path_or_buffer: path to a file or file-like object
+    @param float64_columns: positions of columns which are converted to float64 (e.g. m/z and abundance)
+    @param chunk_size: number of rows of one chunk, None reads the whole file
+    @return: pd.DataFrame, or iterator of dataframes if chunk_size is given
+    """
+    delimiter, decimal = sniff_csv_dialect(read_sample(file_path_or_buffer))
+    if chunk_size is None and PYARROW_AVAILABLE:
+        try:
+            return convert_float64_columns(pd.read_csv(file_path_or_buffer, sep=delimiter, decimal=decimal, engine='pyarrow'), float64_columns, decimal)
+        except ValueError:
+            if hasattr(file_path_or_buffer, 'seek'):
+                file_path_or_buffer.seek(0)
+    if chunk_size is None:
+        return convert_float64_columns(pd.read_csv(file_path_or_buffer, sep=delimiter, decimal=decimal, float_precision='round_trip'),
+                                       float64_columns, decimal)
+    return (convert_float64_columns(chunk_df, float64_columns, decimal)
+            for chunk_df in pd.read_csv(file_path_or_buffer, sep=delimiter, decimal=decimal, chunksize=chunk_size, float_precision='round_trip'))
+
+
+if __name__ == '__main__':
+    pass
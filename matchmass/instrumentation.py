@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: instrumentation.py
+Created on 18.10.2026
+
+Note: measurement of stages of the matching pipeline. Each stage records wall time, number of rows of its result
+and peak of memory allocated during the stage (by tracemalloc, i.e. memory of Python objects and NumPy arrays,
+memory allocated by pyarrow is not included). Tracking of memory slows down code creating many Python objects
+(e.g. Excel export), so it can be switched off.
+tracemalloc is global for the whole process, but sessions of the app are threads of one process and more of them
+can measure at the same time. Tracing is started by the first measured stage and stopped after the last one, and the peak
+is reset only when no stage of another profile is measured. Peaks measured at the same time as other sessions include their memory.
+"""
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+import pandas as pd
+
+# state of tracemalloc shared by all profiles of the process
+_TRACEMALLOC_LOCK = threading.Lock()
+_tracemalloc_state = {'active_stages': 0, 'started': False}
+
+
+def observed_peak(memory_entry: list, peak_memory: int, current_memory: int) -> int:
+    """
+    @param memory_entry: [memory at start, peak of inner stages, traced peak at start or None if the peak was reset during the stage]
+    @param peak_memory: traced peak now
+    @param current_memory: traced memory now
+    @return: peak which surely happened during the stage, traced peak from before the stage (not reset because of other
+        profiles) is not used, the current memory is used instead
+    """
+    if memory_entry[2] is None or peak_memory > memory_entry[2]:
+        return peak_memory
+    return current_memory
+
+
+class PipelineProfile:
+    """
+    Collects records of measured stages. Stages can be nested, peak memory of outer stage includes peaks of inner stages.
+    """
+
+    def __init__(self, track_memory: bool = True):
+        """
+        @param track_memory: measure peak of allocated memory of each stage (tracemalloc is started if it is not running)
+        """
+        self.track_memory = track_memory
+        self.records = []
+        self._memory_stack = []
+
+    @contextmanager
+    def stage(self, stage_name: str, file: str = None):
+        """
+        measures code within the with-block as one stage. Number of rows of the result can be set to the yielded record.
+
+        Example:
+            with profile.stage('pivot') as record:
+                wide_df = pivot_aggregated_table(long_df)
+                record['rows'] = len(wide_df.index)
+
+        @param stage_name: name of the stage
+        @param file: nickname of experimental file for stages done for each file separately
+        @return: record of the stage (dictionary)
+        """
+        record = {'stage': stage_name, 'file': file, 'seconds': None, 'rows': None, 'peak_memory_bytes': None}
+        if self.track_memory:
+            with _TRACEMALLOC_LOCK:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _tracemalloc_state['started'] = True
+                current_memory, peak_memory = tracemalloc.get_traced_memory()
+                if self._memory_stack:
+                    # peak of the outer stage until now would be lost by resetting the peak
+                    self._memory_stack[-1][1] = max(self._memory_stack[-1][1], observed_peak(self._memory_stack[-1], peak_memory, current_memory))
+                # the peak is reset only if all measured stages are stages of this profile (their peaks were just saved)
+                if _tracemalloc_state['active_stages'] == len(self._memory_stack):
+                    tracemalloc.reset_peak()
+                    for memory_entry in self._memory_stack:
+                        memory_entry[2] = None
+                    self._memory_stack.append([current_memory, current_memory, None])
+                else:
+                    self._memory_stack.append([current_memory, current_memory, peak_memory])
+                _tracemalloc_state['active_stages'] += 1
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            if self.track_memory:
+                with _TRACEMALLOC_LOCK:
+                    memory_entry = self._memory_stack.pop()
+                    current_memory, peak_memory = tracemalloc.get_traced_memory()
+                    peak_memory = max(observed_peak(memory_entry, peak_memory, current_memory), memory_entry[1])
+                    record['peak_memory_bytes'] = peak_memory - memory_entry[0]
+                    if self._memory_stack:
+                        self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak_memory)
+                    _tracemalloc_state['active_stages'] -= 1
+                    if _tracemalloc_state['active_stages'] == 0 and _tracemalloc_state['started']:
+                        tracemalloc.stop()
+                        _tracemalloc_state['started'] = False
+            self.records.append(record)
+
+    def totals(self) -> dict:
+        """
+        @return: dictionary {stage: {'seconds': sum, 'rows': sum, 'peak_memory_bytes': maximum, 'calls': count}} in order of the first call
+        """
+        totals = {}
+        for record in self.records:
+            stage_totals = totals.setdefault(record['stage'], {'seconds': 0.0, 'rows': None, 'peak_memory_bytes': None, 'calls': 0})
+            stage_totals['seconds'] += record['seconds']
+            stage_totals['calls'] += 1
+            if record['rows'] is not None:
+                stage_totals['rows'] = (stage_totals['rows'] or 0) + record['rows']
+            if record['peak_memory_bytes'] is not None:
+                stage_totals['peak_memory_bytes'] = max(stage_totals['peak_memory_bytes'] or 0, record['peak_memory_bytes'])
+        return totals
+
+    def to_dict(self) -> dict:
+        """
+        @return: structured report {'stages': list of records, 'totals': see totals}, it can be saved as JSON
+        """
+        return {'stages': [dict(record) for record in self.records], 'totals': self.totals()}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        @return: table with one row for each record
+        """
+        return pd.DataFrame(self.records, columns=['stage', 'file', 'seconds', 'rows', 'peak_memory_bytes'])
+
+    def totals_dataframe(self) -> pd.DataFrame:
+        """
+        @return: table with one row for each stage, see totals
+        """
+        return pd.DataFrame.from_dict(self.totals(), orient='index', columns=['calls', 'seconds', 'rows', 'peak_memory_bytes']).rename_axis('stage')
+
+
+def measure_stage(profile: PipelineProfile, stage_name: str, file: str = None):
+    """
+    measures a stage by the profile, does nothing if the profile is None (instrumentation is opt-in)
+
+    @param profile: PipelineProfile or None
+    @param stage_name: name of the stage
+    @param file: nickname of experimental file for stages done for each file separately
+    @return: context manager yielding record of the stage (a throwaway dictionary if the profile is None)
+    """
+    if profile is None:
+        return nullcontext({})
+    return profile.stage(stage_name, file)
+
+
+if __name__ == '__main__':
+    pass
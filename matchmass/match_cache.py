@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: match_cache.py
+Created on 18.10.2026
+
+Note: cache of matched results of single experimental files. Results are cached by (hash of experimental table, version
+of theoretical index, mass accuracy, abundance threshold, nickname, matching mode), so after a change of settings
+of one file only this file is matched again. Matched results are kept as positions of matched rows (results_store.MatchedRows)
+together with the part of the long table for aggregation (engine.prepare_matched_file_for_aggregating),
+so the aggregated table is built from cached parts. Total size of cached results is bounded in bytes (the parts are the large ones),
+so the cache can be shared by all sessions of the app.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from matchmass import engine
+from matchmass.table_cache import hash_table
+from matchmass.results_store import materialize_matched_rows
+from matchmass.tolerance import MassTolerance
+from matchmass.instrumentation import measure_stage
+
+
+def result_size_bytes(matched_rows, part_for_aggregating: pd.DataFrame) -> int:
+    """
+    @param matched_rows: results_store.MatchedRows
+    @param part_for_aggregating: part of the long table for aggregation
+    @return: memory used by the cached result (including text of the part)
+    """
+    return matched_rows.nbytes + int(part_for_aggregating.memory_usage(index=True, deep=True).sum())
+
+
+def tolerance_key(tolerance_of_mass) -> tuple:
+    """
+    @param tolerance_of_mass: MassTolerance or mass accuracy in Da
+    @return: hashable representation of mass accuracy, NaN is replaced by None because it is not equal to itself
+    """
+    if not isinstance(tolerance_of_mass, MassTolerance):
+        tolerance_of_mass = MassTolerance('Da', tolerance_of_mass)
+    value = None if pd.isna(tolerance_of_mass.value) else float(tolerance_of_mass.value)
+    return (tolerance_of_mass.model, value, tuple(tolerance_of_mass.calibration_curve))
+
+
+class MatchResultCache:
+    """
+    Bounded cache of matched results, the least recently used results are removed when the cache has too many results
+    or they are too large. The cache can be shared by threads (e.g. by sessions of the app).
+    """
+
+    def __init__(self, max_entries: int = 256, max_size_bytes: int = 256 * 1024 ** 2):
+        """
+        @param max_entries: the largest number of cached results of single files
+        @param max_size_bytes: the largest total size of cached results, see result_size_bytes. Larger result is not cached at all
+        """
+        self.max_entries = max_entries
+        self.max_size_bytes = max_size_bytes
+        self.size_bytes = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, experimental_df: pd.DataFrame, theoretical_index, abundance_threshold, tolerance_of_mass,
+            orig_datafile_nickname: str, matching_mode: str) -> tuple:
+        """
+        @return: key of matched results of one file, arguments are the same as in match_file
+        """
+        abundance_threshold = None if pd.isna(abundance_threshold) else float(np.float64(abundance_threshold))
+        return (hash_table(experimental_df), theoretical_index.version, tolerance_key(tolerance_of_mass),
+                abundance_threshold, orig_datafile_nickname, matching_mode)
+
+    def match_file(self, experimental_df: pd.DataFrame, theoretical_index, abundance_threshold, tolerance_of_mass,
+                   orig_datafile_nickname: str, matching_mode: str = 'nearest', profile=None) -> tuple:
+        """
+        cached engine.find_matched_rows followed by engine.prepare_matched_file_for_aggregating
+
+        @param experimental_df: dataframe with experimental data of one file
+        @param theoretical_index: matchmass.theoretical_index.TheoreticalIndex
+        @param abundance_threshold: signals with lower abundance are dropped
+        @param tolerance_of_mass: MassTolerance or mass accuracy in Da
+        @param orig_datafile_nickname: nickname of the file
+        @param matching_mode: one of engine.MATCHING_MODES
+        @param profile: matchmass.instrumentation.PipelineProfile, hashing of the table and lookup are recorded as stage 'cache_lookup' (rows are set only for found results)
+        @return: tuple (MatchedRows, part of the long table for aggregation), the part is shallow copy of cached table
+        """
+        with measure_stage(profile, 'cache_lookup', orig_datafile_nickname) as record:
+            key = self.key(experimental_df, theoretical_index, abundance_threshold, tolerance_of_mass,
+                           orig_datafile_nickname, matching_mode)
+            with self._lock:
+                cached_result = self._results.get(key)
+                if cached_result is not None:
+                    self._results.move_to_end(key)
+                    self.hits += 1
+                    record['rows'] = len(cached_result[0].exp_rows)
+                else:
+                    self.misses += 1
+        if cached_result is not None:
+            matched_rows, part_for_aggregating, _ = cached_result
+            return (matched_rows, part_for_aggregating.copy(deep=False))
+        theoretical_index = engine.build_theoretical_index(theoretical_index)
+        with measure_stage(profile, 'matching', orig_datafile_nickname) as record:
+            matched_rows = engine.find_matched_rows(experimental_df, theoretical_index, abundance_threshold, tolerance_of_mass, matching_mode)
+            record['rows'] = len(matched_rows.exp_rows)
+        with measure_stage(profile, 'prepare_part', orig_datafile_nickname) as record:
+            part_for_aggregating = engine.prepare_matched_file_for_aggregating(
+                materialize_matched_rows(matched_rows, experimental_df, theoretical_index.table, orig_datafile_nickname))
+            record['rows'] = len(part_for_aggregating.index)
+        size_bytes = result_size_bytes(matched_rows, part_for_aggregating)
+        if size_bytes <= self.max_size_bytes:
+            with self._lock:
+                if key in self._results:
+                    self.size_bytes -= self._results.pop(key)[2]
+                self._results[key] = (matched_rows, part_for_aggregating, size_bytes)
+                self.size_bytes += size_bytes
+                while len(self._results) > self.max_entries or self.size_bytes > self.max_size_bytes:
+                    self.size_bytes -= self._results.popitem(last=False)[1][2]
+        return (matched_rows, part_for_aggregating.copy(deep=False))
+
+    def stats(self) -> dict:
+        """
+        @return: numbers of hits and misses, number of cached results and their total size in bytes
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._results), 'size_bytes': self.size_bytes}
+
+
+if __name__ == '__main__':
+    pass
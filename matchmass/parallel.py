@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: parallel.py
+Created on 18.10.2026
+
+Note: parallel matching of experimental files in a process pool.
+Index of expanded theoretical table is sent to each worker only once (when the worker starts), tasks carry only experimental data
+(or only path to the file, so the worker reads it, optionally in chunks). Results are always returned in the order of tasks.
+Inputs are validated before matching and LC-MS runs are matched scan by scan, the same way as in engine.data_matching_sequence.
+It is used by the CLI (matchmass.cli) and benchmarks, the app matches files one by one by engine.data_matching_sequence.
+"""
+import os
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from matchmass import engine
+from matchmass.chromatograms import is_scan_peaks_table, match_scan_peaks_table
+from matchmass.theoretical_index import TheoreticalIndex
+from matchmass.validation import validate_matching_inputs, files_without_errors, describe_errors
+
+# index of expanded theoretical table held by each worker process, set by _init_worker
+_worker_theoretical_index = None
+
+
+def _init_worker(theoretical_index: TheoreticalIndex) -> None:
+    """
+    keeps index of expanded theoretical table in the worker process for all tasks processed by the worker
+
+    @param theoretical_index:
+    @return: None
+    """
+    global _worker_theoretical_index
+    _worker_theoretical_index = theoretical_index
+
+
+def _match_task(task: tuple, matching_mode: str = 'nearest', theoretical_index: TheoreticalIndex = None, abundance_dtype: str = None,
+                chunk_size: int = None):
+    """
+    matches one experimental file, table with peaks of more scans (LC-MS run, see engine.load_scan_peaks_table) is matched scan by scan
+
+    @param task: tuple (source of experimental data, abundance threshold, mass accuracy, nickname of the file)
+    @param matching_mode: one of engine.MATCHING_MODES
+    @param theoretical_index: index of theoretical table, the one held by worker process is used if None
+    @param abundance_dtype: dtype for abundances of files read by the task, see engine.load_experimental_table
+    @param chunk_size: files read by the task are read and matched by parts of chunk_size rows, None means the whole file at once
+    @return: processed df with matched results, for LC-MS run tuple (df with integrated abundances, table of chromatograms)
+    """
+    source, abundance_threshold, tolerance_of_mass, orig_datafile_nickname = task
+    if theoretical_index is None:
+        theoretical_index = _worker_theoretical_index
+    if is_scan_peaks_table(source):
+        return match_scan_peaks_table(source,
+                                      theoretical_index,
+                                      abundance_threshold,
+                                      tolerance_of_mass,
+                                      orig_datafile_nickname,
+                                      matching_mode)
+    if chunk_size is not None and not isinstance(source, pd.DataFrame):
+        return engine.match_experimental_file_in_chunks(source,
+                                                        theoretical_index,
+                                                        abundance_threshold,
+                                                        tolerance_of_mass,
+                                                        orig_datafile_nickname,
+                                                        matching_mode,
+                                                        chunk_size,
+                                                        abundance_dtype)
+    if isinstance(source, pd.DataFrame):
+        single_exp_file_df = source
+    else:
+        single_exp_file_df = engine.check_numeric_experimental_columns(engine.load_experimental_table(source, abundance_dtype), source)
+    return engine.match_single_experimental_file(single_exp_file_df,
+                                                 theoretical_index,
+                                                 abundance_threshold,
+                                                 tolerance_of_mass,
+                                                 orig_datafile_nickname,
+                                                 matching_mode)
+
+
+def iter_matched_files(tasks, expanded_theoretical_mass_table_df: pd.DataFrame, n_workers: int = 1, matching_mode: str = 'nearest',
+                       abundance_dtype: str = None, chunk_size: int = None):
+    """
+    matches experimental files and yields results one by one in the order of tasks.
+    Files are matched in the current process if n_workers is 1, otherwise in a pool of n_workers processes.
+
+    @param tasks: iterable of tuples (source of experimental data, abundance threshold, mass accuracy, nickname of the file),
+        source may be a DataFrame already renamed by engine.load_experimental_table or anything accepted by it (e.g. path)
+    @param expanded_theoretical_mass_table_df: dataframe containing theoretical values of m/z for matching with experimental data (or its TheoreticalIndex)
+    @param n_workers: number of worker processes, None means number of CPUs
+    @param matching_mode: one of engine.MATCHING_MODES
+    @param abundance_dtype: dtype for abundances of files which are read from paths, see engine.load_experimental_table
+    @param chunk_size: CSV files are read and matched by parts of chunk_size rows, None means the whole file at once
+    @return: generator of processed dfs with matched results, for LC-MS runs tuples (df with integrated abundances, table of chromatograms)
+    """
+    theoretical_index = engine.build_theoretical_index(expanded_theoretical_mass_table_df)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if n_workers <= 1:
+        for task in tasks:
+            yield _match_task(task, matching_mode, theoretical_index, abundance_dtype, chunk_size)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers,
+                                 initializer=_init_worker,
+                                 initargs=(theoretical_index,)) as executor:
+            yield from executor.map(partial(_match_task, matching_mode=matching_mode, abundance_dtype=abundance_dtype, chunk_size=chunk_size), tasks)
+
+
+def match_and_aggregate_in_parallel(experimental_dfs_additional_info_df: pd.DataFrame,
+                                    dict_containing_experimental_dfs: dict,
+                                    expanded_theoretical_mass_table_df: pd.DataFrame,
+                                    n_workers: int = None,
+                                    matching_mode: str = 'nearest',
+                                    validation_issues_df: pd.DataFrame = None
+                                    ) -> tuple:
+    """
+    Parallel variant of engine.match_and_aggregate with the same inputs and outputs.
+    Inputs are validated first (see matchmass.validation) and files with errors are skipped as in engine.data_matching_sequence.
+    Table of chromatograms of each LC-MS run is added under key nickname + engine.CHROMATOGRAM_KEY_SUFFIX.
+
+    @param experimental_dfs_additional_info_df: table with additional information about experimental files and settings for matching
+    @param dict_containing_experimental_dfs: dictionary containing all experimental files as dataframes, keys are nicknames of files
+    @param expanded_theoretical_mass_table_df: dataframe containing theoretical values of m/z for matching with experimental data
+    @param n_workers: number of worker processes, None means number of CPUs
+    @param matching_mode: one of engine.MATCHING_MODES
+    @param validation_issues_df: table of issues from matchmass.validation.validate_matching_inputs, None validates the inputs here
+    @return: tuple containing dictionary with matched results (skipped files are not included) and dataframe with aggregated results from all matched files
+    """
+    if validation_issues_df is None:
+        validation_issues_df = validate_matching_inputs(experimental_dfs_additional_info_df, dict_containing_experimental_dfs, expanded_theoretical_mass_table_df)
+    nicknames_to_match = files_without_errors(validation_issues_df, experimental_dfs_additional_info_df.index)
+    if not nicknames_to_match:
+        raise ValueError('No file can be matched! ' + describe_errors(validation_issues_df))
+
+    tasks = []
+    for ind in nicknames_to_match:
+        abundance_threshold, tolerance_of_mass, orig_datafile_nickname = engine.get_values_from_additional_info_df(experimental_dfs_additional_info_df, ind)
+        tasks.append((dict_containing_experimental_dfs[ind], abundance_threshold, tolerance_of_mass, orig_datafile_nickname))
+
+    dict_containing_matched_experimental_dfs = {}
+    list_of_compared_data_dfs = []
+    for ind, matched in zip(nicknames_to_match, iter_matched_files(tasks, expanded_theoretical_mass_table_df, n_workers, matching_mode)):
+        # LC-MS run gives also table of extracted-ion chromatograms, which is not aggregated
+        chromatogram_df = None
+        if isinstance(matched, tuple):
+            matched, chromatogram_df = matched
+        dict_containing_matched_experimental_dfs[ind] = matched
+        if chromatogram_df is not None:
+            dict_containing_matched_experimental_dfs[ind + engine.CHROMATOGRAM_KEY_SUFFIX] = chromatogram_df
+        list_of_compared_data_dfs.append(matched)
+
+    aggregated_matched_files_final_form_df = engine.aggregate_matched_files(list_of_compared_data_dfs)
+
+    return (dict_containing_matched_experimental_dfs, aggregated_matched_files_final_form_df)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: results_store.py
+Created on 18.10.2026
+
+Note: compact store of matched results. Matched results of each file are kept only as positions of matched rows
+(row of experimental table -> row of theoretical table, and rank of candidate in 'all' mode).
+Dataframe with matched results is built only when it is needed (plot of one file, export) from experimental
+and theoretical tables, which are referenced, not copied. Only a few built dataframes are kept.
+"""
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+
+
+class MatchedRows(NamedTuple):
+    """
+    Namedtuple with positions of matched rows of one experimental file, already in the final order of matched results.
+    """
+    exp_rows: np.ndarray                # positions of rows in experimental table (int32)
+    theor_rows: np.ndarray              # positions of rows in expanded theoretical table (int32)
+    candidate_rank: np.ndarray = None   # rank of candidate for each pair in 'all' mode, None in 'nearest' mode
+
+    @property
+    def nbytes(self) -> int:
+        return self.exp_rows.nbytes + self.theor_rows.nbytes + (0 if self.candidate_rank is None else self.candidate_rank.nbytes)
+
+
+def materialize_matched_rows(matched_rows: MatchedRows, single_exp_file_df: pd.DataFrame, expanded_theoretical_mass_table_df: pd.DataFrame,
+                             orig_datafile_nickname: str) -> pd.DataFrame:
+    """
+    builds dataframe with matched results of one file from positions of matched rows
+
+    @param matched_rows: positions of matched rows
+    @param single_exp_file_df: experimental table used for the matching
+    @param expanded_theoretical_mass_table_df: theoretical table used for the matching
+    @param orig_datafile_nickname:
+    @return: dataframe with matched results (the same as engine.process_raw_compared_data provides)
+    """
+    experimental_part = single_exp_file_df.iloc[matched_rows.exp_rows]
+    theoretical_part = expanded_theoretical_mass_table_df.iloc[matched_rows.theor_rows]
+    theor_mz = theoretical_part['theor_m/z'].to_numpy(dtype=np.float64)
+    exp_mz = experimental_part['exp_m/z'].to_numpy(dtype=np.float64)
+
+    compared_data = pd.DataFrame({'theor_m/z': theor_mz,
+                                  'exp_m/z': experimental_part['exp_m/z'].to_numpy(),
+                                  'ID': theoretical_part['ID'].to_numpy().astype('int32'),
+                                  'name': theoretical_part['name'].array,
+                                  'ion': theoretical_part['ion'].array,
+                                  'charge': theoretical_part['charge'].array,
+                                  'Abundance': experimental_part['Abundance'].array,
+                                  'warning': theoretical_part['warning'].array})
+    if matched_rows.candidate_rank is not None:
+        mass_error = np.abs(exp_mz - theor_mz)
+        compared_data['mass_error(Da)'] = mass_error
+        compared_data['mass_error(ppm)'] = mass_error / theor_mz * 1e6
+        compared_data['candidate_rank'] = matched_rows.candidate_rank.astype('int64')
+
+    # add column with original datafile name at each row (categorical, so the name is not repeated in memory)
+    compared_data['orig_file'] = pd.Categorical.from_codes(np.zeros(len(compared_data.index), dtype='int8'), categories=[orig_datafile_nickname])
+    return compared_data
+
+
+class LazyMatchedResults(Mapping):
+    """
+    Read-only dictionary of matched results (keys are nicknames of files), dataframes are built on access.
+    It can be used everywhere instead of dictionary with matched dataframes. It can be read by more threads at once
+    (e.g. download of results is prepared in other thread than the app runs).
+    """
+
+    def __init__(self, expanded_theoretical_mass_table_df: pd.DataFrame, max_materialized: int = 2):
+        """
+        @param expanded_theoretical_mass_table_df: theoretical table used for the matching, positions of theoretical rows refer to it
+        @param max_materialized: the largest number of built dataframes which are kept for repeated access
+        """
+        self.expanded_theoretical_mass_table_df = expanded_theoretical_mass_table_df
+        self.max_materialized = max_materialized
+        self._files = {}
+        self._materialized = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key: str, single_exp_file_df: pd.DataFrame, matched_rows: MatchedRows, orig_datafile_nickname: str) -> None:
+        """
+        @param key: key of the file in the store
+        @param single_exp_file_df: experimental table used for the matching
+        @param matched_rows: positions of matched rows
+        @param orig_datafile_nickname:
+        @return: None
+        """
+        with self._lock:
+            self._files[key] = (single_exp_file_df, matched_rows, orig_datafile_nickname)
+            self._materialized.pop(key, None)
+
+    def add_table(self, key: str, table_df: pd.DataFrame) -> None:
+        """
+        adds already built table, e.g. integrated results and chromatograms of LC-MS run (see matchmass.chromatograms)
+
+        @param key: key of the table in the store
+        @param table_df: table provided on access
+        @return: None
+        """
+        with self._lock:
+            self._files[key] = table_df
+            self._materialized.pop(key, None)
+
+    def __getstate__(self) -> dict:
+        # lock cannot be pickled and built dataframes can be built again
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_materialized'] = OrderedDict()
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def matched_rows(self, key: str) -> MatchedRows:
+        """
+        @param key: key of the file in the store
+        @return: positions of matched rows, None for tables added by add_table
+        """
+        return None if isinstance(self._files[key], pd.DataFrame) else self._files[key][1]
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        with self._lock:
+            if isinstance(self._files[key], pd.DataFrame):
+                return self._files[key]
+            if key in self._materialized:
+                self._materialized.move_to_end(key)
+                return self._materialized[key]
+            single_exp_file_df, matched_rows, orig_datafile_nickname = self._files[key]
+        compared_data = materialize_matched_rows(matched_rows, single_exp_file_df, self.expanded_theoretical_mass_table_df, orig_datafile_nickname)
+        with self._lock:
+            self._materialized[key] = compared_data
+            while len(self._materialized) > self.max_materialized:
+                self._materialized.popitem(last=False)
+        return compared_data
+
+    def __contains__(self, key) -> bool:
+        # without building the dataframe (default of Mapping calls __getitem__)
+        return key in self._files
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        memory used by positions of matched rows and by tables added by add_table (referenced tables and built dataframes are not counted)
+        """
+        return sum(int(item.memory_usage(deep=False).sum()) if isinstance(item, pd.DataFrame) else item[1].nbytes for item in self._files.values())
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,508 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: spectrum_formats.py
+Created on 18.10.2026
+
+Note: readers of open mass spectrometry formats (mzML, mzXML, MGF), so spectra do not have to be exported to CSV first.
+Scans are read lazily one by one (XML is parsed by iterparse and each processed scan is removed from the tree),
+binary arrays are decoded from base64 (and zlib or MS-Numpress compression) directly into NumPy arrays.
+Scans can be used as separate experimental files or summed into one spectrum. Only the standard library and NumPy are used.
+"""
+import base64
+import io
+import os
+import re
+import zlib
+import xml.etree.ElementTree as ET
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from matchmass.file_formats import read_sample
+
+SPECTRUM_FORMATS = ('mzml', 'mzxml', 'mgf')
+SPECTRUM_FILE_EXTENSIONS = ('.mzml', '.mzxml', '.mgf')
+# peaks of scans are merged into bins of this width (Da) when scans are summed, m/z of a bin is the abundance-weighted mean
+SUMMED_SPECTRUM_BIN_WIDTH = 0.001
+# number of buffered peaks of scans after which the summed spectrum is updated, it bounds memory of summing
+SUMMING_BUFFER_SIZE = 1000000
+
+# accessions of controlled vocabulary of mzML (PSI-MS) used by the reader
+MZML_ACCESSIONS = {
+    'ms_level': 'MS:1000511',
+    'scan_start_time': 'MS:1000016',
+    'selected_ion_mz': 'MS:1000744',
+    'mz_array': 'MS:1000514',
+    'intensity_array': 'MS:1000515',
+    'minute': 'UO:0000031',
+}
+MZML_ARRAY_DTYPES = {'MS:1000521': '<f4', 'MS:1000523': '<f8', 'MS:1000519': '<i4', 'MS:1000522': '<i8'}
+# compression: (zlib is used, MS-Numpress method or None)
+MZML_COMPRESSIONS = {
+    'MS:1000576': (False, None),
+    'MS:1000574': (True, None),
+    'MS:1002312': (False, 'linear'),
+    'MS:1002313': (False, 'pic'),
+    'MS:1002314': (False, 'slof'),
+    'MS:1002746': (True, 'linear'),
+    'MS:1002747': (True, 'pic'),
+    'MS:1002748': (True, 'slof'),
+}
+
+
+class Scan(NamedTuple):
+    """
+    Namedtuple with one scan (spectrum) of a run.
+    """
+    scan_id: str                    # native ID of the scan (e.g. 'scan=12') or title in MGF
+    ms_level: int                   # None if it is not known (MGF)
+    retention_time: float           # minutes, NaN if it is not known
+    precursor_mz: float             # m/z of precursor of MSn scans, NaN for MS1
+    mz: np.ndarray                  # float64
+    intensity: np.ndarray           # float64
+
+
+def sniff_spectrum_format(file_path_or_buffer) -> str:
+    """
+    recognises mzML, mzXML and MGF files by their first bytes, extension is used only if the content cannot be read
+
+    @param file_path_or_buffer: path to a file or file-like object
+    @return: one of SPECTRUM_FORMATS, None for other files (e.g. tables)
+    """
+    sample = read_sample(file_path_or_buffer, 4096)
+    if sample:
+        if b'<mzML' in sample or b'<indexedmzML' in sample:
+            return 'mzml'
+        if b'<mzXML' in sample:
+            return 'mzxml'
+        if re.search(rb'^\s*BEGIN IONS', sample, re.MULTILINE):
+            return 'mgf'
+        return None
+    name = str(getattr(file_path_or_buffer, 'name', file_path_or_buffer)).lower()
+    for spectrum_format, extension in zip(SPECTRUM_FORMATS, SPECTRUM_FILE_EXTENSIONS):
+        if name.endswith(extension):
+            return spectrum_format
+    return None
+
+
+def is_spectrum_source(source) -> bool:
+    """
+    @param source: path, file-like object or in-memory data
+    @return: True for mzML, mzXML and MGF files
+    """
+    if isinstance(source, (pd.DataFrame, np.ndarray, tuple, list)):
+        return False
+    return sniff_spectrum_format(source) is not None
+
+
+def local_name(tag: str) -> str:
+    """
+    @param tag: tag of XML element, possibly with namespace ('{namespace}name')
+    @return: tag without namespace
+    """
+    return tag.rpartition('}')[2]
+
+
+def unpack_nibbles(data: bytes) -> np.ndarray:
+    """
+    @param data: bytes
+    @return: array of half-bytes, the higher half of each byte first
+    """
+    packed = np.frombuffer(data, dtype=np.uint8)
+    nibbles = np.empty(2 * len(packed), dtype=np.uint8)
+    nibbles[0::2] = packed >> 4
+    nibbles[1::2] = packed & 0xf
+    return nibbles
+
+
+def decode_numpress_integers(data: bytes) -> np.ndarray:
+    """
+    decodes integers of MS-Numpress (linear and pic methods) stored as variable number of half-bytes.
+    The first half-byte of each integer says how many leading half-bytes are zeros (0-8) or ones (9-15, i.e. negative numbers),
+    the other half-bytes follow from the lowest one.
+    The decoder is still per-value: position of each integer depends on lengths of all previous integers, so the positions
+    are found by a Python loop with one step per integer (about 0.25 s per million integers). Only the values at the found
+    positions are decoded by NumPy, one pass for each of the 8 possible half-bytes. Vectorised search of positions (pointer doubling,
+    decoding of blocks from all possible offsets) was slower, as it passes over all half-bytes many times, see benchmarks/numpress_decoding.py.
+
+    @param data: encoded bytes (without header)
+    @return: array of int64
+    """
+    nibbles = unpack_nibbles(data)
+    n_nibbles = len(nibbles)
+    leading_nibbles = np.where(nibbles <= 8, nibbles, nibbles - 8).astype(np.int64)
+    token_lengths = (9 - leading_nibbles).astype(np.uint8).tobytes()
+
+    is_start = bytearray(n_nibbles)
+    position = 0
+    while position < n_nibbles:
+        is_start[position] = 1
+        position += token_lengths[position]
+    starts = np.flatnonzero(np.frombuffer(is_start, dtype=np.uint8))
+    # the last half-byte of the last byte is only padding if it is zero
+    if len(starts) and starts[-1] == n_nibbles - 1 and nibbles[-1] == 0:
+        starts = starts[:-1]
+    elif position > n_nibbles:
+        raise ValueError('MS-Numpress data are truncated')
+
+    n_leading = leading_nibbles[starts]
+    n_value_nibbles = 8 - n_leading
+    padded_nibbles = np.concatenate([nibbles, np.zeros(8, dtype=np.uint8)])
+    values = np.zeros(len(starts), dtype=np.uint32)
+    for shift in range(8):
+        value_nibbles = np.where(n_value_nibbles > shift, padded_nibbles[starts + 1 + shift], 0).astype(np.uint32)
+        values |= value_nibbles << np.uint32(4 * shift)
+    # negative numbers have leading half-bytes filled with ones
+    negative = nibbles[starts] > 8
+    values[negative] |= ((np.uint64(0xffffffff) << (np.uint64(32) - 4 * n_leading[negative].astype(np.uint64))) & np.uint64(0xffffffff)).astype(np.uint32)
+    return values.view(np.int32).astype(np.int64)
+
+
+def decode_numpress(data: bytes, method: str) -> np.ndarray:
+    """
+    decodes array compressed by MS-Numpress
+
+    @param data: compressed bytes
+    @param method: 'linear' (linear prediction, used for m/z), 'pic' (positive integers) or 'slof' (short logged float, used for intensities)
+    @return: array of float64
+    """
+    if method == 'pic':
+        return decode_numpress_integers(data).astype(np.float64)
+    if len(data) < 8:
+        raise ValueError('MS-Numpress data are too short')
+    fixed_point = np.frombuffer(data[:8], dtype='>f8')[0]
+    if method == 'slof':
+        return np.exp(np.frombuffer(data[8:len(data) - (len(data) - 8) % 2], dtype='<u2') / fixed_point) - 1.0
+    # linear prediction: the first two values are stored as 4-byte integers, residuals of the other values follow
+    if len(data) < 16:
+        return np.frombuffer(data[8:len(data) - (len(data) - 8) % 4], dtype='<u4').astype(np.float64) / fixed_point
+    first_values = np.frombuffer(data[8:16], dtype='<u4').astype(np.int64)
+    residuals = decode_numpress_integers(data[16:])
+    # value(i) = 2 * value(i-1) - value(i-2) + residual(i), i.e. residuals are second differences
+    differences = (first_values[1] - first_values[0]) + np.cumsum(residuals)
+    values = np.concatenate([first_values, first_values[1] + np.cumsum(differences)])
+    return values / fixed_point
+
+
+def decode_binary_array(text: str, dtype: str = '<f8', use_zlib: bool = False, numpress_method: str = None) -> np.ndarray:
+    """
+    decodes base64 text of a binary array of mzML or mzXML
+
+    @param text: base64 text
+    @param dtype: NumPy dtype of values (with byte order)
+    @param use_zlib: data are compressed by zlib
+    @param numpress_method: method of MS-Numpress compression, see decode_numpress, None if it is not used
+    @return: array of float64
+    """
+    data = base64.b64decode(text or '')
+    if use_zlib and data:
+        data = zlib.decompress(data)
+    if numpress_method is not None:
+        return decode_numpress(data, numpress_method)
+    return np.frombuffer(data, dtype=dtype).astype(np.float64)
+
+
+def open_binary(source):
+    """
+    @param source: path to a file or file-like object
+    @return: file object opened in binary mode at the start of the file, file-like objects are only rewound
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb')
+    source.seek(0)
+    return source
+
+
+def parse_mzml_spectrum(spectrum_element) -> Scan:
+    """
+    @param spectrum_element: element 'spectrum' of mzML
+    @return: Scan
+    """
+    ms_level = None
+    retention_time = np.nan
+    precursor_mz = np.nan
+    arrays = {}
+    for element in spectrum_element.iter():
+        tag = local_name(element.tag)
+        if tag == 'cvParam':
+            accession = element.get('accession')
+            if accession == MZML_ACCESSIONS['ms_level']:
+                ms_level = int(element.get('value'))
+            elif accession == MZML_ACCESSIONS['scan_start_time'] and np.isnan(retention_time):
+                retention_time = float(element.get('value'))
+                if element.get('unitAccession') != MZML_ACCESSIONS['minute']:
+                    retention_time /= 60.0
+            elif accession == MZML_ACCESSIONS['selected_ion_mz'] and np.isnan(precursor_mz):
+                precursor_mz = float(element.get('value'))
+        elif tag == 'binaryDataArray':
+            accessions = {param.get('accession') for param in element if local_name(param.tag) == 'cvParam'}
+            array_name = 'mz' if MZML_ACCESSIONS['mz_array'] in accessions else 'intensity' if MZML_ACCESSIONS['intensity_array'] in accessions else None
+            if array_name is None:
+                continue
+            dtype = next((MZML_ARRAY_DTYPES[accession] for accession in accessions if accession in MZML_ARRAY_DTYPES), '<f8')
+            use_zlib, numpress_method = next((MZML_COMPRESSIONS[accession] for accession in accessions if accession in MZML_COMPRESSIONS), (False, None))
+            binary_element = next((child for child in element if local_name(child.tag) == 'binary'), None)
+            arrays[array_name] = decode_binary_array(None if binary_element is None else binary_element.text, dtype, use_zlib, numpress_method)
+    mz = arrays.get('mz', np.empty(0))
+    intensity = arrays.get('intensity', np.zeros(len(mz)))
+    return Scan(spectrum_element.get('id', spectrum_element.get('index', '')), ms_level, retention_time, precursor_mz, mz, intensity)
+
+
+def iter_mzml_scans(source):
+    """
+    reads scans of mzML file one by one, processed scans are removed from the parsed tree, so memory does not grow with the file
+
+    @param source: path to a file or file-like object
+    @return: generator of Scan
+    """
+    file = open_binary(source)
+    try:
+        parent_element = None
+        for event, element in ET.iterparse(file, events=('start', 'end')):
+            tag = local_name(element.tag)
+            if event == 'start':
+                if tag in ('spectrumList', 'chromatogramList'):
+                    parent_element = element
+                continue
+            if tag == 'spectrum':
+                yield parse_mzml_spectrum(element)
+            if tag in ('spectrum', 'chromatogram') and parent_element is not None:
+                element.clear()
+                parent_element.remove(element)
+    finally:
+        if file is not source:
+            file.close()
+
+
+def parse_xs_duration(text: str) -> float:
+    """
+    @param text: duration in the form of xs:duration used by mzXML, e.g. 'PT123.4S' or 'PT2M3.4S'
+    @return: duration in minutes, NaN if it cannot be read
+    """
+    match = re.fullmatch(r'-?P(?:(\d+(?:\.\d*)?)D)?T?(?:(\d+(?:\.\d*)?)H)?(?:(\d+(?:\.\d*)?)M)?(?:(\d+(?:\.\d*)?)S)?', (text or '').strip())
+    if not match or not any(match.groups()):
+        return np.nan
+    days, hours, minutes, seconds = (float(value) if value else 0.0 for value in match.groups())
+    return days * 1440.0 + hours * 60.0 + minutes + seconds / 60.0
+
+
+def iter_mzxml_scans(source):
+    """
+    reads scans of mzXML file one by one (also scans nested in their parent scans), processed scans are removed from the parsed tree
+
+    @param source: path to a file or file-like object
+    @return: generator of Scan
+    """
+    file = open_binary(source)
+    try:
+        # attributes and precursor m/z of opened scans, the innermost scan is the last one
+        open_scans = []
+        parent_elements = []
+        for event, element in ET.iterparse(file, events=('start', 'end')):
+            tag = local_name(element.tag)
+            if event == 'start':
+                if tag == 'scan':
+                    open_scans.append({'attributes': dict(element.attrib), 'precursor_mz': np.nan})
+                if tag in ('msRun', 'scan'):
+                    parent_elements.append(element)
+                continue
+            if tag == 'precursorMz' and open_scans:
+                open_scans[-1]['precursor_mz'] = float(element.text)
+            elif tag == 'peaks' and open_scans:
+                attributes = open_scans[-1]['attributes']
+                byte_order = '>' if element.get('byteOrder', 'network') == 'network' else '<'
+                dtype = byte_order + ('f8' if element.get('precision', '32') == '64' else 'f4')
+                pairs = decode_binary_array(element.text, dtype, element.get('compressionType', 'none') == 'zlib')
+                yield Scan(attributes.get('num', ''),
+                           int(attributes['msLevel']) if 'msLevel' in attributes else None,
+                           parse_xs_duration(attributes.get('retentionTime')),
+                           open_scans[-1]['precursor_mz'],
+                           pairs[0::2].copy(),
+                           pairs[1::2].copy())
+            elif tag == 'scan':
+                open_scans.pop()
+                parent_elements.pop()
+                element.clear()
+                if parent_elements:
+                    parent_elements[-1].remove(element)
+    finally:
+        if file is not source:
+            file.close()
+
+
+def iter_mgf_scans(source):
+    """
+    reads spectra of MGF file one by one, peaks of each spectrum are parsed by NumPy at once
+
+    @param source: path to a file or file-like object
+    @return: generator of Scan
+    """
+    file = open_binary(source)
+    text_file = io.TextIOWrapper(file, encoding='utf-8', errors='replace')
+    try:
+        parameters, peak_lines, in_spectrum, n_spectra = {}, io.StringIO(), False, 0
+        for line in text_file:
+            line = line.strip()
+            if line == 'BEGIN IONS':
+                parameters, peak_lines, in_spectrum = {}, io.StringIO(), True
+            elif line == 'END IONS' and in_spectrum:
+                n_spectra += 1
+                if peak_lines.tell():
+                    peak_lines.seek(0)
+                    peaks = np.loadtxt(peak_lines, dtype=np.float64, usecols=(0, 1), ndmin=2)
+                else:
+                    peaks = np.empty((0, 2))
+                precursor_mz = parameters.get('PEPMASS', '').split()
+                retention_time = parameters.get('RTINSECONDS', '').split('-')[0]
+                yield Scan(parameters.get('TITLE', parameters.get('SCANS', str(n_spectra))),
+                           None,
+                           float(retention_time) / 60.0 if retention_time else np.nan,
+                           float(precursor_mz[0]) if precursor_mz else np.nan,
+                           peaks[:, 0].copy(),
+                           peaks[:, 1].copy())
+                in_spectrum = False
+            elif in_spectrum and line and not line.startswith(('#', ';', '!', '/')):
+                if line[0].isdigit() or line[0] in '.-+':
+                    peak_lines.write(line.replace(',', ' ') + '\n')
+                elif '=' in line:
+                    key, _, value = line.partition('=')
+                    parameters[key.strip().upper()] = value.strip()
+    finally:
+        # file-like objects given by caller stay open
+        if file is source:
+            text_file.detach()
+        else:
+            text_file.close()
+
+
+def iter_scans(source, ms_level: int = None):
+    """
+    reads scans of mzML, mzXML or MGF file one by one
+
+    @param source: path to a file or file-like object
+    @param ms_level: only scans of this MS level are provided, None provides all scans (scans without MS level, i.e. from MGF, are always provided)
+    @return: generator of Scan
+    """
+    readers = {'mzml': iter_mzml_scans, 'mzxml': iter_mzxml_scans, 'mgf': iter_mgf_scans}
+    spectrum_format = sniff_spectrum_format(source)
+    if spectrum_format is None:
+        raise ValueError('File is not in mzML, mzXML or MGF format')
+    for scan in readers[spectrum_format](source):
+        if ms_level is None or scan.ms_level is None or scan.ms_level == ms_level:
+            yield scan
+
+
+def sum_scans(scans, bin_width: float = SUMMED_SPECTRUM_BIN_WIDTH, buffer_size: int = SUMMING_BUFFER_SIZE) -> pd.DataFrame:
+    """
+    sums scans into one spectrum. Peaks are merged in bins of m/z, abundances are summed and m/z of the bin
+    is the abundance-weighted mean of merged peaks. Scans are buffered only up to buffer_size peaks, then they are merged into the sum.
+
+    @param scans: iterable of Scan
+    @param bin_width: width of bins (Da)
+    @param buffer_size: number of buffered peaks
+    @return: experimental table with columns 'exp_m/z' and 'Abundance' sorted by m/z
+    """
+    summed_bins, summed_abundance, summed_weighted_mz = np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    buffered_scans, n_buffered_peaks = [], 0
+
+    def merge_buffer() -> None:
+        nonlocal summed_bins, summed_abundance, summed_weighted_mz, buffered_scans, n_buffered_peaks
+        mz = np.concatenate([scan.mz for scan in buffered_scans])
+        abundance = np.concatenate([scan.intensity for scan in buffered_scans])
+        valid = np.isfinite(mz)
+        mz, abundance = mz[valid], abundance[valid]
+        bins = np.concatenate([summed_bins, np.floor(mz / bin_width).astype(np.int64)])
+        summed_bins, positions = np.unique(bins, return_inverse=True)
+        summed_abundance = np.bincount(positions, np.concatenate([summed_abundance, abundance]), len(summed_bins))
+        summed_weighted_mz = np.bincount(positions, np.concatenate([summed_weighted_mz, mz * abundance]), len(summed_bins))
+        buffered_scans, n_buffered_peaks = [], 0
+
+    for scan in scans:
+        buffered_scans.append(scan)
+        n_buffered_peaks += len(scan.mz)
+        if n_buffered_peaks >= buffer_size:
+            merge_buffer()
+    if buffered_scans:
+        merge_buffer()
+
+    # bins with zero abundance have no weights, their centre is used
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mz = np.where(summed_abundance > 0, summed_weighted_mz / summed_abundance, (summed_bins + 0.5) * bin_width)
+    return pd.DataFrame({'exp_m/z': mz, 'Abundance': summed_abundance})
+
+
+def read_summed_spectrum(source, ms_level: int = 1, bin_width: float = SUMMED_SPECTRUM_BIN_WIDTH) -> pd.DataFrame:
+    """
+    @param source: path to a file or file-like object with mzML, mzXML or MGF file
+    @param ms_level: MS level of summed scans, see iter_scans
+    @param bin_width: see sum_scans
+    @return: experimental table with columns 'exp_m/z' and 'Abundance' of summed scans
+    """
+    return sum_scans(iter_scans(source, ms_level), bin_width)
+
+
+def read_scan_peaks(source, ms_level: int = 1) -> pd.DataFrame:
+    """
+    reads peaks of all scans to one long table, rows of each scan are together in the order of scans.
+    Scan without peaks has one row without m/z and abundance (see empty_scan_rows), so retention times of all scans are kept
+    (integration of chromatograms needs them). The table can be cached as one file and split into scans by split_scan_peaks.
+
+    @param source: path to a file or file-like object with mzML, mzXML or MGF file
+    @param ms_level: MS level of read scans, see iter_scans
+    @return: table with columns 'scan' (categorical scan ID), 'retention_time(min)', 'precursor_m/z', 'exp_m/z' and 'Abundance'
+    """
+    scan_ids, retention_times, precursor_mzs, mz_arrays, abundance_arrays = [], [], [], [], []
+    for scan in iter_scans(source, ms_level):
+        scan_ids.append(scan.scan_id)
+        retention_times.append(scan.retention_time)
+        precursor_mzs.append(scan.precursor_mz)
+        mz_arrays.append(scan.mz if len(scan.mz) else np.full(1, np.nan))
+        abundance_arrays.append(scan.intensity if len(scan.mz) else np.full(1, np.nan))
+    n_peaks_of_scans = np.array([len(mz) for mz in mz_arrays], dtype=np.int64)
+    scan_positions = np.repeat(np.arange(len(scan_ids)), n_peaks_of_scans)
+    # the same ID can be used by more scans of MGF files, categories have to be unique
+    categories = pd.Index(scan_ids).where(~pd.Index(scan_ids).duplicated(), [f'{scan_id} ({i + 1})' for i, scan_id in enumerate(scan_ids)])
+    return pd.DataFrame({
+        'scan': pd.Categorical.from_codes(scan_positions, categories=categories),
+        'retention_time(min)': np.array(retention_times, dtype=np.float64)[scan_positions],
+        'precursor_m/z': np.array(precursor_mzs, dtype=np.float64)[scan_positions],
+        'exp_m/z': np.concatenate(mz_arrays) if mz_arrays else np.empty(0),
+        'Abundance': np.concatenate(abundance_arrays) if abundance_arrays else np.empty(0),
+    })
+
+
+def empty_scan_rows(scan_peaks_df: pd.DataFrame) -> np.ndarray:
+    """
+    @param scan_peaks_df: table from read_scan_peaks
+    @return: boolean array, True for rows which only keep scans without peaks (both m/z and abundance are missing)
+    """
+    return scan_peaks_df['exp_m/z'].isna().to_numpy() & scan_peaks_df['Abundance'].isna().to_numpy()
+
+
+def split_scan_peaks(scan_peaks_df: pd.DataFrame):
+    """
+    splits long table from read_scan_peaks into scans, scans without peaks are left out
+
+    @param scan_peaks_df: table from read_scan_peaks
+    @return: generator of tuples (scan ID, retention time, precursor m/z, experimental table with columns 'exp_m/z' and 'Abundance')
+    """
+    codes = scan_peaks_df['scan'].cat.codes.to_numpy()
+    boundaries = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate([[0], boundaries]) if len(codes) else np.empty(0, dtype=np.int64)
+    stops = np.concatenate([boundaries, [len(codes)]]) if len(codes) else np.empty(0, dtype=np.int64)
+    peaks_df = scan_peaks_df[['exp_m/z', 'Abundance']]
+    is_empty_scan_row = empty_scan_rows(scan_peaks_df)
+    for start, stop in zip(starts, stops):
+        if stop - start == 1 and is_empty_scan_row[start]:
+            continue
+        yield (scan_peaks_df['scan'].cat.categories[codes[start]],
+               float(scan_peaks_df['retention_time(min)'].iat[start]),
+               float(scan_peaks_df['precursor_m/z'].iat[start]),
+               peaks_df.iloc[start:stop].reset_index(drop=True))
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: table_cache.py
+Created on 18.10.2026
+
+Note: disk cache of parsed tables. Uploaded files are parsed (and their columns renamed) only once,
+the parsed table is saved as Parquet file named by hash of the file content and kind of the table.
+Reruns of the app and repeated uploads of the same file then only read the Parquet file.
+Total size of the cache is limited, the least recently used tables are removed first.
+Parquet needs pyarrow, without it the cache only calls the loader.
+"""
+import hashlib
+import importlib.util
+import os
+from io import BytesIO
+import pandas as pd
+
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+
+def hash_table(df: pd.DataFrame) -> str:
+    """
+    @param df:
+    @return: hash of the content (values, column names and dtypes) of the table
+    """
+    table_hash = hashlib.sha256(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    table_hash.update(repr(list(zip(df.columns, map(str, df.dtypes)))).encode())
+    return table_hash.hexdigest()
+
+
+def read_content(source) -> bytes:
+    """
+    reads the whole content of a file, position of file-like object is returned to the start
+
+    @param source: path to a file or file-like object (e.g. a Streamlit UploadedFile object)
+    @return: content of the file
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            return file.read()
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    source.seek(0)
+    content = source.read()
+    source.seek(0)
+    return content
+
+
+class ParquetTableCache:
+    """
+    Cache of parsed tables saved as Parquet files in one directory.
+    Time of the last use of each table is kept as modification time of its file, so the cache is shared by all sessions of the app.
+    """
+
+    def __init__(self, cache_dir: str, max_size_bytes: int = 512 * 1024 ** 2):
+        """
+        @param cache_dir: directory for Parquet files, it is created if it does not exist
+        @param max_size_bytes: the largest total size of all cached tables
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, content: bytes, kind: str) -> str:
+        """
+        @param content: content of the original file
+        @param kind: kind of the table (e.g. 'theoretical' or 'experimental'), the same file is parsed differently for each kind
+        @return: key of the table in the cache
+        """
+        return kind + '_' + hashlib.sha256(content).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.parquet')
+
+    def get(self, key: str):
+        """
+        @param key:
+        @return: cached table or None if the table is not in the cache (or cannot be read)
+        """
+        path = self.path(key)
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        """
+        saves table to the cache and removes the least recently used tables if the cache is too large
+
+        @param key:
+        @param df: parsed table
+        @return: None
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(key)
+        # table is written to a temporary file first, so other sessions never read a half-written table
+        temporary_path = path + '.' + str(os.getpid()) + '.tmp'
+        try:
+            df.to_parquet(temporary_path, index=False)
+            os.replace(temporary_path, path)
+        except (OSError, ValueError):
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            return
+        # table larger than the whole cache would only remove all other tables
+        if os.path.getsize(path) > self.max_size_bytes:
+            os.remove(path)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        removes the least recently used tables until the total size of the cache is within max_size_bytes
+
+        @return: None
+        """
+        cached_files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.parquet'):
+                try:
+                    cached_files.append((entry.stat().st_mtime, entry.stat().st_size, entry.path))
+                except OSError:
+                    pass
+        total_size = sum(size for _, size, _ in cached_files)
+        for _, size, path in sorted(cached_files):
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
+
+    def load(self, source, kind: str, loader) -> pd.DataFrame:
+        """
+        provides parsed table from the cache or parses it by the loader and saves it to the cache
+
+        @param source: path to a file or file-like object
+        @param kind: kind of the table, see key
+        @param loader: function which parses the source, e.g. matchmass.engine.load_experimental_table
+        @return: parsed table
+        """
+        if not PYARROW_AVAILABLE:
+            return loader(source)
+        content = read_content(source)
+        key = self.key(content, kind)
+        df = self.get(key)
+        if df is not None:
+            self.hits += 1
+            return df
+        self.misses += 1
+        buffer = BytesIO(content)
+        buffer.name = getattr(source, 'name', str(source))
+        df = loader(buffer)
+        self.put(key, df)
+        return df
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: theoretical_index.py
+Created on 18.10.2026
+
+Note: sorted index of theoretical m/z values. It is built once for the expanded theoretical table
+and then reused for matching of all experimental files (instead of pd.merge_asof for each file).
+Index can find only the nearest theoretical m/z or all theoretical m/z within tolerance.
+"""
+import numpy as np
+import pandas as pd
+from matchmass.table_cache import hash_table
+
+
+class TheoreticalIndex:
+    """
+    Holds sorted theoretical m/z values as a contiguous float64 array together with positions of the rows in the expanded theoretical table.
+    Finds the nearest theoretical m/z within tolerance for all experimental values at once by np.searchsorted.
+    Results are the same as from pd.merge_asof(direction='nearest', allow_exact_matches=True).
+    """
+
+    def __init__(self, expanded_theoretical_mass_table_df: pd.DataFrame):
+        """
+        @param expanded_theoretical_mass_table_df: full table of theoretical m/z values for ions of interest
+        """
+        self.table = expanded_theoretical_mass_table_df.reset_index(drop=True)
+        theor_mz = self.table['theor_m/z'].to_numpy(dtype=np.float64)
+        # stable sorting keeps the original order of rows with the same m/z (as merge_asof sees them)
+        self.row_ids = np.argsort(theor_mz, kind='stable')
+        self.mz = np.ascontiguousarray(theor_mz[self.row_ids])
+        self._version = None
+
+    def __len__(self) -> int:
+        return len(self.mz)
+
+    @property
+    def version(self) -> str:
+        """
+        hash of the expanded theoretical table, it identifies the index e.g. in cache of matched results. It is computed on the first use.
+        """
+        if self._version is None:
+            self._version = hash_table(self.table)
+        return self._version
+
+    def find_nearest(self, exp_mz, tolerance_of_mass: float) -> np.ndarray:
+        """
+        finds the nearest theoretical m/z for each experimental m/z. Ties are resolved in favour of the lower theoretical m/z.
+
+        @param exp_mz: array of experimental m/z values
+        @param tolerance_of_mass: largest allowed absolute difference between experimental and theoretical m/z,
+            single number or array with one value for each experimental m/z
+        @return: array with position of matched row in the theoretical table for each experimental value, -1 where there is no match
+        """
+        exp_mz = np.asarray(exp_mz, dtype=np.float64)
+        n_theor = len(self.mz)
+        if n_theor == 0:
+            return np.full(len(exp_mz), -1, dtype=np.int64)
+
+        # the last theoretical value lower or equal to experimental value and the first one higher or equal to it
+        backward = np.searchsorted(self.mz, exp_mz, side='right') - 1
+        forward = np.searchsorted(self.mz, exp_mz, side='left')
+        backward_diff = exp_mz - self.mz[np.clip(backward, 0, n_theor - 1)]
+        forward_diff = self.mz[np.clip(forward, 0, n_theor - 1)] - exp_mz
+        backward_ok = (backward >= 0) & (backward_diff <= tolerance_of_mass)
+        forward_ok = (forward < n_theor) & (forward_diff <= tolerance_of_mass)
+
+        use_backward = backward_ok & (~forward_ok | (backward_diff <= forward_diff))
+        sorted_positions = np.where(use_backward, backward, np.where(forward_ok, forward, -1))
+        return np.where(sorted_positions >= 0, self.row_ids[np.clip(sorted_positions, 0, n_theor - 1)], -1)
+
+    def find_all_within(self, exp_mz, tolerance_of_mass: float) -> tuple:
+        """
+        finds all theoretical m/z within tolerance for each experimental m/z.
+        Because theoretical values are sorted, candidates of each experimental value form one continuous interval
+        and only bounds of the intervals are searched, so the cost grows with the number of found pairs, not with their product.
+
+        @param exp_mz: array of experimental m/z values
+        @param tolerance_of_mass: largest allowed absolute difference between experimental and theoretical m/z,
+            single number or array with one value for each experimental m/z
+        @return: tuple (positions of experimental values, positions of matched rows in the theoretical table), one item per found pair,
+            pairs are ordered by experimental value and then by theoretical m/z
+        """
+        exp_mz = np.asarray(exp_mz, dtype=np.float64)
+        tolerance_of_mass = np.broadcast_to(np.asarray(tolerance_of_mass, dtype=np.float64), exp_mz.shape)
+        # bounds are widened by one floating-point step, exact condition is checked below on the differences (as in find_nearest)
+        lower_bounds = np.searchsorted(self.mz, np.nextafter(exp_mz - tolerance_of_mass, -np.inf), side='left')
+        upper_bounds = np.searchsorted(self.mz, np.nextafter(exp_mz + tolerance_of_mass, np.inf), side='right')
+        counts = upper_bounds - lower_bounds
+
+        # expand intervals to pairs without Python loop
+        exp_positions = np.repeat(np.arange(len(exp_mz)), counts)
+        offsets_within_interval = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        sorted_positions = np.repeat(lower_bounds, counts) + offsets_within_interval
+
+        within_tolerance = np.abs(exp_mz[exp_positions] - self.mz[sorted_positions]) <= tolerance_of_mass[exp_positions]
+        return (exp_positions[within_tolerance], self.row_ids[sorted_positions[within_tolerance]])
+
+    def find_all_ranked(self, exp_mz, tolerance_of_mass: float) -> tuple:
+        """
+        finds all theoretical m/z within tolerance for each experimental m/z and ranks the candidates of each experimental value
+        by absolute mass error (rank 1 is the smallest error)
+
+        @param exp_mz: array of experimental m/z values
+        @param tolerance_of_mass: single number or array with one value for each experimental m/z
+        @return: tuple (positions of experimental values, positions of matched rows in the theoretical table, mass errors in Da, ranks),
+            pairs are ordered by experimental value and then by rank
+        """
+        exp_mz = np.asarray(exp_mz, dtype=np.float64)
+        exp_positions, matched_row_ids = self.find_all_within(exp_mz, tolerance_of_mass)
+        mass_error = exp_mz[exp_positions] - self.table['theor_m/z'].to_numpy(dtype=np.float64)[matched_row_ids]
+
+        # order candidates within each experimental signal by absolute error and number them
+        order = np.lexsort((np.abs(mass_error), exp_positions))
+        exp_positions, matched_row_ids, mass_error = exp_positions[order], matched_row_ids[order], mass_error[order]
+        is_first_candidate = np.r_[True, exp_positions[1:] != exp_positions[:-1]] if len(exp_positions) else np.array([], dtype=bool)
+        first_candidate_positions = np.flatnonzero(is_first_candidate)
+        candidate_rank = np.arange(len(exp_positions)) - np.repeat(first_candidate_positions, np.diff(np.r_[first_candidate_positions, len(exp_positions)])) + 1
+        return (exp_positions, matched_row_ids, mass_error, candidate_rank)
+
+    def match_all(self, single_exp_file_df: pd.DataFrame, tolerance_of_mass: float) -> pd.DataFrame:
+        """
+        Returns every pair of experimental and theoretical m/z within defined mass accuracy.
+        Each pair has absolute (Da) and relative (ppm) mass error and rank of the candidate within the experimental signal,
+        so the best candidate (rank 1, the smallest absolute error) is still identifiable.
+
+        @param single_exp_file_df: experimental data with column 'exp_m/z'
+        @param tolerance_of_mass: single number or array with one value for each experimental signal
+        @return: dataframe with one row for each found pair, experimental rows without any candidate are not included
+        """
+        exp_positions, matched_row_ids, mass_error, candidate_rank = self.find_all_ranked(single_exp_file_df['exp_m/z'].to_numpy(), tolerance_of_mass)
+        theor_mz = self.table['theor_m/z'].to_numpy(dtype=np.float64)[matched_row_ids]
+
+        compared_data_raw = pd.concat([single_exp_file_df.iloc[exp_positions].reset_index(drop=True),
+                                       self.table.iloc[matched_row_ids].reset_index(drop=True)], axis=1)
+        compared_data_raw['mass_error(Da)'] = np.abs(mass_error)
+        compared_data_raw['mass_error(ppm)'] = np.abs(mass_error) / theor_mz * 1e6
+        compared_data_raw['candidate_rank'] = candidate_rank
+        return compared_data_raw
+
+    def match(self, single_exp_file_df: pd.DataFrame, tolerance_of_mass: float) -> pd.DataFrame:
+        """
+        Matches rows with theoretical and experimental m/z values within defined mass accuracy.
+
+        @param single_exp_file_df: experimental data with column 'exp_m/z'
+        @param tolerance_of_mass: single number or array with one value for each experimental signal
+        @return: dataframe with all experimental rows and columns of matched theoretical rows (NaN where there is no match)
+        """
+        matched_row_ids = self.find_nearest(single_exp_file_df['exp_m/z'].to_numpy(), tolerance_of_mass)
+        matched_theoretical_rows_df = self.table.reindex(matched_row_ids).reset_index(drop=True)
+        compared_data_raw = pd.concat([single_exp_file_df.reset_index(drop=True), matched_theoretical_rows_df], axis=1)
+        return compared_data_raw
+
+
+if __name__ == '__main__':
+    pass
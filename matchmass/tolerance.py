@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: tolerance.py
+Created on 18.10.2026
+
+Note: models of mass accuracy (tolerance) used for matching.
+    'Da' - the same absolute mass accuracy for all m/z values
+    'ppm' - mass accuracy relative to experimental m/z (error of high-resolution instruments scales with m/z)
+    'calibration' - mass accuracy in Da linearly interpolated between points of a calibration curve
+Tolerance is calculated for all experimental signals at once as an array, so variable-width windows stay vectorized.
+"""
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+
+TOLERANCE_MODELS = ('Da', 'ppm', 'calibration')
+
+
+def parse_calibration_curve(calibration_curve_text: str) -> tuple:
+    """
+    reads calibration curve written as comma separated pairs 'm/z:mass accuracy in Da', e.g. '100:0.002, 1000:0.01'
+
+    @param calibration_curve_text: text with points of calibration curve
+    @return: tuple of (m/z, mass accuracy) pairs sorted by m/z
+    """
+    points = []
+    for point_text in str(calibration_curve_text).replace(';', ',').split(','):
+        if not point_text.strip():
+            continue
+        try:
+            mz_text, accuracy_text = point_text.split(':')
+            points.append((float(mz_text), float(accuracy_text)))
+        except ValueError:
+            raise ValueError(f"Point '{point_text.strip()}' of calibration curve is not in the form 'm/z:mass accuracy'")
+    if not points:
+        raise ValueError('Calibration curve has to contain at least one point')
+    return tuple(sorted(points))
+
+
+class MassTolerance(NamedTuple):
+    """
+    Namedtuple describing mass accuracy of one experimental file.
+    """
+    model: str
+    value: float = np.nan               # mass accuracy in Da or ppm according to the model, not used for calibration
+    calibration_curve: tuple = ()       # pairs (m/z, mass accuracy in Da) sorted by m/z
+
+    def window(self, exp_mz):
+        """
+        calculates mass accuracy (half-width of matching window in Da) for experimental m/z values
+
+        @param exp_mz: array of experimental m/z values
+        @return: float for 'Da' model, otherwise array with mass accuracy for each experimental value
+        """
+        if self.model == 'ppm':
+            return np.asarray(exp_mz, dtype=np.float64) * self.value * 1e-6
+        if self.model == 'calibration':
+            calibration_mz, calibration_accuracy = zip(*self.calibration_curve)
+            return np.interp(np.asarray(exp_mz, dtype=np.float64), calibration_mz, calibration_accuracy)
+        return self.value
+
+    def largest_window(self, max_mz: float) -> float:
+        """
+        provides the largest mass accuracy in Da for m/z values up to max_mz, e.g. for warnings and plotting
+
+        @param max_mz: the largest m/z of interest
+        @return: mass accuracy in Da
+        """
+        if self.model == 'ppm':
+            return max_mz * self.value * 1e-6
+        if self.model == 'calibration':
+            return max(accuracy for _, accuracy in self.calibration_curve)
+        return self.value
+
+
+def mass_tolerance_from_settings(tolerance_model, mass_accuracy_da, mass_accuracy_ppm=np.nan, calibration_curve_text='') -> MassTolerance:
+    """
+    builds MassTolerance from values in the table with additional information about experimental files
+
+    @param tolerance_model: one of TOLERANCE_MODELS, empty value means 'Da'
+    @param mass_accuracy_da: value from column 'mass_accuracy(Da)'
+    @param mass_accuracy_ppm: value from column 'mass_accuracy(ppm)'
+    @param calibration_curve_text: value from column 'calibration_curve'
+    @return: MassTolerance
+    """
+    if pd.isna(tolerance_model) or tolerance_model == '':
+        tolerance_model = 'Da'
+    if tolerance_model not in TOLERANCE_MODELS:
+        raise ValueError(f"Unknown tolerance model '{tolerance_model}', use one of: {', '.join(TOLERANCE_MODELS)}")
+    if tolerance_model == 'ppm':
+        return MassTolerance('ppm', float(mass_accuracy_ppm))
+    if tolerance_model == 'calibration':
+        return MassTolerance('calibration', calibration_curve=parse_calibration_curve(calibration_curve_text))
+    return MassTolerance('Da', float(mass_accuracy_da))
+
+
+def tolerance_window(tolerance_of_mass, exp_mz):
+    """
+    calculates mass accuracy for experimental m/z values from MassTolerance or from a plain number (Da)
+
+    @param tolerance_of_mass: MassTolerance or mass accuracy in Da
+    @param exp_mz: array of experimental m/z values
+    @return: float or array with mass accuracy in Da
+    """
+    if isinstance(tolerance_of_mass, MassTolerance):
+        return tolerance_of_mass.window(exp_mz)
+    return tolerance_of_mass
+
+
+if __name__ == '__main__':
+    pass
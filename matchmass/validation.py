@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: validation.py
+Created on 18.10.2026
+
+Note: validation of inputs before matching. Each experimental file, its settings (mass accuracy, abundance threshold)
+and the full theoretical table are checked in one pass over the data (no sorting), and all found problems are reported
+as a table of issues, one row for each problem of each file.
+    'error' - the file cannot be matched and it is skipped (an error of the theoretical table stops the whole matching)
+    'warning' - the file is matched, but some of its rows are never matched or results may be surprising
+    'info' - only for information, e.g. m/z values are not sorted (they are sorted before matching anyway)
+"""
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from matchmass.tolerance import mass_tolerance_from_settings
+from matchmass.chromatograms import is_scan_peaks_table, SCAN_COLUMNS
+from matchmass.spectrum_formats import empty_scan_rows
+
+SEVERITIES = ('error', 'warning', 'info')
+ISSUE_COLUMNS = ['nickname', 'orig_name', 'severity', 'check', 'message', 'rows']
+# name used in the table of issues for problems of the full theoretical table
+THEORETICAL_TABLE_NAME = 'theoretical table'
+
+
+class ValidationIssue(NamedTuple):
+    """
+    Namedtuple describing one problem of one file (one row of the table of issues).
+    """
+    nickname: str           # nickname of experimental file, None for theoretical table
+    orig_name: str          # original name of the file
+    severity: str           # one of SEVERITIES
+    check: str              # short name of the check, e.g. 'columns', 'numeric', 'missing_values'
+    message: str
+    rows: int = 0           # number of affected rows, 0 if the problem does not concern particular rows
+
+
+def count_not_numeric(column: pd.Series) -> int:
+    """
+    @param column: column which should contain numbers
+    @return: number of values (not counting empty ones) which cannot be converted to numbers
+    """
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        return 0
+    return int((pd.to_numeric(column, errors='coerce').isna() & column.notna()).sum())
+
+
+def validate_experimental_table(single_exp_file_df: pd.DataFrame, nick: str, orig_name: str) -> list[ValidationIssue]:
+    """
+    checks one experimental table (as from engine.load_experimental_table), i.e. number of columns, numeric values,
+    missing values and unsorted or duplicated m/z values. Peaks of LC-MS runs (more scans in one table) are not checked for
+    unsorted and duplicated m/z, scans repeat the same m/z values.
+
+    @param single_exp_file_df: experimental data with columns 'exp_m/z' and 'Abundance'
+    @param nick: nickname of the file
+    @param orig_name: original name of the file
+    @return: list of ValidationIssue, empty if the table is fine
+    """
+    issues = []
+
+    def add_issue(severity: str, check: str, message: str, rows: int = 0) -> None:
+        issues.append(ValidationIssue(nick, orig_name, severity, check, message, int(rows)))
+
+    if single_exp_file_df is None:
+        add_issue('error', 'missing_data', 'Experimental data were not found, upload experimental files')
+        return issues
+    is_lcms_run = is_scan_peaks_table(single_exp_file_df)
+    n_columns = len(single_exp_file_df.columns) - (len(SCAN_COLUMNS) if is_lcms_run else 0)
+    if n_columns < 2 or 'exp_m/z' not in single_exp_file_df.columns or 'Abundance' not in single_exp_file_df.columns:
+        add_issue('error', 'columns', f'Table has {n_columns} column(s), two columns (m/z and abundance) are expected')
+        return issues
+    if n_columns > 2:
+        add_issue('warning', 'columns', f'Table has {n_columns} columns, only the first two (m/z and abundance) are used')
+    if is_lcms_run:
+        # rows of scans without peaks only keep their retention times
+        single_exp_file_df = single_exp_file_df[~empty_scan_rows(single_exp_file_df)]
+    n_rows = len(single_exp_file_df.index)
+    if n_rows == 0:
+        add_issue('error', 'empty', 'Table does not contain any rows')
+        return issues
+
+    # values which are not numbers would break the matching of the whole file
+    for column_name, column_description in (('exp_m/z', 'm/z'), ('Abundance', 'abundance')):
+        n_not_numeric = count_not_numeric(single_exp_file_df[column_name])
+        if n_not_numeric:
+            add_issue('error', 'numeric', f'{n_not_numeric} {column_description} values are not numbers (e.g. text or header in the data)',
+                      n_not_numeric)
+    if any(issue.check == 'numeric' for issue in issues):
+        return issues
+
+    mz = single_exp_file_df['exp_m/z'].to_numpy(dtype=np.float64)
+    abundance = single_exp_file_df['Abundance'].to_numpy(dtype=np.float64)
+    valid_mz = np.isfinite(mz)
+    n_missing_mz = n_rows - int(valid_mz.sum())
+    if n_missing_mz == n_rows:
+        add_issue('error', 'missing_values', 'Table does not contain any m/z value', n_missing_mz)
+        return issues
+    if n_missing_mz:
+        add_issue('warning', 'missing_values', f'{n_missing_mz} rows without m/z value are never matched', n_missing_mz)
+    n_missing_abundance = int(np.isnan(abundance).sum())
+    if n_missing_abundance:
+        add_issue('warning', 'missing_values', f'{n_missing_abundance} rows without abundance are removed by abundance threshold',
+                  n_missing_abundance)
+    n_not_positive_mz = int((mz[valid_mz] <= 0).sum())
+    if n_not_positive_mz:
+        add_issue('warning', 'negative_mz', f'{n_not_positive_mz} m/z values are zero or negative', n_not_positive_mz)
+
+    if is_lcms_run:
+        return issues
+    # sorted data are checked by neighbours, otherwise duplicates are found by hashing (both without sorting)
+    mz = mz[valid_mz]
+    is_sorted = bool(np.all(mz[1:] >= mz[:-1]))
+    n_duplicated_mz = int((mz[1:] == mz[:-1]).sum()) if is_sorted else int(pd.Series(mz).duplicated().sum())
+    if not is_sorted:
+        add_issue('info', 'unsorted_mz', 'm/z values are not sorted, they are sorted before matching')
+    if n_duplicated_mz:
+        add_issue('warning', 'duplicated_mz', f'{n_duplicated_mz} rows have the same m/z as another row, each of them is matched',
+                  n_duplicated_mz)
+    return issues
+
+
+def validate_matching_settings(file_info: pd.Series, nick: str, orig_name: str) -> list[ValidationIssue]:
+    """
+    checks settings of one experimental file from the table with additional information, i.e. mass accuracy (for the chosen
+    tolerance model) and abundance threshold. Missing values would silently lead to no matches.
+
+    @param file_info: row of the table with additional information about experimental files
+    @param nick: nickname of the file
+    @param orig_name: original name of the file
+    @return: list of ValidationIssue, empty if the settings are fine
+    """
+    issues = []
+    try:
+        tolerance_of_mass = mass_tolerance_from_settings(file_info.get('tolerance_model', 'Da'),
+                                                         file_info.get('mass_accuracy(Da)', np.nan),
+                                                         file_info.get('mass_accuracy(ppm)', np.nan),
+                                                         file_info.get('calibration_curve', ''))
+    except (ValueError, TypeError) as error:
+        issues.append(ValidationIssue(nick, orig_name, 'error', 'tolerance', str(error)))
+    else:
+        if tolerance_of_mass.model == 'calibration':
+            accuracies = np.array([accuracy for _, accuracy in tolerance_of_mass.calibration_curve])
+        else:
+            accuracies = np.array([tolerance_of_mass.value])
+        if np.isnan(accuracies).any():
+            issues.append(ValidationIssue(nick, orig_name, 'error', 'tolerance', f'Mass accuracy ({tolerance_of_mass.model}) is missing'))
+        elif (accuracies < 0).any():
+            issues.append(ValidationIssue(nick, orig_name, 'error', 'tolerance', f'Mass accuracy ({tolerance_of_mass.model}) is negative'))
+
+    abundance_threshold = pd.to_numeric(pd.Series([file_info.get('abund_thrs', np.nan)]), errors='coerce').iat[0]
+    if pd.isna(abundance_threshold):
+        issues.append(ValidationIssue(nick, orig_name, 'error', 'threshold', 'Abundance threshold is missing'))
+    return issues
+
+
+def validate_theoretical_table(expanded_theoretical_mass_table_df: pd.DataFrame) -> list[ValidationIssue]:
+    """
+    checks full theoretical table (with picked ions), an error means that no file can be matched
+
+    @param expanded_theoretical_mass_table_df: full theoretical table, see engine.add_ions_to_theoretical_table
+    @return: list of ValidationIssue, empty if the table is fine
+    """
+    issues = []
+    if 'theor_m/z' not in expanded_theoretical_mass_table_df.columns or expanded_theoretical_mass_table_df.empty:
+        issues.append(ValidationIssue(None, THEORETICAL_TABLE_NAME, 'error', 'empty',
+                                      'Theoretical table is empty, upload the table and pick at least one ion'))
+        return issues
+    n_rows = len(expanded_theoretical_mass_table_df.index)
+    n_missing_mz = n_rows - int(np.isfinite(pd.to_numeric(expanded_theoretical_mass_table_df['theor_m/z'], errors='coerce').to_numpy(dtype=np.float64)).sum())
+    if n_missing_mz == n_rows:
+        issues.append(ValidationIssue(None, THEORETICAL_TABLE_NAME, 'error', 'missing_values',
+                                      'Theoretical table does not contain any numeric mass (check that masses are in the second column)', n_missing_mz))
+    elif n_missing_mz:
+        issues.append(ValidationIssue(None, THEORETICAL_TABLE_NAME, 'warning', 'missing_values',
+                                      f'{n_missing_mz} theoretical m/z values are missing or not numbers, these rows are never matched', n_missing_mz))
+    return issues
+
+
+def validate_matching_inputs(experimental_dfs_additional_info_df: pd.DataFrame, dict_containing_experimental_dfs: dict,
+                             expanded_theoretical_mass_table_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    checks all inputs of matching (theoretical table and each experimental file with its settings) before the matching starts
+
+    @param experimental_dfs_additional_info_df: table with additional information about experimental files and settings for matching
+    @param dict_containing_experimental_dfs: dictionary containing all experimental files as dataframes, keys are nicknames of files
+    @param expanded_theoretical_mass_table_df: dataframe containing theoretical values of m/z for matching with experimental data
+    @return: table of issues with columns ISSUE_COLUMNS, errors first, empty table if all inputs are fine
+    """
+    issues = validate_theoretical_table(expanded_theoretical_mass_table_df)
+    for ind in experimental_dfs_additional_info_df.index:
+        file_info = experimental_dfs_additional_info_df.loc[ind]
+        orig_name = file_info.get('orig_name', np.nan)
+        if pd.isna(orig_name):
+            orig_name = str(ind)
+        issues += validate_matching_settings(file_info, ind, orig_name)
+        issues += validate_experimental_table(dict_containing_experimental_dfs.get(ind), ind, orig_name)
+    issues_df = pd.DataFrame(issues, columns=ISSUE_COLUMNS)
+    issues_df['severity'] = pd.Categorical(issues_df['severity'], categories=list(SEVERITIES), ordered=True)
+    return issues_df.sort_values(by='severity', kind='stable', ignore_index=True)
+
+
+def files_without_errors(issues_df: pd.DataFrame, nicknames) -> list:
+    """
+    @param issues_df: table of issues from validate_matching_inputs
+    @param nicknames: nicknames of all experimental files
+    @return: nicknames of files which can be matched, empty list if the theoretical table has an error
+    """
+    errors_df = issues_df[issues_df['severity'] == 'error']
+    if errors_df['nickname'].isna().any():
+        return []
+    files_with_errors = set(errors_df['nickname'])
+    return [nick for nick in nicknames if nick not in files_with_errors]
+
+
+def describe_errors(issues_df: pd.DataFrame) -> str:
+    """
+    @param issues_df: table of issues from validate_matching_inputs
+    @return: short text with errors of each file, e.g. for the message about the result of matching
+    """
+    errors_df = issues_df[issues_df['severity'] == 'error']
+    return ' '.join(f"{orig_name}: {'; '.join(file_errors_df['message'])}."
+                    for orig_name, file_errors_df in errors_df.groupby('orig_name', sort=False, dropna=False))
+
+
+if __name__ == '__main__':
+    pass
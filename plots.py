@@ -7,31 +7,116 @@ LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
 Created on Mon Jan 22 18:09:08 2024
 """
 
+import numpy as np
+import pandas as pd
 import streamlit as st
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
+from matchmass.decimation import decimate_spectrum, DEFAULT_NUMBER_OF_BINS
 
 
 # Note: color combinations for plot bars were chosen based on their visibility for colorblind people
 # An online tool from following link was used: https://venngage.com/tools/accessible-color-palette-generator 
 
-def make_plot1(df1, expanded_theoretical_mass_table_df, width_for_theoretical_mz_bars):
-    """Creates first plot for comparing experimental data and theoretical m/z of selected ions."""
+# 'bars' draws each signal as a bar (SVG), 'webgl' draws all signals as one WebGL line trace with vertical sticks,
+# 'auto' uses WebGL if the plot has more points than WEBGL_POINTS_THRESHOLD
+PLOT_RENDERING_MODES = ('auto', 'bars', 'webgl')
+WEBGL_POINTS_THRESHOLD = 5000
+# number of ions with the largest integrated abundance shown in the plot of chromatograms
+DEFAULT_NUMBER_OF_CHROMATOGRAMS = 10
+
+
+def choose_rendering_mode(rendering_mode: str, number_of_points: int) -> str:
+    """
+    @param rendering_mode: one of PLOT_RENDERING_MODES
+    @param number_of_points: number of points in all traces of the plot
+    @return: 'bars' or 'webgl'
+    """
+    if rendering_mode not in PLOT_RENDERING_MODES:
+        raise ValueError(f"Unknown rendering mode '{rendering_mode}', use one of: {', '.join(PLOT_RENDERING_MODES)}")
+    if rendering_mode == 'auto':
+        return 'webgl' if number_of_points > WEBGL_POINTS_THRESHOLD else 'bars'
+    return rendering_mode
+
+
+def stick_baseline(abundance) -> float:
+    """
+    sticks start slightly above zero, so they are visible also with log scale of y axis (zero cannot be shown in log scale)
+
+    @param abundance: abundances of all plotted signals
+    @return: the lowest point of sticks
+    """
+    abundance = np.asarray(abundance, dtype=np.float64)
+    positive_abundance = abundance[abundance > 0]
+    return positive_abundance.min() * 1e-3 if len(positive_abundance) else 0.0
+
+
+def stick_spectrum_coordinates(mz, abundance, baseline: float = 0.0) -> tuple:
+    """
+    converts signals to coordinates of vertical lines separated by NaN, so all signals are drawn as one line trace
+
+    @param mz: array of m/z values
+    @param abundance: array of abundances
+    @param baseline: the lowest point of the lines
+    @return: tuple (x, y), three points for each signal
+    """
+    mz = np.asarray(mz, dtype=np.float64)
+    x = np.column_stack([mz, mz, np.full(len(mz), np.nan)]).ravel()
+    y = np.column_stack([np.full(len(mz), baseline), np.asarray(abundance, dtype=np.float64), np.full(len(mz), np.nan)]).ravel()
+    return (x, y)
+
+
+def window_outline_coordinates(mz, width: float, height: float, baseline: float = 0.0) -> tuple:
+    """
+    converts theoretical m/z to coordinates of outlines of their mass accuracy windows separated by NaN
+
+    @param mz: array of theoretical m/z values
+    @param width: width of a window (the same as width of bars in 'bars' mode)
+    @param height: height of windows
+    @param baseline: the lowest point of the outlines
+    @return: tuple (x, y), five points for each window
+    """
+    mz = np.asarray(mz, dtype=np.float64)
+    lower_bound, upper_bound = mz - width / 2, mz + width / 2
+    x = np.column_stack([lower_bound, lower_bound, upper_bound, upper_bound, np.full(len(mz), np.nan)]).ravel()
+    y = np.tile([baseline, height, height, baseline, np.nan], len(mz))
+    return (x, y)
+
+
+def figure_plot1(df1, expanded_theoretical_mass_table_df, width_for_theoretical_mz_bars, mz_range=None, number_of_bins=DEFAULT_NUMBER_OF_BINS,
+                 rendering_mode='auto'):
+    """Creates figure of the first plot for comparing experimental data and theoretical m/z of selected ions.
+    Only the most abundant peak within each of number_of_bins bins of m/z range is plotted (see matchmass.decimation).
+    Signals are drawn as bars or as WebGL sticks according to rendering_mode (see PLOT_RENDERING_MODES).
+    Cells which are not numbers (the file has an error from matchmass.validation) are not plotted."""
+    df1 = df1[['exp_m/z', 'Abundance']].apply(pd.to_numeric, errors='coerce')
+    # keep only visually significant peaks and theoretical m/z within the shown range
+    df1_for_plot = decimate_spectrum(df1, 'exp_m/z', 'Abundance', number_of_bins, mz_range)
+    theoretical_mz_for_plot = decimate_spectrum(expanded_theoretical_mass_table_df, 'theor_m/z', None, number_of_bins, mz_range)['theor_m/z'].to_numpy()
+    height_of_theoretical_mz = df1['Abundance'].max()
+
     # Create subplots
     fig = make_subplots()
-    fig.add_trace(go.Bar(x=df1['exp_m/z'], 
-                         y=df1['Abundance'], 
-                         width=0.0001,
-                         name='Experimental data',
-                         marker={'color': '#00ffff'}
-                         ))
-    fig.add_trace(go.Bar(x=expanded_theoretical_mass_table_df['theor_m/z'],
-                         y=list((df1['Abundance'].max()) for num in range(len(expanded_theoretical_mass_table_df['theor_m/z']))),
-                         width=width_for_theoretical_mz_bars,
-                         opacity=0.4,
-                         name='Theoretical m/z',
-                         marker={'color': '#d0a300'}
-                         ))
+    if choose_rendering_mode(rendering_mode, len(df1_for_plot.index) + len(theoretical_mz_for_plot)) == 'webgl':
+        baseline = stick_baseline(df1_for_plot['Abundance'])
+        x, y = stick_spectrum_coordinates(df1_for_plot['exp_m/z'], df1_for_plot['Abundance'], baseline)
+        fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', line={'width': 1, 'color': '#00ffff'}, name='Experimental data'))
+        x, y = window_outline_coordinates(theoretical_mz_for_plot, width_for_theoretical_mz_bars, height_of_theoretical_mz, baseline)
+        fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', line={'width': 1, 'color': '#d0a300'}, opacity=0.4, name='Theoretical m/z'))
+    else:
+        fig.add_trace(go.Bar(x=df1_for_plot['exp_m/z'].to_numpy(),
+                             y=df1_for_plot['Abundance'].to_numpy(),
+                             width=0.0001,
+                             name='Experimental data',
+                             marker={'color': '#00ffff'}
+                             ))
+        fig.add_trace(go.Bar(x=theoretical_mz_for_plot,
+                             y=np.full(len(theoretical_mz_for_plot), height_of_theoretical_mz),
+                             width=width_for_theoretical_mz_bars,
+                             opacity=0.4,
+                             name='Theoretical m/z',
+                             marker={'color': '#d0a300'}
+                             ))
     
     # Set title
     fig.update_layout(
@@ -79,29 +164,51 @@ def make_plot1(df1, expanded_theoretical_mass_table_df, width_for_theoretical_mz
     ]  
     
     fig.update_layout(updatemenus=updatemenus)
-    
+    if mz_range is not None:
+        fig.update_xaxes(range=list(mz_range))
+    return fig
+
+
+def make_plot1(df1, expanded_theoretical_mass_table_df, width_for_theoretical_mz_bars, mz_range=None, rendering_mode='auto'):
+    """Creates first plot for comparing experimental data and theoretical m/z of selected ions."""
+    fig = figure_plot1(df1, expanded_theoretical_mass_table_df, width_for_theoretical_mz_bars, mz_range, rendering_mode=rendering_mode)
+
     # Show the figure in the app
     return st.plotly_chart(fig, use_container_width=True)
 
 
-def make_plot2(df2_orig, df2_matched):
-    """Creates second plot showing which signals from original data were left unmatched"""
+def figure_plot2(df2_orig, df2_matched, mz_range=None, number_of_bins=DEFAULT_NUMBER_OF_BINS, rendering_mode='auto'):
+    """Creates figure of the second plot showing which signals from original data were left unmatched.
+    Only the most abundant peak within each of number_of_bins bins of m/z range is plotted (see matchmass.decimation).
+    Signals are drawn as bars or as WebGL sticks according to rendering_mode (see PLOT_RENDERING_MODES)."""
+    # keep only visually significant signals within the shown range, both traces use the same bins
+    bins_mz_range = mz_range if mz_range is not None else (df2_orig['exp_m/z'].min(), df2_orig['exp_m/z'].max())
+    df2_orig = decimate_spectrum(df2_orig, 'exp_m/z', 'Abundance', number_of_bins, bins_mz_range)
+    df2_matched = decimate_spectrum(df2_matched, 'exp_m/z', 'Abundance', number_of_bins, bins_mz_range)
+
     # Create plot for our data
     fig = make_subplots()
-    fig.add_trace(go.Bar(x=df2_orig['exp_m/z'], 
-                         y=df2_orig['Abundance'], 
-                         width=0.0001,
-                         opacity=1,
-                         name='Unmatched signals',
-                         marker={'color': '#cc2c3c'}
-                         ))
-    fig.add_trace(go.Bar(x=df2_matched['exp_m/z'], 
-                         y=df2_matched['Abundance'],
-                         width=0.0003,
-                         opacity=1,
-                         name='Matched signals',
-                         marker={'color': '#3aff5c'}
-                         ))
+    if choose_rendering_mode(rendering_mode, len(df2_orig.index) + len(df2_matched.index)) == 'webgl':
+        baseline = stick_baseline(df2_orig['Abundance'])
+        x, y = stick_spectrum_coordinates(df2_orig['exp_m/z'], df2_orig['Abundance'], baseline)
+        fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', line={'width': 1, 'color': '#cc2c3c'}, name='Unmatched signals'))
+        x, y = stick_spectrum_coordinates(df2_matched['exp_m/z'], df2_matched['Abundance'], baseline)
+        fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', line={'width': 3, 'color': '#3aff5c'}, name='Matched signals'))
+    else:
+        fig.add_trace(go.Bar(x=df2_orig['exp_m/z'].to_numpy(),
+                             y=df2_orig['Abundance'].to_numpy(),
+                             width=0.0001,
+                             opacity=1,
+                             name='Unmatched signals',
+                             marker={'color': '#cc2c3c'}
+                             ))
+        fig.add_trace(go.Bar(x=df2_matched['exp_m/z'].to_numpy(),
+                             y=df2_matched['Abundance'].to_numpy(),
+                             width=0.0003,
+                             opacity=1,
+                             name='Matched signals',
+                             marker={'color': '#3aff5c'}
+                             ))
     
     # Set title
     fig.update_layout(
@@ -150,7 +257,59 @@ def make_plot2(df2_orig, df2_matched):
     ]  
     
     fig.update_layout(updatemenus=updatemenus)
-    
+    if mz_range is not None:
+        fig.update_xaxes(range=list(mz_range))
+    return fig
+
+
+def figure_chromatograms(chromatogram_df, integrated_df, retention_times, number_of_chromatograms=DEFAULT_NUMBER_OF_CHROMATOGRAMS):
+    """Creates figure with extracted-ion chromatograms of ions with the largest integrated abundance in LC-MS run
+    (see matchmass.chromatograms). Scans without the ion are drawn as zero, so the lines show the areas which were integrated.
+    Points of scans without retention time are not drawn, if no scan has retention time (e.g. MGF without RTINSECONDS)
+    the order of scans is used instead, as in matchmass.chromatograms.retention_time_weights."""
+    retention_times = np.unique(np.asarray(retention_times, dtype=np.float64))
+    retention_times = retention_times[~np.isnan(retention_times)]
+    uses_scan_order = len(retention_times) == 0
+    if uses_scan_order:
+        retention_times = np.arange(len(chromatogram_df['scan'].cat.categories), dtype=np.float64)
+    top_ions_df = integrated_df.nlargest(number_of_chromatograms, 'Abundance')
+
+    fig = make_subplots()
+    for ion_id, ion, name in zip(top_ions_df['ID'], top_ions_df['ion'], top_ions_df['name']):
+        ion_points_df = chromatogram_df[(chromatogram_df['ID'] == ion_id) & (chromatogram_df['ion'] == ion)]
+        if uses_scan_order:
+            point_times = ion_points_df['scan'].cat.codes.to_numpy(dtype=np.float64)
+        else:
+            point_times = ion_points_df['retention_time(min)'].to_numpy(dtype=np.float64)
+        positions = np.minimum(np.searchsorted(retention_times, point_times), len(retention_times) - 1)
+        # points without retention time (NaN) or with a time which is not among the given ones are not drawn
+        is_drawn = retention_times[positions] == point_times if len(retention_times) else np.zeros(len(point_times), dtype=bool)
+        abundance = np.zeros(len(retention_times))
+        abundance[positions[is_drawn]] = ion_points_df['Abundance'].to_numpy()[is_drawn]
+        fig.add_trace(go.Scattergl(x=retention_times, y=abundance, mode='lines', line={'width': 1}, name=f'{name} {ion}'))
+
+    fig.update_layout(
+        title_text=f"Extracted-ion chromatograms of {len(top_ions_df.index)} ions with the largest integrated abundance",
+        xaxis_title="scan" if uses_scan_order else "retention time (min)",
+        yaxis_title="Abundance",
+        autosize=True
+    )
+    return fig
+
+
+def make_plot_chromatograms(chromatogram_df, integrated_df, retention_times, number_of_chromatograms=DEFAULT_NUMBER_OF_CHROMATOGRAMS):
+    """Creates plot of extracted-ion chromatograms of LC-MS run"""
+    fig = figure_chromatograms(chromatogram_df, integrated_df, retention_times, number_of_chromatograms)
+
+    # Show the figure in the app
+    plot_chromatograms = st.plotly_chart(fig, use_container_width=True)
+    return plot_chromatograms
+
+
+def make_plot2(df2_orig, df2_matched, mz_range=None, rendering_mode='auto'):
+    """Creates second plot showing which signals from original data were left unmatched"""
+    fig = figure_plot2(df2_orig, df2_matched, mz_range, rendering_mode=rendering_mode)
+
     # Show the figure in the app
     plot2 = st.plotly_chart(fig, use_container_width=True)
     return plot2
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: conftest.py
+Created on 18.10.2026
+
+Note: shared fixtures of tests. Modules of the app (ions_enum, data_functions, ...) live in the root folder of the repository,
+so the folder is added to the import path.
+"""
+import os
+import sys
+import pytest
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_DIR)
+
+from matchmass import engine
+from ions_enum import Ion
+
+
+@pytest.fixture(scope='session')
+def simulated_theoretical_table():
+    """
+    @return: theoretical table of the simulated example with ions [M]+, [M+H]+, [M+Na]+, [2M+H]+ and [M+2H]2+
+    """
+    theoretical_mass_table_df = engine.load_theoretical_table(os.path.join(REPOSITORY_DIR, 'files', 'simulated_theor.xlsx'))
+    ions_to_add_to_theoretical_table_dict = {ion.name: ion.name in ('Mplus', 'MplusH', 'MplusNa', 'M2plusH', 'Mplus2H') for ion in Ion}
+    expanded_theoretical_mass_table_df = engine.add_ions_to_theoretical_table(theoretical_mass_table_df, ions_to_add_to_theoretical_table_dict)
+    return engine.raise_warning_for_masses_within_accuracy(expanded_theoretical_mass_table_df, 0.02)
+
+
+@pytest.fixture(scope='session')
+def simulated_experimental_files():
+    """
+    @return: dictionary {nickname: experimental table} with the simulated example and two files derived from it
+        (every second signal, shifted m/z with half abundance)
+    """
+    single_exp_file_df = engine.load_experimental_table(os.path.join(REPOSITORY_DIR, 'files', 'simulated_exp_full.xlsx'))
+    return {'file1': single_exp_file_df,
+            'file2': single_exp_file_df.iloc[::2].reset_index(drop=True),
+            'file3': single_exp_file_df.assign(**{'exp_m/z': single_exp_file_df['exp_m/z'] + 0.001,
+                                                  'Abundance': single_exp_file_df['Abundance'] * 0.5})}
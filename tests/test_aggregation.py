@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: test_aggregation.py
+Created on 18.10.2026
+
+Note: regression test of aggregation of matched files. Rows with sums of abundances are built by one groupby for all files
+(engine.prepare_matched_files_for_aggregating), the result has to be the same as from the original loop over all molecule IDs
+(prepare_matched_exp_file_for_aggregating of the first version of data_functions.py, kept below as the reference).
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from matchmass import engine
+
+# text of the original rows with sums, engine keeps only the code 'ions_sum' and renders the same message on export
+ORIGINAL_IONS_SUM_WARNING = 'this line contains sum of abundances within particular file and molecule ID'
+
+
+def reference_add_total_abundance_row_within_id(compared_data: pd.DataFrame, i: int) -> pd.DataFrame:
+    """
+    original implementation: adds a row with total abundance of all ions related to the molecule with particular ID number(i)
+    """
+    data_subset = compared_data[compared_data['ID'] == i]
+    if len(data_subset) > 0:
+        name_from_subset = list(data_subset['name'])
+        orig_file_from_subset = list(data_subset['orig_file'])
+        new_row_for_subset_total_abundance = pd.DataFrame()
+        new_row_for_subset_total_abundance.loc[0, 'theor_m/z'] = np.nan
+        new_row_for_subset_total_abundance.loc[0, 'exp_m/z'] = np.nan
+        new_row_for_subset_total_abundance.loc[0, 'ID'] = i
+        new_row_for_subset_total_abundance.loc[0, 'name'] = name_from_subset[0]
+        new_row_for_subset_total_abundance.loc[0, 'ion'] = 'ions sum'
+        new_row_for_subset_total_abundance.loc[0, 'charge'] = np.nan
+        new_row_for_subset_total_abundance.loc[0, 'Abundance'] = data_subset['Abundance'].sum()
+        new_row_for_subset_total_abundance.loc[0, 'warning'] = ORIGINAL_IONS_SUM_WARNING
+        new_row_for_subset_total_abundance.loc[0, 'orig_file'] = orig_file_from_subset[0]
+        compared_data = pd.concat([compared_data, new_row_for_subset_total_abundance], ignore_index=True)
+    return compared_data
+
+
+def reference_prepare_matched_exp_file_for_aggregating(compared_data: pd.DataFrame, expanded_theoretical_mass_table_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    original implementation: marks file name as abundance and adds rows with sums of abundances for each molecule ID
+    """
+    compared_data['orig_file'] = compared_data['orig_file'] + '_abund'
+    for i in range(expanded_theoretical_mass_table_df['ID'].max() + 1):
+        compared_data = reference_add_total_abundance_row_within_id(compared_data, i)
+    compared_data['ID'] = compared_data['ID'].astype('int32')
+    compared_data = compared_data.sort_values(by=['ID', 'theor_m/z']).reset_index(drop=True)
+    return compared_data
+
+
+def comparable_form(long_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    @param long_df: long table for aggregation
+    @return: the same table with warning messages instead of codes and plain (object/float) columns instead of categorical ones
+    """
+    long_df = engine.render_warning_messages(long_df).copy()
+    for column in ['name', 'ion', 'charge', 'warning', 'orig_file']:
+        long_df[column] = long_df[column].astype(object).where(long_df[column].notna(), np.nan)
+    long_df['theor_m/z'] = long_df['theor_m/z'].astype(np.float64)
+    long_df['exp_m/z'] = long_df['exp_m/z'].astype(np.float64)
+    long_df['Abundance'] = long_df['Abundance'].astype(np.float64)
+    return long_df.reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def matched_files(simulated_theoretical_table, simulated_experimental_files):
+    theoretical_index = engine.build_theoretical_index(simulated_theoretical_table)
+    mass_accuracies = {'file1': 0.01, 'file2': 0.005, 'file3': 0.02}
+    return [engine.match_single_experimental_file(single_exp_file_df, theoretical_index, 0.0, mass_accuracies[nick], nick)
+            for nick, single_exp_file_df in simulated_experimental_files.items()]
+
+
+def test_long_table_is_the_same_as_from_original_loop(simulated_theoretical_table, matched_files):
+    reference_long_df = pd.concat([reference_prepare_matched_exp_file_for_aggregating(comparable_form(compared_data), simulated_theoretical_table)
+                                   for compared_data in matched_files], ignore_index=True)
+    long_df = engine.prepare_matched_files_for_aggregating(matched_files)
+
+    assert (reference_long_df['ion'] == 'ions sum').sum() > 0
+    pd.testing.assert_frame_equal(comparable_form(long_df), comparable_form(reference_long_df), check_dtype=False)
+
+
+def test_single_file_is_the_same_as_from_original_loop(simulated_theoretical_table, matched_files):
+    reference_long_df = reference_prepare_matched_exp_file_for_aggregating(comparable_form(matched_files[0]), simulated_theoretical_table)
+    long_df = engine.prepare_matched_files_for_aggregating(matched_files[:1])
+
+    pd.testing.assert_frame_equal(comparable_form(long_df), comparable_form(reference_long_df), check_dtype=False)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: test_chromatograms.py
+Created on 18.10.2026
+
+Note: LC-MS run read by the app (long table of scan peaks, also through the table cache) and streamed by the CLI has to give
+the same integrated abundances, also when some scans do not have any peaks (their retention times count in the integration).
+Chromatograms are plotted also for runs with missing retention times.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from matchmass import engine
+from plots import figure_chromatograms
+from matchmass.chromatograms import match_lcms_run, match_scan_peaks_table
+from matchmass.spectrum_formats import read_scan_peaks, split_scan_peaks
+from matchmass.table_cache import ParquetTableCache
+from matchmass.validation import validate_matching_inputs
+
+# retention times (s) and peaks (m/z, abundance) of scans, the second and the last scans are empty
+SCANS = [(60.0, [(76.0524, 1000.0), (90.0681, 500.0)]),
+         (66.0, []),
+         (72.0, [(76.0525, 3000.0), (90.0680, 800.0), (300.0, 10.0)]),
+         (78.0, [(76.0523, 2000.0)]),
+         (84.0, [])]
+
+
+def write_mgf_run(path, scans_with_retention_time=None):
+    """
+    @param path: path of the written MGF file
+    @param scans_with_retention_time: positions of SCANS which have RTINSECONDS, None means all scans
+    @return: path of the file
+    """
+    lines = []
+    for i, (retention_time, peaks) in enumerate(SCANS):
+        lines += ['BEGIN IONS', f'TITLE=scan {i + 1}']
+        if scans_with_retention_time is None or i in scans_with_retention_time:
+            lines.append(f'RTINSECONDS={retention_time}')
+        lines += [f'{mz} {abundance}' for mz, abundance in peaks]
+        lines += ['END IONS', '']
+    path.write_text('\n'.join(lines))
+    return path
+
+
+@pytest.fixture
+def mgf_run(tmp_path):
+    return write_mgf_run(tmp_path / 'run.mgf')
+
+
+@pytest.fixture
+def theoretical_table():
+    theoretical_mass_table_df = engine.load_theoretical_table(pd.DataFrame({'name': ['A', 'B'], 'mass': [76.0524, 90.0681]}))
+    theoretical_mass_table_df = engine.add_ions_to_theoretical_table(theoretical_mass_table_df, engine.ions_selection_from_names(['Mplus']))
+    return engine.raise_warning_for_masses_within_accuracy(theoretical_mass_table_df, 0.01)
+
+
+def test_empty_scans_keep_their_retention_times(mgf_run):
+    scan_peaks_df = read_scan_peaks(mgf_run)
+    retention_times = scan_peaks_df.groupby('scan', observed=False)['retention_time(min)'].first()
+    np.testing.assert_allclose(retention_times.to_numpy(), [retention_time / 60 for retention_time, _ in SCANS])
+    # scans without peaks are not used as separate experimental files
+    assert [len(peaks_df.index) for _, _, _, peaks_df in split_scan_peaks(scan_peaks_df)] == [2, 3, 1]
+
+
+@pytest.mark.parametrize('use_cache', [False, True])
+def test_app_and_cli_give_the_same_areas(mgf_run, theoretical_table, tmp_path, use_cache):
+    table_cache = ParquetTableCache(str(tmp_path / 'cache')) if use_cache else None
+    scan_peaks_df = engine.load_scan_peaks_table(str(mgf_run), table_cache=table_cache)
+    app_integrated_df, app_chromatogram_df = match_scan_peaks_table(scan_peaks_df, theoretical_table, 0.0, 0.01, 'run')
+    cli_integrated_df, cli_chromatogram_df = match_lcms_run(str(mgf_run), theoretical_table, 0.0, 0.01, 'run')
+
+    # trapezoidal areas with zero abundance in scans without the ion, scan weights are 0.05, 0.1, 0.1, 0.1 and 0.05 min
+    np.testing.assert_allclose(app_integrated_df['Abundance'], [1000 * 0.05 + 3000 * 0.1 + 2000 * 0.1, 500 * 0.05 + 800 * 0.1])
+    pd.testing.assert_frame_equal(app_integrated_df, cli_integrated_df)
+    pd.testing.assert_frame_equal(app_chromatogram_df, cli_chromatogram_df)
+
+
+def test_validation_ignores_empty_scans(mgf_run):
+    scan_peaks_df = read_scan_peaks(mgf_run)
+    experimental_dfs_additional_info_df = engine.generate_additional_info_table(pd.DataFrame(), 'run.mgf', 'file1')
+    experimental_dfs_additional_info_df['mass_accuracy(Da)'] = 0.01
+    experimental_dfs_additional_info_df['abund_thrs'] = 0.0
+    issues_df = validate_matching_inputs(experimental_dfs_additional_info_df, {'file1': scan_peaks_df}, pd.DataFrame({'theor_m/z': [76.0524]}))
+    assert 'missing_values' not in set(issues_df['check'])
+
+
+@pytest.mark.parametrize('scans_with_retention_time', [(), (0, 1, 3, 4)])
+def test_chromatograms_are_plotted_without_retention_times(tmp_path, theoretical_table, scans_with_retention_time):
+    scan_peaks_df = engine.load_scan_peaks_table(str(write_mgf_run(tmp_path / 'run.mgf', scans_with_retention_time)))
+    integrated_df, chromatogram_df = match_scan_peaks_table(scan_peaks_df, theoretical_table, 0.0, 0.01, 'run')
+    fig = figure_chromatograms(chromatogram_df, integrated_df, scan_peaks_df['retention_time(min)'])
+
+    assert len(fig.data) == 2
+    if not scans_with_retention_time:
+        # order of scans is used instead of retention times
+        np.testing.assert_array_equal(fig.data[0].x, np.arange(len(SCANS)))
+        np.testing.assert_array_equal(fig.data[0].y, [1000.0, 0.0, 3000.0, 2000.0, 0.0])
+    else:
+        # the third scan has no retention time, its points are not drawn
+        np.testing.assert_allclose(fig.data[0].x, [1.0, 1.1, 1.3, 1.4])
+        np.testing.assert_array_equal(fig.data[0].y, [1000.0, 0.0, 2000.0, 0.0])
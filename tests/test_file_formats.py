@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: test_file_formats.py
+Created on 18.10.2026
+
+Note: recognition of CSV dialects and dtypes of columns read from CSV files (by pyarrow and by C engine in chunks).
+"""
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import pytest
+from matchmass.file_formats import sniff_csv_dialect, read_csv_table
+
+
+@pytest.mark.parametrize('sample, expected_dialect', [
+    (b'exp_m/z,Abundance\n100.1,5\n200.2,4\n', (',', '.')),
+    (b'exp_m/z;Abundance\n100,1;5\n200,2;4\n', (';', ',')),
+    (b'exp_m/z\tAbundance\n100,1\t5\n200,2\t4\n', ('\t', ',')),
+    # comma inside of a name is not a decimal comma
+    (b'theor_m/z\tname\n76.0524\t1,2-propanediol\n90.0681\t1,3-butanediol\n', ('\t', '.')),
+    (b'theor_m/z;name\n76.0524;"1,2-propanediol"\n90.0681;glycerol\n', (';', '.')),
+])
+def test_sniff_csv_dialect(sample, expected_dialect):
+    assert sniff_csv_dialect(sample) == expected_dialect
+
+
+@pytest.mark.parametrize('chunk_size', [None, 1])
+def test_float64_columns_are_read_as_float64(chunk_size):
+    content = b'exp_m/z;Abundance;note\n100;5;a\n200,25;4;b\n'
+    df = read_csv_table(BytesIO(content), float64_columns=(0, 1), chunk_size=chunk_size)
+    if chunk_size is not None:
+        df = pd.concat(df, ignore_index=True)
+
+    assert df['exp_m/z'].dtype == np.float64
+    assert df['Abundance'].dtype == np.float64
+    assert df['note'].dtype == object
+    np.testing.assert_array_equal(df['exp_m/z'], [100.0, 200.25])
+    np.testing.assert_array_equal(df['Abundance'], [5.0, 4.0])
+
+
+def test_theoretical_column_with_names_is_read_as_float64():
+    content = b'theor_m/z\tname\n76\t1,2-propanediol\n90,5\tglycerol\n'
+    df = read_csv_table(BytesIO(content), float64_columns=(0,))
+    assert df['theor_m/z'].dtype == np.float64
+
+
+@pytest.mark.parametrize('content, abundance_dtype', [
+    # repeated header is text in both columns, decimal comma of the other cells is replaced by point
+    (b'exp_m/z;Abundance\n100;5\nexp_m/z;Abundance\n200,25;4\n', object),
+    (b'exp_m/z,Abundance\n100,5\nabc,4\n', np.float64),
+])
+def test_column_with_text_cell_is_kept_as_text(content, abundance_dtype):
+    df = read_csv_table(BytesIO(content), float64_columns=(0, 1))
+    assert df['exp_m/z'].dtype == object
+    assert df['Abundance'].dtype == abundance_dtype
+    assert pd.to_numeric(df['exp_m/z'], errors='coerce').isna().sum() == 1
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: test_instrumentation.py
+Created on 18.10.2026
+
+Note: peaks of memory measured by profiles of more sessions at the same time (tracemalloc is global for the process).
+"""
+import tracemalloc
+import numpy as np
+from matchmass.instrumentation import PipelineProfile
+
+MB = 1024 ** 2
+
+
+def test_nested_stages_of_one_profile():
+    profile = PipelineProfile()
+    with profile.stage('outer'):
+        np.ones(20 * MB // 8).sum()
+        with profile.stage('inner'):
+            kept_array = np.ones(MB // 8)
+    inner_record, outer_record = profile.records
+    assert MB <= inner_record['peak_memory_bytes'] < 10 * MB
+    assert outer_record['peak_memory_bytes'] >= 20 * MB
+    assert not tracemalloc.is_tracing()
+    del kept_array
+
+
+def test_stages_of_two_profiles_at_the_same_time():
+    first_profile, second_profile = PipelineProfile(), PipelineProfile()
+    first_stage = first_profile.stage('first')
+    first_stage.__enter__()
+    np.ones(20 * MB // 8).sum()
+
+    # the second stage starts while the first one is measured, peak of the first stage must not be reset
+    second_stage = second_profile.stage('second')
+    second_stage.__enter__()
+    kept_array = np.ones(MB // 8)
+    second_stage.__exit__(None, None, None)
+    assert tracemalloc.is_tracing()
+    first_stage.__exit__(None, None, None)
+
+    assert MB <= second_profile.records[0]['peak_memory_bytes'] < 10 * MB
+    assert first_profile.records[0]['peak_memory_bytes'] >= 20 * MB
+    assert not tracemalloc.is_tracing()
+    del kept_array
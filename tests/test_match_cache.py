@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: test_match_cache.py
+Created on 18.10.2026
+
+Note: cached matched results have to be the same as matched without the cache and total size of the cache is bounded in bytes.
+"""
+import pandas as pd
+from matchmass import engine
+from matchmass.match_cache import MatchResultCache
+
+
+def settings_table(nicknames) -> pd.DataFrame:
+    """
+    @param nicknames: nicknames of experimental files
+    @return: table with additional information about the files, all files have mass accuracy 0.02 Da and no abundance threshold
+    """
+    experimental_dfs_additional_info_df = pd.DataFrame()
+    for nick in nicknames:
+        experimental_dfs_additional_info_df = engine.generate_additional_info_table(experimental_dfs_additional_info_df, nick + '.csv', nick)
+    experimental_dfs_additional_info_df['mass_accuracy(Da)'] = 0.02
+    experimental_dfs_additional_info_df['abund_thrs'] = 0.0
+    return experimental_dfs_additional_info_df
+
+
+def test_cached_results_are_the_same(simulated_theoretical_table, simulated_experimental_files):
+    experimental_dfs_additional_info_df = settings_table(simulated_experimental_files)
+    _, expected_aggregated_df = engine.match_and_aggregate(experimental_dfs_additional_info_df, simulated_experimental_files, simulated_theoretical_table)
+    match_cache = MatchResultCache()
+    for _ in range(2):
+        _, aggregated_df = engine.match_and_aggregate(experimental_dfs_additional_info_df, simulated_experimental_files, simulated_theoretical_table,
+                                                      match_cache=match_cache)
+        pd.testing.assert_frame_equal(aggregated_df, expected_aggregated_df)
+    assert match_cache.stats()['hits'] == len(simulated_experimental_files)
+
+
+def test_size_of_cache_is_bounded(simulated_theoretical_table, simulated_experimental_files):
+    experimental_dfs_additional_info_df = settings_table(simulated_experimental_files)
+    match_cache = MatchResultCache()
+    engine.match_and_aggregate(experimental_dfs_additional_info_df, simulated_experimental_files, simulated_theoretical_table, match_cache=match_cache)
+    size_of_all_results = match_cache.stats()['size_bytes']
+
+    # results of the last two files fit in the cache, the least recently used one is removed
+    match_cache = MatchResultCache(max_size_bytes=size_of_all_results - 1)
+    engine.match_and_aggregate(experimental_dfs_additional_info_df, simulated_experimental_files, simulated_theoretical_table, match_cache=match_cache)
+    assert 0 < match_cache.stats()['size_bytes'] <= size_of_all_results - 1
+    assert match_cache.stats()['entries'] == len(simulated_experimental_files) - 1
+
+    # result larger than the whole cache is not cached
+    match_cache = MatchResultCache(max_size_bytes=1)
+    engine.match_and_aggregate(experimental_dfs_additional_info_df, simulated_experimental_files, simulated_theoretical_table, match_cache=match_cache)
+    assert match_cache.stats() == {'hits': 0, 'misses': len(simulated_experimental_files), 'entries': 0, 'size_bytes': 0}
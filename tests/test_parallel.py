@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: test_parallel.py
+Created on 18.10.2026
+
+Note: parallel matching has to give the same results as engine.match_and_aggregate, including LC-MS runs matched scan by scan
+and skipping of files which did not pass the validation.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from matchmass import engine
+from matchmass.parallel import match_and_aggregate_in_parallel
+
+
+def lcms_run_from_spectrum(single_exp_file_df: pd.DataFrame, n_scans: int = 3) -> pd.DataFrame:
+    """
+    @param single_exp_file_df: experimental table
+    @param n_scans: number of scans, peaks of the table are split among them
+    @return: table of scan peaks (as from matchmass.spectrum_formats.read_scan_peaks) with the peaks in n_scans scans
+    """
+    scan_positions = np.arange(len(single_exp_file_df.index)) % n_scans
+    order = np.argsort(scan_positions, kind='stable')
+    return pd.DataFrame({'scan': pd.Categorical.from_codes(scan_positions[order], categories=[f'scan={i}' for i in range(n_scans)]),
+                         'retention_time(min)': 1.0 + 0.1 * scan_positions[order],
+                         'precursor_m/z': np.nan,
+                         'exp_m/z': single_exp_file_df['exp_m/z'].to_numpy()[order],
+                         'Abundance': single_exp_file_df['Abundance'].to_numpy(dtype=np.float64)[order]})
+
+
+@pytest.fixture(scope='module')
+def matching_inputs(simulated_experimental_files):
+    dict_containing_experimental_dfs = dict(simulated_experimental_files)
+    dict_containing_experimental_dfs['run'] = lcms_run_from_spectrum(simulated_experimental_files['file1'])
+    experimental_dfs_additional_info_df = pd.DataFrame()
+    for nick in dict_containing_experimental_dfs:
+        experimental_dfs_additional_info_df = engine.generate_additional_info_table(experimental_dfs_additional_info_df, nick + '.xlsx', nick)
+    experimental_dfs_additional_info_df['mass_accuracy(Da)'] = 0.01
+    experimental_dfs_additional_info_df['abund_thrs'] = 0.0
+    return experimental_dfs_additional_info_df, dict_containing_experimental_dfs
+
+
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_parallel_results_are_the_same_as_serial(simulated_theoretical_table, matching_inputs, n_workers):
+    experimental_dfs_additional_info_df, dict_containing_experimental_dfs = matching_inputs
+    serial_matched, serial_aggregated_df = engine.match_and_aggregate(experimental_dfs_additional_info_df, dict_containing_experimental_dfs,
+                                                                      simulated_theoretical_table)
+    parallel_matched, parallel_aggregated_df = match_and_aggregate_in_parallel(experimental_dfs_additional_info_df, dict_containing_experimental_dfs,
+                                                                               simulated_theoretical_table, n_workers)
+
+    assert list(parallel_matched.keys()) == list(serial_matched.keys())
+    assert 'run' + engine.CHROMATOGRAM_KEY_SUFFIX in parallel_matched.keys()
+    for key in serial_matched.keys():
+        pd.testing.assert_frame_equal(parallel_matched[key].reset_index(drop=True), serial_matched[key].reset_index(drop=True), check_dtype=False,
+                                      check_categorical=False)
+    pd.testing.assert_frame_equal(parallel_aggregated_df, serial_aggregated_df)
+
+
+def test_files_with_errors_are_skipped(simulated_theoretical_table, matching_inputs):
+    experimental_dfs_additional_info_df, dict_containing_experimental_dfs = matching_inputs
+    experimental_dfs_additional_info_df = experimental_dfs_additional_info_df.copy()
+    experimental_dfs_additional_info_df.loc['file2', 'mass_accuracy(Da)'] = -0.01
+    parallel_matched, _ = match_and_aggregate_in_parallel(experimental_dfs_additional_info_df, dict_containing_experimental_dfs,
+                                                          simulated_theoretical_table, 1)
+    assert 'file2' not in parallel_matched
+    assert 'file1' in parallel_matched
+
+    experimental_dfs_additional_info_df['abund_thrs'] = np.nan
+    with pytest.raises(ValueError, match='No file can be matched'):
+        match_and_aggregate_in_parallel(experimental_dfs_additional_info_df, dict_containing_experimental_dfs, simulated_theoretical_table, 1)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: test_spectrum_formats.py
+Created on 18.10.2026
+
+Note: decoding of MS-Numpress integers, data are encoded integer by integer as described by the MS-Numpress specification.
+"""
+import numpy as np
+import pytest
+from matchmass.spectrum_formats import decode_numpress_integers
+
+
+def encode_integer(value: int) -> list:
+    """
+    @param value: integer within range of int32
+    @return: half-bytes of the integer, the first one is the number of leading half-bytes (zeros, or ones + 8 for negative numbers)
+    """
+    value &= 0xffffffff
+    high_first = [(value >> (28 - 4 * i)) & 0xf for i in range(8)]
+    if high_first[0] == 0xf:
+        n_leading = next((i for i, nibble in enumerate(high_first) if nibble != 0xf), 7)
+        first_nibble = n_leading + 8
+    else:
+        n_leading = next((i for i, nibble in enumerate(high_first) if nibble != 0), 8)
+        first_nibble = n_leading
+    return [first_nibble] + high_first[::-1][:8 - n_leading]
+
+
+def encode_integers(values) -> bytes:
+    nibbles = [nibble for value in values for nibble in encode_integer(int(value))]
+    if len(nibbles) % 2:
+        nibbles.append(0)
+    return bytes((high << 4) | low for high, low in zip(nibbles[0::2], nibbles[1::2]))
+
+
+@pytest.mark.parametrize('n_values', [1, 2, 7, 1001])
+def test_decoded_integers_are_the_same_as_encoded(n_values):
+    rng = np.random.default_rng(n_values)
+    for values in (rng.integers(-2 ** 31, 2 ** 31, n_values), rng.integers(-300, 300, n_values), np.zeros(n_values, dtype=np.int64),
+                   np.full(n_values, -1), np.full(n_values, 0x77)):
+        np.testing.assert_array_equal(decode_numpress_integers(encode_integers(values)), values)
+
+
+def test_empty_and_truncated_data():
+    assert len(decode_numpress_integers(b'')) == 0
+    with pytest.raises(ValueError, match='truncated'):
+        decode_numpress_integers(encode_integers([2 ** 30, 5])[:-1])
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Lukáš Ustrnul
+GitHub: https://github.com/lukasustrnul
+LinkedIn: https://www.linkedin.com/in/luk%C3%A1%C5%A1-ustrnul-058420123/
+
+File: test_validation.py
+Created on 18.10.2026
+
+Note: uploaded CSV files with text in numeric columns have to reach validation, the file with an error is skipped
+and the other files are matched.
+"""
+import pandas as pd
+from matchmass import engine
+from matchmass.validation import validate_matching_inputs
+
+
+def write_experimental_csv(path, single_exp_file_df: pd.DataFrame, text_row: str = None) -> str:
+    """
+    @param path: path of the written file
+    @param single_exp_file_df: experimental table with columns 'exp_m/z' and 'Abundance'
+    @param text_row: line inserted in the middle of the data (e.g. repeated header), None writes the table as it is
+    @return: path of the written file as a string
+    """
+    lines = single_exp_file_df.to_csv(index=False).splitlines()
+    if text_row is not None:
+        lines.insert(len(lines) // 2, text_row)
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def test_csv_with_text_cell_is_skipped_and_other_files_are_matched(tmp_path, simulated_theoretical_table, simulated_experimental_files):
+    paths = [write_experimental_csv(tmp_path / 'file1.csv', simulated_experimental_files['file1']),
+             write_experimental_csv(tmp_path / 'file2.csv', simulated_experimental_files['file2'], 'exp_m/z,Abundance'),
+             write_experimental_csv(tmp_path / 'file3.csv', simulated_experimental_files['file3'], 'abc,100')]
+    experimental_dfs_additional_info_df, dict_containing_experimental_dfs, _ = engine.load_experimental_files(paths)
+    experimental_dfs_additional_info_df['mass_accuracy(Da)'] = 0.02
+    experimental_dfs_additional_info_df['abund_thrs'] = 0.0
+
+    issues_df = validate_matching_inputs(experimental_dfs_additional_info_df, dict_containing_experimental_dfs, simulated_theoretical_table)
+    errors_df = issues_df[issues_df['severity'] == 'error']
+    assert set(zip(errors_df['nickname'], errors_df['check'])) == {('file2', 'numeric'), ('file3', 'numeric')}
+
+    dict_containing_matched_experimental_dfs, aggregated_matched_files_final_form_df, matching_result_message = engine.data_matching_sequence(
+        experimental_dfs_additional_info_df, dict_containing_experimental_dfs, simulated_theoretical_table, validation_issues_df=issues_df)
+    assert list(dict_containing_matched_experimental_dfs) == ['file1']
+    assert not aggregated_matched_files_final_form_df.empty
+    assert matching_result_message.startswith('Matches were found! Some files were skipped.')
+
+
+def test_theoretical_csv_without_numeric_masses_is_reported(tmp_path):
+    path = tmp_path / 'theoretical.csv'
+    path.write_text('name,mass\nalanine,alanine\nglycine,glycine\n')
+    theoretical_mass_table_df = engine.load_theoretical_table(str(path))
+    expanded_theoretical_mass_table_df = engine.add_ions_to_theoretical_table(theoretical_mass_table_df, engine.ions_selection_from_names(['Mplus']))
+
+    experimental_dfs_additional_info_df = engine.generate_additional_info_table(pd.DataFrame(), 'file1.csv', 'file1')
+    experimental_dfs_additional_info_df['mass_accuracy(Da)'] = 0.02
+    experimental_dfs_additional_info_df['abund_thrs'] = 0.0
+    issues_df = validate_matching_inputs(experimental_dfs_additional_info_df, {'file1': pd.DataFrame({'exp_m/z': [76.0], 'Abundance': [1.0]})},
+                                         expanded_theoretical_mass_table_df)
+    assert 'check that masses are in the second column' in ' '.join(issues_df['message'])
@@ -11,7 +11,13 @@ Note: this file should contain definitions for functions which provides graphica
 import pandas as pd
 import numpy as np
 import streamlit as st
-from data_functions import theoretical_upload_object_to_dataframe, extract_info_and_data_from_experimental_upload, data_matching_sequence, download_excel_with_results, count_downloads
+from data_functions import theoretical_upload_object_to_dataframe, extract_info_and_data_from_experimental_upload, count_downloads, get_match_cache
+from matchmass.engine import data_matching_sequence, export_results, EXPORT_FORMATS, SPECTRUM_MODES
+from matchmass.spectrum_formats import is_spectrum_source
+from matchmass.tolerance import TOLERANCE_MODELS
+from matchmass.instrumentation import PipelineProfile
+from matchmass.validation import validate_matching_inputs
+from plots import PLOT_RENDERING_MODES
 from ions_enum import Ion
 
 
@@ -28,8 +34,8 @@ def experimental_data_upload_ui() -> st.runtime.uploaded_file_manager.UploadedFi
     """
     st.write('##### Upload experimental data')
     experimental_UploadedFile_object = st.file_uploader(
-        'Multiple files are allowed. \n\n You can use the .CSV, .XLSX or .XLS filetype here',
-        type=['xlsx', 'xls', 'csv'],
+        'Multiple files are allowed. \n\n You can use the .CSV, .XLSX or .XLS filetype or spectra in .mzML, .mzXML or .MGF here',
+        type=['xlsx', 'xls', 'csv', 'mzml', 'mzxml', 'mgf'],
         accept_multiple_files=True,
         help='Maximum size of file is 200 MB',
         on_change=None,
@@ -39,6 +45,30 @@ def experimental_data_upload_ui() -> st.runtime.uploaded_file_manager.UploadedFi
     return experimental_UploadedFile_object
 
 
+def spectrum_file_options_ui(experimental_UploadedFile_object: st.runtime.uploaded_file_manager.UploadedFile) -> tuple:
+    """
+    Shows options for spectrum files (mzML, mzXML, MGF) if any of them was uploaded, i.e. whether scans are summed
+    into one spectrum or each scan is used as a separate experimental file, and which MS level is used
+
+    @param experimental_UploadedFile_object: UploadedFile object containing all uploaded experimental files
+    @return: tuple (spectrum mode from engine.SPECTRUM_MODES, MS level)
+    """
+    if not experimental_UploadedFile_object or not any(is_spectrum_source(file) for file in experimental_UploadedFile_object):
+        return ('sum', 1)
+    spectrum_mode_labels = {'sum': 'Sum of all scans', 'scans': 'Each scan as separate file', 'chromatogram': 'LC-MS run (chromatograms)'}
+    spectrum_mode = st.radio('How should scans of spectrum files be used?',
+                             options=SPECTRUM_MODES,
+                             format_func=lambda mode: spectrum_mode_labels[mode],
+                             horizontal=True,
+                             key='spectrum_mode',
+                             help='Summed spectrum adds abundances of the same m/z (within 0.001) from all scans. '
+                                  'Each scan as separate file allows to follow signals in time (retention time is shown in the table of settings). '
+                                  'LC-MS run matches every scan, shows extracted-ion chromatograms and abundance of each ion is its area over retention time.')
+    ms_level = st.number_input('MS level of used scans', min_value=1, max_value=10, value=1, step=1, key='spectrum_ms_level',
+                               help='MGF files contain MS2 spectra, all of them are always used')
+    return (spectrum_mode, int(ms_level))
+
+
 def theoretical_data_upload_ui() -> st.runtime.uploaded_file_manager.UploadedFile:
     """
     Shows part of page with upload widget for table containing theoretical masses and returns UploadedFile object
@@ -97,19 +127,23 @@ def provide_empty_or_uploaded_theoretical_table(theoretical_table_UploadedFile_o
     return theoretical_mass_table_df
 
 
-def provide_empty_or_uploaded_experimental_data(experimental_UploadedFile_object: st.runtime.uploaded_file_manager.UploadedFile) -> tuple:
+def provide_empty_or_uploaded_experimental_data(experimental_UploadedFile_object: st.runtime.uploaded_file_manager.UploadedFile,
+                                                spectrum_mode: str = 'sum', ms_level: int = 1) -> tuple:
     """
 
     @param experimental_UploadedFile_object: UploadedFile object containing files from upload widget for experimental files
+    @param spectrum_mode: use of scans of spectrum files, see spectrum_file_options_ui
+    @param ms_level: MS level of used scans of spectrum files
     @return: tuple (pd.DataFrame, dict[UploadedFile]=pd.DataFrame, dict[orig_filename]= file_nickname )
         tuple contains real data if any file was uploaded or dummy dataframe and dictionaries if there is no uploaded experimental file
     """
     if experimental_UploadedFile_object:
         experimental_dfs_additional_info_df, dict_containing_experimental_dfs, dict_experimental_filenames = extract_info_and_data_from_experimental_upload(
-            experimental_UploadedFile_object)
+            experimental_UploadedFile_object, spectrum_mode, ms_level)
     else:
         experimental_dfs_additional_info_df = pd.DataFrame(index=['orig_name'],
-                                                           columns=['orig_name', 'mass_accuracy(Da)', 'abund_thrs'])
+                                                           columns=['orig_name', 'mass_accuracy(Da)', 'abund_thrs',
+                                                                    'tolerance_model', 'mass_accuracy(ppm)', 'calibration_curve'])
         dict_containing_experimental_dfs = {
             'No data uploaded': pd.DataFrame([{'exp_m/z': np.nan}, {'Abundance': np.nan}])}
         dict_experimental_filenames = {'No experimental data uploaded': 'No data uploaded'}
@@ -118,33 +152,60 @@ def provide_empty_or_uploaded_experimental_data(experimental_UploadedFile_object
 
 def user_input_global_accuracy_and_threshold() -> tuple:
     """
-    allows user to input numerical values for mass accuracy and abundance threshold which will be used on all (globally) experimental files
+    allows user to input numerical values for mass accuracy and abundance threshold which will be used on all (globally) experimental files.
+    Mass accuracy can be set in Da (the same for all m/z) or in ppm (relative to m/z of the signal).
 
-    @return: tuple containing user defined value for mass accuracy and abundance threshold
+    @return: tuple containing user defined tolerance model ('Da' or 'ppm'), mass accuracy in Da, mass accuracy in ppm and abundance threshold
     """
     # initiate session state to keep values of mass accuracy and abundance set if radio = 'No'
+    if "tolerance_model_value" not in st.session_state:
+        st.session_state["tolerance_model_value"] = 'Da'
     if "mass_accuracy_value" not in st.session_state:
         st.session_state["mass_accuracy_value"] = 0.00001
+    if "mass_accuracy_ppm_value" not in st.session_state:
+        st.session_state["mass_accuracy_ppm_value"] = 5.0
     if "Abund_thresh_value" not in st.session_state:
         st.session_state["Abund_thresh_value"] = 0.0
 
     # define helping functions to save values to the session state
+    def set_tolerance_model():
+        st.session_state["tolerance_model_value"] = st.session_state["new_tolerance_model_value"]
+
     def set_accuracy():
         st.session_state["mass_accuracy_value"] = st.session_state["new_accuracy_value"]
 
+    def set_accuracy_ppm():
+        st.session_state["mass_accuracy_ppm_value"] = st.session_state["new_accuracy_ppm_value"]
+
     def set_threshold():
         st.session_state["Abund_thresh_value"] = st.session_state["new_abund_thresh_value"]
 
     # define what to show based on selected option on the radio
     col101, col102 = st.columns(2, gap='medium')
     with col101:
-        st.session_state["mass_accuracy_value"] = st.number_input('Insert mass accuracy (Da)',
-                                                                  step=0.00001,
-                                                                  key="new_accuracy_value",
-                                                                  value=st.session_state["mass_accuracy_value"],
-                                                                  format="%0.5f",
-                                                                  on_change=set_accuracy
-                                                                  )
+        st.session_state["tolerance_model_value"] = st.selectbox('Unit of mass accuracy',
+                                                                 ['Da', 'ppm'],
+                                                                 key="new_tolerance_model_value",
+                                                                 index=['Da', 'ppm'].index(st.session_state["tolerance_model_value"]),
+                                                                 help='ppm is relative to m/z of each signal (suitable for high-resolution instruments)',
+                                                                 on_change=set_tolerance_model
+                                                                 )
+        if st.session_state["tolerance_model_value"] == 'ppm':
+            st.session_state["mass_accuracy_ppm_value"] = st.number_input('Insert mass accuracy (ppm)',
+                                                                          step=0.1,
+                                                                          key="new_accuracy_ppm_value",
+                                                                          value=st.session_state["mass_accuracy_ppm_value"],
+                                                                          format="%0.2f",
+                                                                          on_change=set_accuracy_ppm
+                                                                          )
+        else:
+            st.session_state["mass_accuracy_value"] = st.number_input('Insert mass accuracy (Da)',
+                                                                      step=0.00001,
+                                                                      key="new_accuracy_value",
+                                                                      value=st.session_state["mass_accuracy_value"],
+                                                                      format="%0.5f",
+                                                                      on_change=set_accuracy
+                                                                      )
     with col102:
         st.session_state["Abund_thresh_value"] = st.number_input('Insert abundance threshold (in a scale from experimental data)',
                                                                  step=0.01,
@@ -153,9 +214,11 @@ def user_input_global_accuracy_and_threshold() -> tuple:
                                                                  on_change=set_threshold
                                                                  )
     # save user defined values to variable and return them as a tuple
+    tolerance_model = st.session_state["tolerance_model_value"]
     accur_setting = st.session_state["mass_accuracy_value"]
+    accur_ppm_setting = st.session_state["mass_accuracy_ppm_value"]
     thresh_setting = st.session_state["Abund_thresh_value"]
-    return (accur_setting, thresh_setting)
+    return (tolerance_model, accur_setting, accur_ppm_setting, thresh_setting)
 
 
 def user_input_individual_accuracy_and_threshold(df: pd.DataFrame) -> pd.DataFrame:
@@ -165,12 +228,20 @@ def user_input_individual_accuracy_and_threshold(df: pd.DataFrame) -> pd.DataFra
     @return: original dataframe with values in mass accuracy and abundance threshold column changed by user input
     """
     df = st.data_editor(df,
-                        disabled=["orig_name", 'nickname'],
+                        disabled=["orig_name", 'nickname', 'retention_time(min)', 'precursor_m/z'],
                         column_config={
                             'mass_accuracy(Da)': st.column_config.NumberColumn(
                                help="you can copy values from one line to the rest in the same way as in excel"),
                             'abund_thrs': st.column_config.NumberColumn(
-                               help="you can copy values from one line to the rest in the same way as in excel")
+                               help="you can copy values from one line to the rest in the same way as in excel"),
+                            'tolerance_model': st.column_config.SelectboxColumn(
+                               options=list(TOLERANCE_MODELS),
+                               help="Da - mass accuracy(Da) is used for all m/z, ppm - mass accuracy(ppm) relative to m/z of the signal, "
+                                    "calibration - mass accuracy in Da interpolated from calibration_curve"),
+                            'mass_accuracy(ppm)': st.column_config.NumberColumn(
+                               help="used only if tolerance_model is ppm"),
+                            'calibration_curve': st.column_config.TextColumn(
+                               help="used only if tolerance_model is calibration, pairs of m/z and mass accuracy in Da, e.g. '100:0.002, 1000:0.01'")
                         })
     return df
 
@@ -230,6 +301,40 @@ def ion_picking_with_checkboxes() -> dict:
     return ions_to_add_to_theoretical_table_dict
 
 
+def plot_rendering_selectbox() -> str:
+    """
+    Shows dropdown menu for choosing how signals are drawn in plots, WebGL is much faster for large spectra
+
+    @return: one of plots.PLOT_RENDERING_MODES
+    """
+    rendering_mode_labels = {'auto': 'Automatic (WebGL for large spectra)', 'bars': 'Bars', 'webgl': 'WebGL lines'}
+    return st.selectbox('Drawing of signals in plots:',
+                        PLOT_RENDERING_MODES,
+                        format_func=lambda rendering_mode: rendering_mode_labels[rendering_mode],
+                        key="plot_rendering_mode",
+                        help='WebGL draws all signals as one trace of vertical lines, it stays fast even with many signals')
+
+
+def mz_range_slider(label: str, key: str, mz_values) -> tuple:
+    """
+    Shows slider for picking m/z range of a plot. Plots are decimated to about one peak per pixel of the range,
+    so picking a narrower range shows more details.
+
+    @param label: label of the slider
+    @param key: unique key of the slider
+    @param mz_values: m/z values shown in the plot, they define the full range (values which are not numbers are ignored)
+    @return: tuple (lowest m/z, highest m/z) or None if the full range is picked or there are no values
+    """
+    mz_values = pd.to_numeric(pd.Series(mz_values), errors='coerce').dropna()
+    if mz_values.empty or mz_values.min() == mz_values.max():
+        return None
+    lowest_mz, highest_mz = float(np.floor(mz_values.min())), float(np.ceil(mz_values.max()))
+    picked_mz_range = st.slider(label, min_value=lowest_mz, max_value=highest_mz, value=(lowest_mz, highest_mz), step=0.1, key=key)
+    if picked_mz_range == (lowest_mz, highest_mz):
+        return None
+    return picked_mz_range
+
+
 def matching_button(experimental_dfs_additional_info_df: pd.DataFrame, dict_containing_experimental_dfs: dict, expanded_theoretical_mass_table_df: pd.DataFrame) -> tuple:
     """
     shows button for matching and saves results of matching to session state. Provides empty dataframes and string if there was no matching done yet.
@@ -242,13 +347,29 @@ def matching_button(experimental_dfs_additional_info_df: pd.DataFrame, dict_cont
     # initiate the session state to hold results of matching
     if "matched_results" not in st.session_state:
         st.session_state["matched_results"] = (pd.DataFrame(), pd.DataFrame(), '')
+    # let user choose if only the nearest theoretical m/z or all candidates within mass accuracy should be reported
+    report_all_candidates = st.checkbox('Report all theoretical *m/z* within mass accuracy (not only the nearest one)',
+                                        key="report_all_candidates",
+                                        help='each signal is matched with every ion within mass accuracy, candidates are ranked by mass error (rank 1 is the nearest)')
+    matching_mode = 'all' if report_all_candidates else 'nearest'
+
+    # measurement of stages is opt-in, tracking of memory slows down the matching and export
+    measure_stages = st.checkbox('Measure time and memory of stages of matching and export',
+                                 key="measure_stages",
+                                 help='time, number of rows and peak of allocated memory of each stage and file are shown in a panel below the results')
 
     # create button to initiate matching
     do_the_matching = st.button("""# Find matching signals!""")
 
     # match the data and save to session state if the button is pushed
     if do_the_matching:
-        st.session_state["matched_results"] = data_matching_sequence(experimental_dfs_additional_info_df, dict_containing_experimental_dfs, expanded_theoretical_mass_table_df)
+        st.session_state["pipeline_profile"] = PipelineProfile() if measure_stages else None
+        # problems of files are found before matching, files with errors are skipped and listed in a table under the results
+        # matched results of single files are cached, so after a change of settings only the changed files are matched again
+        st.session_state["validation_issues"] = validate_matching_inputs(experimental_dfs_additional_info_df, dict_containing_experimental_dfs, expanded_theoretical_mass_table_df)
+        st.session_state["matched_results"] = data_matching_sequence(experimental_dfs_additional_info_df, dict_containing_experimental_dfs, expanded_theoretical_mass_table_df, matching_mode,
+                                                                       get_match_cache(), st.session_state["pipeline_profile"],
+                                                                       st.session_state["validation_issues"])
     else:
         pass
 
@@ -274,7 +395,7 @@ def button_for_results_download(experimental_dfs_additional_info_df: pd.DataFram
                                 dict_containing_matched_experimental_dfs: dict
                                 ) -> None:
     """
-    shows button for download of results
+    shows choice of format and button for download of results. File with results is written only after the button is clicked.
 
     @param experimental_dfs_additional_info_df:
     @param expanded_theoretical_mass_table_df:
@@ -282,18 +403,66 @@ def button_for_results_download(experimental_dfs_additional_info_df: pd.DataFram
     @param dict_containing_matched_experimental_dfs:
     @return:
     """
+    export_format_labels = {'excel': 'Excel', 'csv': 'CSV files (zip)', 'parquet': 'Parquet files (zip)'}
+    export_format = st.radio('Format of results:',
+                             list(EXPORT_FORMATS),
+                             format_func=lambda export_format: export_format_labels[export_format],
+                             horizontal=True,
+                             key="export_format",
+                             help='CSV and Parquet files are faster to write and read for large results, each table is one file in zip archive')
+    _, file_name, mime = EXPORT_FORMATS[export_format]
+    # the file is written in another thread without access to session state, so the profile is taken here
+    profile = st.session_state.get("pipeline_profile")
     st.download_button(
-        label="Download data as Excel",
-        data=download_excel_with_results(experimental_dfs_additional_info_df,
-                                         expanded_theoretical_mass_table_df,
-                                         aggregated_matched_files_summary_df,
-                                         dict_containing_matched_experimental_dfs),
-        file_name='results_matched.xlsx',
-        mime='application/vnd.ms-excel',
+        label="Download data as " + export_format_labels[export_format],
+        data=lambda: export_results(export_format,
+                                    experimental_dfs_additional_info_df,
+                                    expanded_theoretical_mass_table_df,
+                                    aggregated_matched_files_summary_df,
+                                    dict_containing_matched_experimental_dfs,
+                                    profile=profile),
+        file_name=file_name,
+        mime=mime,
         key="downloaded",
         on_click=count_downloads
     )
 
 
+def validation_issues_expander() -> None:
+    """
+    shows collapsible panel with problems found in the data and settings before the last matching (see matchmass.validation).
+    The panel is open if some file was skipped.
+
+    @return: None
+    """
+    validation_issues_df = st.session_state.get("validation_issues")
+    if validation_issues_df is None or validation_issues_df.empty:
+        return None
+    has_errors = (validation_issues_df['severity'] == 'error').any()
+    with st.expander("Problems found in your data and settings", expanded=bool(has_errors)):
+        st.write('Files with an error were skipped, files with a warning were matched. Fix the errors and hit the **Matching button** again.')
+        st.dataframe(validation_issues_df.drop(columns='nickname'), use_container_width=True, hide_index=True)
+
+
+def pipeline_profile_expander() -> None:
+    """
+    shows collapsible panel with measured stages of the last matching (and of downloads of its results), if the measurement was switched on
+
+    @return: None
+    """
+    profile = st.session_state.get("pipeline_profile")
+    if profile is None or not profile.records:
+        return None
+    with st.expander("Time and memory of stages"):
+        st.write('Totals of stages (peak memory is the largest one of all calls), export is added after each download.')
+        totals_df = profile.totals_dataframe()
+        totals_df['peak_memory(MB)'] = pd.to_numeric(totals_df.pop('peak_memory_bytes')) / 1024 ** 2
+        st.dataframe(totals_df, use_container_width=True)
+        st.write('All measured stages:')
+        stages_df = profile.to_dataframe()
+        stages_df['peak_memory(MB)'] = pd.to_numeric(stages_df.pop('peak_memory_bytes')) / 1024 ** 2
+        st.dataframe(stages_df, use_container_width=True)
+
+
 if __name__ == '__main__':
     pass